@@ -0,0 +1,64 @@
+﻿import argparse
+import shutil
+import tempfile
+import time
+
+import grpc
+
+from bench.manager import start_cluster
+from protos import stpb_pb2 as stpb
+from protos import stpb_pb2_grpc as stpb_grpc
+
+
+def main(args):
+    path = tempfile.mkdtemp(prefix="bench_batch_")
+    manager, services = start_cluster(path, args.nodes, 1024, args.durability)
+    node = services[0]
+    value = b"v" * args.value_size
+    try:
+        with grpc.insecure_channel(node.ip + node.port) as ch:
+            stub = stpb_grpc.storagementServiceStub(ch)
+            begin = time.perf_counter()
+            for i in range(args.keys):
+                stub.putdata(stpb.StKV(cli_id=0, key=f"single{i}", value=value, token=node.token))
+            elapsed = time.perf_counter() - begin
+            print(f"逐个 put: {args.keys / elapsed:.0f} 个键/s")
+
+            for size in args.batch:
+                begin = time.perf_counter()
+                for start in range(0, args.keys, size):
+                    items = [stpb.StKV(key=f"batch{size}_{i}", value=value)
+                             for i in range(start, min(start + size, args.keys))]
+                    stub.mputdata(stpb.StBatch(cli_id=0, token=node.token, items=items))
+                elapsed = time.perf_counter() - begin
+                print(f"mput 每批 {size:>4}: {args.keys / elapsed:.0f} 个键/s")
+
+            keys = [stpb.StKV(key=f"single{i}") for i in range(args.keys)]
+            begin = time.perf_counter()
+            for item in keys:
+                stub.getdata(stpb.StRequest(cli_id=0, key=item.key, token=node.token))
+            print(f"逐个 get: {args.keys / (time.perf_counter() - begin):.0f} 个键/s")
+            begin = time.perf_counter()
+            for start in range(0, args.keys, args.batch[-1]):
+                stub.mgetdata(stpb.StBatch(cli_id=0, token=node.token, items=keys[start:start + args.batch[-1]]))
+            print(f"mget 每批 {args.batch[-1]:>4}: {args.keys / (time.perf_counter() - begin):.0f} 个键/s")
+    finally:
+        for service in services:
+            service.unregister()
+            service.server.stop(None)
+            service._stop_background()
+            service.engine.close()
+        manager.stop()
+        manager.server.stop(None)
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--keys", type=int, default=2000)
+    parser.add_argument("--batch", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--value-size", type=int, default=256)
+    parser.add_argument("--durability", choices=("none", "batch", "write"), default="batch")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,95 @@
+﻿import argparse
+import random
+import threading
+import time
+
+from storage.main import CACHE_POLICIES, Cache, ShardedCache
+
+
+def hit_throughput(cache, keys: list[str], threads: int, ops: int) -> float:
+    """多线程并发命中读取, 返回每秒操作数"""
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(seed: int):
+        rnd = random.Random(seed)
+        picks = [rnd.choice(keys) for _ in range(1024)]
+        barrier.wait()
+        for i in range(ops):
+            cache.get(picks[i & 1023])
+
+    ts = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in ts:
+        t.start()
+    barrier.wait()
+    begin = time.perf_counter()
+    for t in ts:
+        t.join()
+    return threads * ops / (time.perf_counter() - begin)
+
+
+def bench_shards(args):
+    keys = [f"key{i}" for i in range(args.keys)]
+    caches = {
+        "Cache": lambda: Cache(args.keys),
+        f"ShardedCache({args.shards})": lambda: ShardedCache(args.keys, shards=args.shards),
+    }
+    print(f"{'threads':>8}" + "".join(f"{name:>24}" for name in caches))
+    for threads in args.threads:
+        row = f"{threads:>8}"
+        for make in caches.values():
+            cache = make()
+            for k in keys:
+                cache.add(k, "v" * 64)
+            row += f"{hit_throughput(cache, keys, threads, args.ops):>20.0f}/s "
+        print(row)
+
+
+def skewed_workload(hot: int, cold: int, requests: int, seed: int = 0) -> list[str]:
+    """Zipf 分布的热点读取中穿插对冷键的整段扫描"""
+    rnd = random.Random(seed)
+    weights = [1 / (i + 1) for i in range(hot)]
+    hot_keys = [f"hot{i}" for i in range(hot)]
+    trace = []
+    sweep = 0
+    while len(trace) < requests:
+        trace.extend(rnd.choices(hot_keys, weights, k=5000))
+        trace.extend(f"cold{sweep}_{i}" for i in range(cold))
+        sweep += 1
+    return trace[:requests]
+
+
+def hit_rate(cache, trace: list[str]) -> float:
+    """按 StoreService.getdata 的方式访问: 先 get, 未命中再 add"""
+    hits = 0
+    for key in trace:
+        _, ok = cache.get(key)
+        if ok:
+            hits += 1
+        else:
+            cache.add(key, key)
+    return hits / len(trace)
+
+
+def bench_policies(args):
+    trace = skewed_workload(args.hot, args.cold, args.requests)
+    for name, policy in sorted(CACHE_POLICIES.items()):
+        rate = hit_rate(policy(args.size), trace)
+        print(f"{name:>8}: 命中率 {rate:.2%}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("mode", nargs="?", choices=["shards", "policy"], default="shards")
+    parser.add_argument("--keys", type=int, default=10000)
+    parser.add_argument("--ops", type=int, default=100000, help="每个线程的读取次数")
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--size", type=int, default=500, help="policy 模式下的缓存容量")
+    parser.add_argument("--hot", type=int, default=2000)
+    parser.add_argument("--cold", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=500000)
+    args = parser.parse_args()
+    if args.mode == "policy":
+        bench_policies(args)
+    else:
+        bench_shards(args)
@@ -0,0 +1,75 @@
+﻿import argparse
+import json
+import random
+import time
+
+from storage import codec
+from storage.main import Cache
+
+_WORDS = ["alpha", "beta", "gamma", "delta", "order", "cart", "login", "logout", "view", "click",
+          "search", "checkout", "refund", "mobile", "desktop", "shanghai", "beijing", "shenzhen"]
+
+
+def json_corpus(n: int, seed: int = 0) -> list[bytes]:
+    """生成类似用户画像/事件记录的 JSON 值, 每个约 2~16KB"""
+    rnd = random.Random(seed)
+    corpus = []
+    for i in range(n):
+        doc = {
+            "user_id": i,
+            "name": f"user_{rnd.randrange(10**6)}",
+            "tags": rnd.sample(_WORDS, 5),
+            "profile": {"city": rnd.choice(_WORDS[-3:]), "level": rnd.randrange(10), "vip": rnd.random() < 0.1},
+            "events": [
+                {"type": rnd.choice(_WORDS[4:13]), "ts": 1700000000 + rnd.randrange(10**7),
+                 "device": rnd.choice(_WORDS[13:15]), "amount": round(rnd.random() * 1000, 2)}
+                for _ in range(rnd.randrange(20, 160))
+            ],
+        }
+        corpus.append(json.dumps(doc).encode())
+    return corpus
+
+
+def cache_hit_rate(blobs: list[bytes], budget: int, requests: int, decode: bool, seed: int = 0) -> tuple[float, float]:
+    """按 Zipf 分布读取, 字节预算为 budget 的缓存命中率与每次读取的平均耗时(微秒)"""
+    rnd = random.Random(seed)
+    weights = [1 / (i + 1) for i in range(len(blobs))]
+    trace = rnd.choices(range(len(blobs)), weights, k=requests)
+    cache = Cache(len(blobs), budget)
+    hits = 0
+    begin = time.perf_counter()
+    for i in trace:
+        value, ok = cache.get(str(i))
+        if ok:
+            hits += 1
+            if decode:
+                codec.decode(value)
+        else:
+            cache.add(str(i), blobs[i])
+    return hits / requests, (time.perf_counter() - begin) / requests * 1e6
+
+
+def main(args):
+    corpus = json_corpus(args.values)
+    raw = [codec.encode(v, 0) for v in corpus]
+    packed = [codec.encode(v, args.threshold) for v in corpus]
+    raw_bytes = sum(len(v) for v in raw)
+    packed_bytes = sum(len(v) for v in packed)
+    print(f"{args.values} 个 JSON 值: 原始 {raw_bytes / 2**20:.1f}MB, 压缩后 {packed_bytes / 2**20:.1f}MB, "
+          f"节省磁盘 {1 - packed_bytes / raw_bytes:.1%}")
+    for mb in args.budgets:
+        budget = int(mb * 2**20)
+        raw_rate, raw_us = cache_hit_rate(raw, budget, args.requests, decode=False)
+        packed_rate, packed_us = cache_hit_rate(packed, budget, args.requests, decode=True)
+        print(f"缓存 {mb}MB: 未压缩命中率 {raw_rate:.1%} ({raw_rate / mb:.1%}/MB, {raw_us:.1f}us/次), "
+              f"压缩命中率 {packed_rate:.1%} ({packed_rate / mb:.1%}/MB, {packed_us:.1f}us/次)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--values", type=int, default=2000)
+    parser.add_argument("--threshold", type=int, default=512)
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--budgets", type=float, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,59 @@
+﻿import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from storage.engine import ENGINES
+
+
+def disk_usage(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def run(name: str, keys: int, ops: int, reads: int, value_size: int, seed: int = 0) -> tuple[float, float, int]:
+    """覆盖写为主的负载: 在 keys 个键上随机写入 ops 次, 再随机读取 reads 次, 返回 (写入次数/s, 读取次数/s, 磁盘占用)"""
+    rnd = random.Random(seed)
+    path = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    engine = ENGINES[name](path)
+    value = os.urandom(value_size)
+    trace = [f"key{rnd.randrange(keys):08d}" for _ in range(ops)]
+    try:
+        begin = time.perf_counter()
+        for key in trace:
+            engine.put(key, value)
+        compact = getattr(engine, "compact", None)
+        if compact is not None:
+            compact()
+        put_rate = ops / (time.perf_counter() - begin)
+
+        lookups = [f"key{rnd.randrange(keys):08d}" for _ in range(reads)]
+        begin = time.perf_counter()
+        for key in lookups:
+            try:
+                engine.get(key)
+            except (KeyError, FileNotFoundError):
+                pass
+        get_rate = reads / (time.perf_counter() - begin)
+        return put_rate, get_rate, disk_usage(path)
+    finally:
+        engine.close()
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=20000)
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--reads", type=int, default=50000)
+    parser.add_argument("--value-size", type=int, default=256)
+    parser.add_argument("--engines", nargs="+", default=["file", "log", "lsm"])
+    args = parser.parse_args()
+    for name in args.engines:
+        put_rate, get_rate, usage = run(name, args.keys, args.ops, args.reads, args.value_size)
+        print(f"{name:>4}: 写入 {put_rate:.0f} 次/s, 读取 {get_rate:.0f} 次/s, 磁盘占用 {usage / 2**20:.1f}MB")
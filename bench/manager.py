@@ -0,0 +1,89 @@
+﻿import argparse
+import logging
+import shutil
+import tempfile
+import threading
+import time
+
+import grpc
+
+from protos import stpb_pb2 as stpb
+from protos import stpb_pb2_grpc as stpb_grpc
+from server.main import ManageService
+from storage.main import StoreService
+from tests.utils import _get_free_port
+
+
+def start_cluster(path: str, nodes: int, lock_stripes: int, durability: str):
+    manager = ManageService("localhost", f":{_get_free_port()}", lock_stripes=lock_stripes)
+    manager.start(f"{path}/manage/")
+    manager.logger.setLevel(logging.WARNING)
+    logger = logging.getLogger("bench_storage")
+    logger.setLevel(logging.WARNING)
+    services = []
+    for _ in range(nodes):
+        service = StoreService("localhost", f":{_get_free_port()}", 5, manager.ip + manager.port,
+                               durability=durability, bootstrap=False)
+        service.start(path, logger)
+        services.append(service)
+    return manager, services
+
+
+def put_throughput(services: list[StoreService], clients: int, ops: int, value_size: int) -> float:
+    """clients 个客户端各自连接一个存储节点, 并发写入互不相同的键, 返回每秒完成的写入次数"""
+    value = b"v" * value_size
+    barrier = threading.Barrier(clients + 1)
+    errors = []
+
+    def worker(cid: int):
+        service = services[cid % len(services)]
+        with grpc.insecure_channel(service.ip + service.port) as ch:
+            stub = stpb_grpc.storagementServiceStub(ch)
+            barrier.wait()
+            for i in range(ops):
+                resp = stub.putdata(stpb.StKV(cli_id=cid, key=f"c{cid}_{i}", value=value, token=service.token))
+                if not resp.errno:
+                    errors.append(resp.errmes)
+
+    ts = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    for t in ts:
+        t.start()
+    barrier.wait()
+    begin = time.perf_counter()
+    for t in ts:
+        t.join()
+    elapsed = time.perf_counter() - begin
+    if errors:
+        print(f"  {len(errors)} 次写入失败: {errors[0]}")
+    return clients * ops / elapsed
+
+
+def main(args):
+    for stripes, label in ((1, "全局锁"), (args.stripes, f"{args.stripes} 段键锁")):
+        path = tempfile.mkdtemp(prefix="bench_manager_")
+        manager, services = start_cluster(path, args.nodes, stripes, args.durability)
+        try:
+            for clients in args.clients:
+                rate = put_throughput(services, clients, args.ops, args.value_size)
+                print(f"{label}, {clients:>2} 个客户端: {rate:.0f} 次写入/s")
+        finally:
+            for service in services:
+                service.unregister()
+                service.server.stop(None)
+                service._stop_background()
+                service.engine.close()
+            manager.stop()
+            manager.server.stop(None)
+            shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 12])
+    parser.add_argument("--ops", type=int, default=200, help="每个客户端的写入次数")
+    parser.add_argument("--value-size", type=int, default=256)
+    parser.add_argument("--stripes", type=int, default=1024)
+    parser.add_argument("--durability", choices=("none", "batch", "write"), default="batch")
+    args = parser.parse_args()
+    main(args)
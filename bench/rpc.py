@@ -0,0 +1,63 @@
+﻿import argparse
+import shutil
+import statistics
+import tempfile
+import time
+
+import grpc
+
+from bench.manager import start_cluster
+from protos import mapb_pb2 as mapb
+from protos import mapb_pb2_grpc as mapb_grpc
+from protos import stpb_pb2 as stpb
+from protos import stpb_pb2_grpc as stpb_grpc
+
+
+def measure(fn, n: int) -> tuple[float, float]:
+    """执行 n 次 fn(i), 返回 (平均, p99) 延迟, 单位 ms"""
+    samples = []
+    for i in range(n):
+        begin = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - begin) * 1000)
+    samples.sort()
+    return statistics.mean(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main(args):
+    path = tempfile.mkdtemp(prefix="bench_rpc_")
+    manager, services = start_cluster(path, args.nodes, 1024, "none")
+    node = services[0]
+    value = b"v" * args.value_size
+    try:
+        with grpc.insecure_channel(node.ip + node.port) as sch, \
+                grpc.insecure_channel(manager.ip + manager.port) as mch:
+            store = stpb_grpc.storagementServiceStub(sch)
+            manage = mapb_grpc.manageServiceStub(mch)
+            ops = {
+                "put": lambda i: store.putdata(stpb.StKV(cli_id=0, key=f"k{i}", value=value, token=node.token)),
+                # 管理服务器向其余节点收集同一键, 即存储节点缓存未命中时的远程读取
+                "remote get": lambda i: manage.Get(mapb.Request(key=f"k{i}", server_id=node.id)),
+                "del": lambda i: store.deldata(stpb.StRequest(cli_id=0, key=f"k{i}", token=node.token)),
+            }
+            for name, fn in ops.items():
+                mean, p99 = measure(fn, args.ops)
+                print(f"{name:>10}: 平均 {mean:.2f}ms, p99 {p99:.2f}ms")
+    finally:
+        for service in services:
+            service.unregister()
+            service.server.stop(None)
+            service._stop_background()
+            service.engine.close()
+        manager.stop()
+        manager.server.stop(None)
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--ops", type=int, default=500)
+    parser.add_argument("--value-size", type=int, default=256)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,53 @@
+﻿import argparse
+import shutil
+import tempfile
+import time
+
+import grpc
+
+from bench.manager import start_cluster
+from protos import stpb_pb2 as stpb
+from protos import stpb_pb2_grpc as stpb_grpc
+
+
+def main(args):
+    path = tempfile.mkdtemp(prefix="bench_session_")
+    manager, services = start_cluster(path, args.nodes, 1024, args.durability)
+    node = services[0]
+    value = b"v" * args.value_size
+    try:
+        with grpc.insecure_channel(node.ip + node.port) as ch:
+            stub = stpb_grpc.storagementServiceStub(ch)
+            for op in ("put", "get"):
+                begin = time.perf_counter()
+                for i in range(args.ops):
+                    if op == "put":
+                        stub.putdata(stpb.StKV(cli_id=0, key=f"u{i}", value=value, token=node.token))
+                    else:
+                        stub.getdata(stpb.StRequest(cli_id=0, key=f"u{i}", token=node.token))
+                print(f"逐条 {op}: {args.ops / (time.perf_counter() - begin):.0f} 次/s")
+
+                ops = (stpb.StOp(tag=i, op=op, key=f"p{i}" if op == "put" else f"u{i}", value=value, token=node.token)
+                       for i in range(args.ops))
+                begin = time.perf_counter()
+                done = sum(1 for r in stub.session(ops) if r.errno)
+                print(f"会话 {op}: {args.ops / (time.perf_counter() - begin):.0f} 次/s, 成功 {done}")
+    finally:
+        for service in services:
+            service.unregister()
+            service.server.stop(None)
+            service._stop_background()
+            service.engine.close()
+        manager.stop()
+        manager.server.stop(None)
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--ops", type=int, default=1000)
+    parser.add_argument("--value-size", type=int, default=256)
+    parser.add_argument("--durability", choices=("none", "batch", "write"), default="batch")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,48 @@
+﻿import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+
+from storage.engine import LogEngine
+
+
+def reopen(path: str) -> tuple[float, int]:
+    """重新打开数据目录并按 StoreService.start 的方式重建 KVmap, 返回 (耗时, 键数)"""
+    begin = time.perf_counter()
+    engine = LogEngine(path)
+    kvmap = dict.fromkeys(engine.keys(), True)
+    elapsed = time.perf_counter() - begin
+    engine.close()
+    return elapsed, len(kvmap)
+
+
+def main(args):
+    path = tempfile.mkdtemp(prefix="bench_startup_")
+    try:
+        engine = LogEngine(path)
+        value = b"v" * args.value_size
+        begin = time.perf_counter()
+        for i in range(args.keys):
+            engine.put(f"key{i:08d}", value)
+        engine.close()
+        print(f"写入 {args.keys} 个键耗时 {time.perf_counter() - begin:.2f}s")
+
+        elapsed, n = reopen(path)
+        print(f"使用提示文件重建 {n} 个键: {elapsed:.2f}s")
+
+        for hint in glob.glob(os.path.join(path, "*.hint")):
+            os.remove(hint)
+        elapsed, n = reopen(path)
+        print(f"扫描段文件重建 {n} 个键: {elapsed:.2f}s")
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=1000000)
+    parser.add_argument("--value-size", type=int, default=256)
+    args = parser.parse_args()
+    main(args)
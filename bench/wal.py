@@ -0,0 +1,43 @@
+﻿import argparse
+import shutil
+import tempfile
+import threading
+import time
+
+from storage.engine import DURABILITY, LogEngine
+
+
+def put_throughput(durability: str, threads: int, ops: int, value_size: int) -> float:
+    """多线程并发写入 LogEngine, 返回每秒写入次数"""
+    path = tempfile.mkdtemp(prefix="bench_wal_")
+    engine = LogEngine(path, durability=durability)
+    value = b"v" * value_size
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(tid: int):
+        barrier.wait()
+        for i in range(ops):
+            engine.put(f"key{tid}_{i}", value)
+
+    ts = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in ts:
+        t.start()
+    barrier.wait()
+    begin = time.perf_counter()
+    for t in ts:
+        t.join()
+    elapsed = time.perf_counter() - begin
+    engine.close()
+    shutil.rmtree(path)
+    return threads * ops / elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=500, help="每个线程的写入次数")
+    parser.add_argument("--value-size", type=int, default=256)
+    args = parser.parse_args()
+    for mode in DURABILITY:
+        rate = put_throughput(mode, args.threads, args.ops, args.value_size)
+        print(f"{mode:>6}: {rate:.0f} 次写入/s")
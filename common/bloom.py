@@ -0,0 +1,39 @@
+﻿import hashlib
+import math
+
+
+class BloomFilter:
+    """布隆过滤器, 哈希基于 blake2b, 不同进程间结果一致, 可序列化后在节点间传递"""
+    MAX_BITS = 16 << 20
+
+    def __init__(self, nbits: int, nhash: int, bits: bytes | None = None, capacity: int = 0):
+        self.nbits = nbits
+        self.nhash = nhash
+        self.bits = bytearray(bits) if bits is not None else bytearray((nbits + 7) // 8)
+        # 预计容纳的键数与实际加入次数, 用于判断是否需要重建
+        self.capacity = capacity
+        self.count = 0
+
+    @classmethod
+    def for_capacity(cls, capacity: int, fp: float = 0.01) -> "BloomFilter":
+        """按预计键数与误判率计算位数与哈希函数个数"""
+        capacity = max(capacity, 1)
+        nbits = int(-capacity * math.log(fp) / (math.log(2) ** 2))
+        nbits = min(max(nbits, 64), cls.MAX_BITS)
+        nhash = max(1, round(nbits / capacity * math.log(2)))
+        return cls(nbits, nhash, capacity=capacity)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.nhash):
+            yield (h1 + i * h2) % self.nbits
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
@@ -0,0 +1,45 @@
+﻿from threading import Lock
+
+import grpc
+
+
+class ChannelPool:
+    """按目标地址复用长连接的 gRPC 通道与 stub, 首次使用时创建, 节点下线时关闭;
+    单次调用失败不关闭通道, 以免取消同一通道上进行中的请求, 断线由 gRPC 自行重连"""
+
+    def __init__(self):
+        self.mu = Lock()
+        self.channels: dict[str, grpc.Channel] = {}
+        self.stubs: dict[tuple[str, type], object] = {}
+
+    def __len__(self) -> int:
+        return len(self.channels)
+
+    def stub(self, target: str, stub_cls):
+        key = (target, stub_cls)
+        with self.mu:
+            stub = self.stubs.get(key)
+            if stub is None:
+                ch = self.channels.get(target)
+                if ch is None:
+                    ch = grpc.insecure_channel(target)
+                    self.channels[target] = ch
+                stub = stub_cls(ch)
+                self.stubs[key] = stub
+            return stub
+
+    def evict(self, target: str):
+        with self.mu:
+            ch = self.channels.pop(target, None)
+            for key in [key for key in self.stubs if key[0] == target]:
+                del self.stubs[key]
+        if ch is not None:
+            ch.close()
+
+    def close(self):
+        with self.mu:
+            channels = list(self.channels.values())
+            self.channels.clear()
+            self.stubs.clear()
+        for ch in channels:
+            ch.close()
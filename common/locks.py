@@ -0,0 +1,81 @@
+﻿from threading import Condition, Lock
+
+
+class RWLock:
+    def __init__(self):
+        self._readers = 0
+        self._rlock = Lock()
+        self._wlock = Lock()
+
+    def acquire_read(self):
+        with self._rlock:
+            self._readers += 1
+            if self._readers == 1:
+                self._wlock.acquire()
+
+    def release_read(self):
+        with self._rlock:
+            self._readers -= 1
+            if self._readers == 0:
+                self._wlock.release()
+
+    def try_acquire_read(self) -> bool:
+        with self._rlock:
+            if self._readers > 0:
+                self._readers += 1
+                return True
+            acquired = self._wlock.acquire(blocking=False)
+            if acquired:
+                self._readers += 1
+                return True
+            else:
+                return False
+
+    def acquire_write(self, timeout: float | None = None) -> bool:
+        """timeout 为 None 时一直等待, 否则最多等待 timeout 秒, 返回是否获得锁"""
+        return self._wlock.acquire(timeout=-1 if timeout is None else max(timeout, 0))
+
+    def try_acquire_write(self) -> bool:
+        return self._wlock.acquire(blocking=False)
+
+    def release_write(self):
+        self._wlock.release()
+
+
+class WriterPreferringRWLock:
+    """写优先的读写锁: 有写者等待时新的读者阻塞, 持续的读流量不会使写者饥饿"""
+    def __init__(self):
+        self._cond = Condition(Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire_read(self):
+        with self._cond:
+            self._cond.wait_for(lambda: not self._writer and not self._waiting_writers)
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self, timeout: float | None = None) -> bool:
+        with self._cond:
+            self._waiting_writers += 1
+            try:
+                acquired = self._cond.wait_for(lambda: not self._writer and not self._readers, timeout)
+            finally:
+                self._waiting_writers -= 1
+            if acquired:
+                self._writer = True
+            else:
+                # 放弃等待后唤醒因本写者而阻塞的读者
+                self._cond.notify_all()
+            return acquired
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
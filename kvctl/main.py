@@ -1,4 +1,5 @@
 ﻿import grpc
+import os
 import signal
 import sys
 import time
@@ -9,6 +10,9 @@ from protos import stpb_pb2 as stpb
 from protos import stpb_pb2_grpc as stpb_grpc
 from params import params
 
+# 上传文件时每块的字节数
+CHUNK_BYTES = 1 << 20
+
 
 def reconnect(ma_stub, client_id: int):
     for _ in range(10):
@@ -26,6 +30,69 @@ def reconnect(ma_stub, client_id: int):
             continue
     raise RuntimeError("无法连接至服务器")
 
+def read_chunks(path: str, client_id: int, key: str, token: str):
+    """按 CHUNK_BYTES 分块读取文件, 只发送非空的块; 空文件发送一个空块, 使服务器仍写入该键"""
+    sent = False
+    with open(path, 'rb') as f:
+        while data := f.read(CHUNK_BYTES):
+            sent = True
+            yield stpb.StChunk(cli_id=client_id, key=key, token=token, data=data)
+    if not sent:
+        yield stpb.StChunk(cli_id=client_id, key=key, token=token)
+
+def parse_op(line: str, tag: int, client_id: int, token: str):
+    """把 get/put/del 命令行转换为会话请求, 格式不正确时返回 None"""
+    args = line.split()
+    if not args:
+        return None
+    cmd = args[0].lower()
+    if cmd in ('get', 'del') and len(args) == 2:
+        return stpb.StOp(tag=tag, op=cmd, key=args[1], cli_id=client_id, token=token)
+    if cmd == 'put' and len(args) in (3, 4):
+        try:
+            ttl = float(args[3]) if len(args) == 4 else 0
+        except ValueError:
+            return None
+        return stpb.StOp(tag=tag, op=cmd, key=args[1], value=args[2].encode(), ttl=ttl, cli_id=client_id, token=token)
+    return None
+
+def pipeline(st_stub, lines, client_id: int, token: str):
+    """通过会话流水线发送命令, 无需等待上一条的响应, 结果按完成顺序输出, 以行号标识"""
+    ops = {}
+
+    def requests():
+        for lineno, line in enumerate(lines, 1):
+            op = parse_op(line, lineno, client_id, token)
+            if op is None:
+                if line.strip():
+                    print(f'[{lineno}] 无效命令: {line.strip()}')
+                continue
+            ops[lineno] = op
+            yield op
+
+    ok = failed = 0
+    begin = time.perf_counter()
+    for result in st_stub.session(requests()):
+        op = ops.pop(result.tag)
+        if not result.errno:
+            failed += 1
+            print(f'[{result.tag}] {op.op} {op.key}: {result.errmes}')
+            continue
+        ok += 1
+        if op.op == 'get':
+            print(f"[{result.tag}] {op.key}\t{result.value.decode(errors='replace')}")
+    print(f'共完成 {ok + failed} 条命令, 失败 {failed} 条, 耗时 {time.perf_counter() - begin:.2f}s')
+
+def read_until_end():
+    while True:
+        try:
+            line = input('... ')
+        except EOFError:
+            return
+        if line.strip().lower() == 'end':
+            return
+        yield line
+
 def shell(ma_stub, ma_chan, st_stub, st_chan, client_id, token):
     def handle_sig(signum, frame):
         print('接收到中断信号，正在退出...')
@@ -58,8 +125,15 @@ def shell(ma_stub, ma_chan, st_stub, st_chan, client_id, token):
             break
         if cmd == 'HELP':
             print('输入 get [key] 来获取key对应的键值')
-            print('输入 put [key] [value] 来上传键值对')
+            print('输入 put [key] [value] [ttl] 来上传键值对, ttl 为可选的存活秒数')
             print('输入 del [key] 来删除key对应的键值')
+            print('输入 mget [key1] [key2] ... 来批量获取键值')
+            print('输入 mput [key1] [value1] [key2] [value2] ... 来批量上传键值对, 整批同时生效')
+            print('输入 mdel [key1] [key2] ... 来批量删除键值')
+            print('输入 scan [start=..] [end=..] [prefix=..] [limit=..] 来按键的顺序列出键值')
+            print('输入 upload [key] [file] 来分块上传文件作为key对应的键值')
+            print('输入 download [key] [file] 来分块下载key对应的键值到文件')
+            print('输入 pipe [file] 进入流水线模式, 连续发送文件中(或随后输入直到 end)的 get/put/del 命令, 不等待逐条响应')
             print('输入 change 更改存储服务器')
             print('输入 exit 结束运行')
             continue
@@ -95,14 +169,15 @@ def shell(ma_stub, ma_chan, st_stub, st_chan, client_id, token):
                 if not resp.errno:
                     print(resp.errmes)
                 else:
-                    print(resp.value)
+                    print(resp.value.decode(errors='replace'))
 
             elif cmd == 'PUT':
-                if len(args) != 3:
+                if len(args) not in (3, 4):
                     print('不正确的参数个数')
                     continue
                 key, value = args[1], args[2]
-                resp = call_with_reconnect(lambda r: st_stub.putdata(r), stpb.StKV(cli_id=client_id, key=key, value=value, token=token))
+                ttl = float(args[3]) if len(args) == 4 else 0
+                resp = call_with_reconnect(lambda r: st_stub.putdata(r), stpb.StKV(cli_id=client_id, key=key, value=value.encode(), token=token, ttl=ttl))
                 if not resp.errno:
                     print(resp.errmes)
                 else:
@@ -119,6 +194,105 @@ def shell(ma_stub, ma_chan, st_stub, st_chan, client_id, token):
                 else:
                     print('删除成功')
 
+            elif cmd == 'MGET':
+                if len(args) < 2:
+                    print('不正确的参数个数')
+                    continue
+                req = stpb.StBatch(cli_id=client_id, token=token, items=[stpb.StKV(key=key) for key in args[1:]])
+                resp = call_with_reconnect(lambda r: st_stub.mgetdata(r), req)
+                if not resp.errno:
+                    print(resp.errmes)
+                    continue
+                for item in resp.items:
+                    if item.errno:
+                        print(f"{item.key}\t{item.value.decode(errors='replace')}")
+                    else:
+                        print(f"{item.key}\t({item.errmes})")
+
+            elif cmd == 'MPUT':
+                if len(args) < 3 or len(args) % 2 == 0:
+                    print('不正确的参数个数')
+                    continue
+                items = [stpb.StKV(key=args[i], value=args[i + 1].encode()) for i in range(1, len(args), 2)]
+                resp = call_with_reconnect(lambda r: st_stub.mputdata(r), stpb.StBatch(cli_id=client_id, token=token, items=items))
+                if not resp.errno:
+                    print(resp.errmes)
+                else:
+                    print(f'上传成功, 共 {len(items)} 个键值')
+
+            elif cmd == 'MDEL':
+                if len(args) < 2:
+                    print('不正确的参数个数')
+                    continue
+                req = stpb.StBatch(cli_id=client_id, token=token, items=[stpb.StKV(key=key) for key in args[1:]])
+                resp = call_with_reconnect(lambda r: st_stub.mdeldata(r), req)
+                if not resp.errno:
+                    print(resp.errmes)
+                else:
+                    print('删除成功')
+
+            elif cmd == 'SCAN':
+                opts = dict(arg.split('=', 1) for arg in args[1:] if '=' in arg)
+                if len(opts) != len(args) - 1 or not set(opts) <= {'start', 'end', 'prefix', 'limit'}:
+                    print('不正确的参数')
+                    continue
+                req = stpb.StScan(cli_id=client_id, token=token, start=opts.get('start', ''), end=opts.get('end', ''),
+                                  prefix=opts.get('prefix', ''), limit=int(opts.get('limit', 0)))
+                count = 0
+                for page in call_with_reconnect(lambda r: st_stub.scan(r), req):
+                    if not page.errno:
+                        print(page.errmes)
+                        break
+                    for item in page.items:
+                        print(f"{item.key}\t{item.value.decode(errors='replace')}")
+                        count += 1
+                print(f'共 {count} 条')
+
+            elif cmd == 'UPLOAD':
+                if len(args) != 3:
+                    print('不正确的参数个数')
+                    continue
+                key, path = args[1], args[2]
+                if not os.path.isfile(path):
+                    print('文件不存在')
+                    continue
+                resp = call_with_reconnect(lambda _: st_stub.putstream(read_chunks(path, client_id, key, token)), None)
+                if not resp.errno:
+                    print(resp.errmes)
+                else:
+                    print('上传成功')
+
+            elif cmd == 'DOWNLOAD':
+                if len(args) != 3:
+                    print('不正确的参数个数')
+                    continue
+                key, path = args[1], args[2]
+                size = 0
+                with open(path, 'wb') as f:
+                    for chunk in call_with_reconnect(lambda r: st_stub.getstream(r), stpb.StRequest(cli_id=client_id, key=key, token=token)):
+                        if not chunk.errno:
+                            print(chunk.errmes)
+                            size = -1
+                            break
+                        f.write(chunk.data)
+                        size += len(chunk.data)
+                if size < 0:
+                    os.remove(path)
+                else:
+                    print(f'下载成功, 共 {size} 字节')
+
+            elif cmd == 'PIPE':
+                if len(args) == 1:
+                    pipeline(st_stub, read_until_end(), client_id, token)
+                elif len(args) == 2:
+                    if not os.path.isfile(args[1]):
+                        print('文件不存在')
+                        continue
+                    with open(args[1], encoding='utf-8') as f:
+                        pipeline(st_stub, f, client_id, token)
+                else:
+                    print('不正确的参数个数')
+
             elif cmd == 'CHANGE':
                 if len(args) == 1:
                     # random change
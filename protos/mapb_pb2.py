@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nmapb.proto\x12\x04mapb\"&\n\x05\x45mpty\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t\"5\n\nSerRequest\x12\n\n\x02ip\x18\x01 \x01(\t\x12\x0c\n\x04port\x18\x02 \x01(\t\x12\r\n\x05token\x18\x03 \x01(\t\"9\n\x07Request\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x11\n\tserver_id\x18\x02 \x01(\x05\x12\x0e\n\x06\x63li_id\x18\x03 \x01(\x05\"8\n\x08Response\x12\r\n\x05value\x18\x01 \x01(\t\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t\"a\n\x07\x43liInfo\x12\x0e\n\x06\x63li_id\x18\x01 \x01(\x05\x12\n\n\x02ip\x18\x02 \x01(\t\x12\x0c\n\x04port\x18\x03 \x01(\t\x12\r\n\x05token\x18\x04 \x01(\t\x12\r\n\x05\x65rrno\x18\x05 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x06 \x01(\t\"\x17\n\x05\x43liId\x12\x0e\n\x06\x63li_id\x18\x01 \x01(\x05\";\n\x07SerInfo\x12\x11\n\tserver_id\x18\x01 \x01(\x05\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t\"3\n\x02KV\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t\x12\x11\n\tserver_id\x18\x03 \x01(\x05\"G\n\nChangeInfo\x12\x0b\n\x03\x61pi\x18\x01 \x01(\t\x12\r\n\x05token\x18\x02 \x01(\t\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t2\xcc\x02\n\rmanageService\x12%\n\x07\x63onnect\x12\x0b.mapb.Empty\x1a\r.mapb.CliInfo\x12-\n\x0c\x63hangeServer\x12\x0b.mapb.CliId\x1a\x10.mapb.ChangeInfo\x12&\n\ndisconnect\x12\x0b.mapb.CliId\x1a\x0b.mapb.Empty\x12)\n\x06online\x12\x10.mapb.SerRequest\x1a\r.mapb.SerInfo\x12%\n\x07offline\x12\r.mapb.SerInfo\x1a\x0b.mapb.Empty\x12$\n\x03Get\x12\r.mapb.Request\x1a\x0e.mapb.Response\x12\x1f\n\x03Put\x12\x08.mapb.KV\x1a\x0e.mapb.Response\x12$\n\x03\x44\x65l\x12\r.mapb.Request\x1a\x0e.mapb.ResponseB\x10Z\x0e../manageprotob\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nmapb.proto\x12\x04mapb\"&\n\x05\x45mpty\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t\"H\n\nSerRequest\x12\n\n\x02ip\x18\x01 \x01(\t\x12\x0c\n\x04port\x18\x02 \x01(\t\x12\r\n\x05token\x18\x03 \x01(\t\x12\x11\n\tserver_id\x18\x04 \x01(\x05\"9\n\x07Request\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x11\n\tserver_id\x18\x02 \x01(\x05\x12\x0e\n\x06\x63li_id\x18\x03 \x01(\x05\"8\n\x08Response\x12\r\n\x05value\x18\x01 \x01(\x0c\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t\"a\n\x07\x43liInfo\x12\x0e\n\x06\x63li_id\x18\x01 \x01(\x05\x12\n\n\x02ip\x18\x02 \x01(\t\x12\x0c\n\x04port\x18\x03 \x01(\t\x12\r\n\x05token\x18\x04 \x01(\t\x12\r\n\x05\x65rrno\x18\x05 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x06 \x01(\t\"\x17\n\x05\x43liId\x12\x0e\n\x06\x63li_id\x18\x01 \x01(\x05\"]\n\x07SerInfo\x12\x11\n\tserver_id\x18\x01 \x01(\x05\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t\x12\x0c\n\x04peer\x18\x05 \x01(\t\x12\x12\n\npeer_token\x18\x06 \x01(\t\"3\n\x02KV\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x0c\x12\x11\n\tserver_id\x18\x03 \x01(\x05\"3\n\x05\x42\x61tch\x12\x17\n\x05items\x18\x01 \x03(\x0b\x32\x08.mapb.KV\x12\x11\n\tserver_id\x18\x02 \x01(\x05\"C\n\x06Result\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x0c\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t\"K\n\rBatchResponse\x12\x1b\n\x05items\x18\x01 \x03(\x0b\x32\x0c.mapb.Result\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t\"G\n\nChangeInfo\x12\x0b\n\x03\x61pi\x18\x01 \x01(\t\x12\r\n\x05token\x18\x02 \x01(\t\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t2\xcc\x03\n\rmanageService\x12%\n\x07\x63onnect\x12\x0b.mapb.Empty\x1a\r.mapb.CliInfo\x12-\n\x0c\x63hangeServer\x12\x0b.mapb.CliId\x1a\x10.mapb.ChangeInfo\x12&\n\ndisconnect\x12\x0b.mapb.CliId\x1a\x0b.mapb.Empty\x12)\n\x06online\x12\x10.mapb.SerRequest\x1a\r.mapb.SerInfo\x12%\n\x07offline\x12\r.mapb.SerInfo\x1a\x0b.mapb.Empty\x12$\n\x03Get\x12\r.mapb.Request\x1a\x0e.mapb.Response\x12\x1f\n\x03Put\x12\x08.mapb.KV\x1a\x0e.mapb.Response\x12$\n\x03\x44\x65l\x12\r.mapb.Request\x1a\x0e.mapb.Response\x12,\n\x08MultiGet\x12\x0b.mapb.Batch\x1a\x13.mapb.BatchResponse\x12\'\n\x08MultiPut\x12\x0b.mapb.Batch\x1a\x0e.mapb.Response\x12\'\n\x08MultiDel\x12\x0b.mapb.Batch\x1a\x0e.mapb.ResponseB\x10Z\x0e../manageprotob\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -35,21 +35,27 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_EMPTY']._serialized_start=20
   _globals['_EMPTY']._serialized_end=58
   _globals['_SERREQUEST']._serialized_start=60
-  _globals['_SERREQUEST']._serialized_end=113
-  _globals['_REQUEST']._serialized_start=115
-  _globals['_REQUEST']._serialized_end=172
-  _globals['_RESPONSE']._serialized_start=174
-  _globals['_RESPONSE']._serialized_end=230
-  _globals['_CLIINFO']._serialized_start=232
-  _globals['_CLIINFO']._serialized_end=329
-  _globals['_CLIID']._serialized_start=331
-  _globals['_CLIID']._serialized_end=354
-  _globals['_SERINFO']._serialized_start=356
-  _globals['_SERINFO']._serialized_end=415
-  _globals['_KV']._serialized_start=417
-  _globals['_KV']._serialized_end=468
-  _globals['_CHANGEINFO']._serialized_start=470
-  _globals['_CHANGEINFO']._serialized_end=541
-  _globals['_MANAGESERVICE']._serialized_start=544
-  _globals['_MANAGESERVICE']._serialized_end=876
+  _globals['_SERREQUEST']._serialized_end=132
+  _globals['_REQUEST']._serialized_start=134
+  _globals['_REQUEST']._serialized_end=191
+  _globals['_RESPONSE']._serialized_start=193
+  _globals['_RESPONSE']._serialized_end=249
+  _globals['_CLIINFO']._serialized_start=251
+  _globals['_CLIINFO']._serialized_end=348
+  _globals['_CLIID']._serialized_start=350
+  _globals['_CLIID']._serialized_end=373
+  _globals['_SERINFO']._serialized_start=375
+  _globals['_SERINFO']._serialized_end=468
+  _globals['_KV']._serialized_start=470
+  _globals['_KV']._serialized_end=521
+  _globals['_BATCH']._serialized_start=523
+  _globals['_BATCH']._serialized_end=574
+  _globals['_RESULT']._serialized_start=576
+  _globals['_RESULT']._serialized_end=643
+  _globals['_BATCHRESPONSE']._serialized_start=645
+  _globals['_BATCHRESPONSE']._serialized_end=720
+  _globals['_CHANGEINFO']._serialized_start=722
+  _globals['_CHANGEINFO']._serialized_end=793
+  _globals['_MANAGESERVICE']._serialized_start=796
+  _globals['_MANAGESERVICE']._serialized_end=1256
 # @@protoc_insertion_point(module_scope)
@@ -74,6 +74,21 @@ class manageServiceStub(object):
                 request_serializer=mapb__pb2.Request.SerializeToString,
                 response_deserializer=mapb__pb2.Response.FromString,
                 _registered_method=True)
+        self.MultiGet = channel.unary_unary(
+                '/mapb.manageService/MultiGet',
+                request_serializer=mapb__pb2.Batch.SerializeToString,
+                response_deserializer=mapb__pb2.BatchResponse.FromString,
+                _registered_method=True)
+        self.MultiPut = channel.unary_unary(
+                '/mapb.manageService/MultiPut',
+                request_serializer=mapb__pb2.Batch.SerializeToString,
+                response_deserializer=mapb__pb2.Response.FromString,
+                _registered_method=True)
+        self.MultiDel = channel.unary_unary(
+                '/mapb.manageService/MultiDel',
+                request_serializer=mapb__pb2.Batch.SerializeToString,
+                response_deserializer=mapb__pb2.Response.FromString,
+                _registered_method=True)
 
 
 class manageServiceServicer(object):
@@ -127,6 +142,24 @@ class manageServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def MultiGet(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def MultiPut(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def MultiDel(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_manageServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -170,6 +203,21 @@ def add_manageServiceServicer_to_server(servicer, server):
                     request_deserializer=mapb__pb2.Request.FromString,
                     response_serializer=mapb__pb2.Response.SerializeToString,
             ),
+            'MultiGet': grpc.unary_unary_rpc_method_handler(
+                    servicer.MultiGet,
+                    request_deserializer=mapb__pb2.Batch.FromString,
+                    response_serializer=mapb__pb2.BatchResponse.SerializeToString,
+            ),
+            'MultiPut': grpc.unary_unary_rpc_method_handler(
+                    servicer.MultiPut,
+                    request_deserializer=mapb__pb2.Batch.FromString,
+                    response_serializer=mapb__pb2.Response.SerializeToString,
+            ),
+            'MultiDel': grpc.unary_unary_rpc_method_handler(
+                    servicer.MultiDel,
+                    request_deserializer=mapb__pb2.Batch.FromString,
+                    response_serializer=mapb__pb2.Response.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'mapb.manageService', rpc_method_handlers)
@@ -396,3 +444,84 @@ class manageService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def MultiGet(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/mapb.manageService/MultiGet',
+            mapb__pb2.Batch.SerializeToString,
+            mapb__pb2.BatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def MultiPut(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/mapb.manageService/MultiPut',
+            mapb__pb2.Batch.SerializeToString,
+            mapb__pb2.Response.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def MultiDel(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/mapb.manageService/MultiDel',
+            mapb__pb2.Batch.SerializeToString,
+            mapb__pb2.Response.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nstpb.proto\x12\x04stpb\"G\n\tStRequest\x12\x0e\n\x06\x63li_id\x18\x01 \x01(\x05\x12\x0b\n\x03key\x18\x02 \x01(\t\x12\x0e\n\x06\x64\x65lete\x18\x03 \x01(\x08\x12\r\n\x05token\x18\x04 \x01(\t\"A\n\x04StKV\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t\x12\x0e\n\x06\x63li_id\x18\x03 \x01(\x05\x12\r\n\x05token\x18\x04 \x01(\t\"7\n\x07StEmpty\x12\r\n\x05\x65mpty\x18\x01 \x01(\t\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t\":\n\nStResponse\x12\r\n\x05value\x18\x01 \x01(\t\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t2\x91\x03\n\x12storagementService\x12,\n\x07getdata\x12\x0f.stpb.StRequest\x1a\x10.stpb.StResponse\x12$\n\x07putdata\x12\n.stpb.StKV\x1a\r.stpb.StEmpty\x12)\n\x07\x64\x65ldata\x12\x0f.stpb.StRequest\x1a\r.stpb.StEmpty\x12.\n\tmaGetdata\x12\x0f.stpb.StRequest\x1a\x10.stpb.StResponse\x12&\n\tmaPutdata\x12\n.stpb.StKV\x1a\r.stpb.StEmpty\x12+\n\tmaDeldata\x12\x0f.stpb.StRequest\x1a\r.stpb.StEmpty\x12\'\n\x05\x61\x62ort\x12\x0f.stpb.StRequest\x1a\r.stpb.StEmpty\x12(\n\x06\x63ommit\x12\x0f.stpb.StRequest\x1a\r.stpb.StEmpty\x12$\n\x04live\x12\r.stpb.StEmpty\x1a\r.stpb.StEmptyB\x11Z\x0f../storageprotob\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nstpb.proto\x12\x04stpb\"U\n\tStRequest\x12\x0e\n\x06\x63li_id\x18\x01 \x01(\x05\x12\x0b\n\x03key\x18\x02 \x01(\t\x12\x0e\n\x06\x64\x65lete\x18\x03 \x01(\x08\x12\r\n\x05token\x18\x04 \x01(\t\x12\x0c\n\x04txid\x18\x05 \x01(\x03\"\\\n\x04StKV\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x0c\x12\x0e\n\x06\x63li_id\x18\x03 \x01(\x05\x12\r\n\x05token\x18\x04 \x01(\t\x12\x0b\n\x03ttl\x18\x05 \x01(\x01\x12\x0c\n\x04txid\x18\x06 \x01(\x03\"7\n\x07StEmpty\x12\r\n\x05\x65mpty\x18\x01 \x01(\t\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t\":\n\nStResponse\x12\r\n\x05value\x18\x01 \x01(\x0c\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t\"T\n\x06StLive\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t\x12\r\n\x05\x62loom\x18\x05 \x01(\x0c\x12\r\n\x05nbits\x18\x06 \x01(\x05\x12\r\n\x05nhash\x18\x07 \x01(\x05\"\x88\x01\n\x06StScan\x12\x0e\n\x06\x63li_id\x18\x01 \x01(\x05\x12\r\n\x05token\x18\x02 \x01(\t\x12\r\n\x05start\x18\x03 \x01(\t\x12\x0b\n\x03\x65nd\x18\x04 \x01(\t\x12\x0e\n\x06prefix\x18\x05 \x01(\t\x12\r\n\x05limit\x18\x06 \x01(\x05\x12\x11\n\tpage_size\x18\x07 \x01(\x05\x12\x11\n\tkeys_only\x18\x08 \x01(\x08\".\n\nStSnapshot\x12\x11\n\tserver_id\x18\x01 \x01(\x05\x12\r\n\x05token\x18\x02 \x01(\t\"b\n\x07StChunk\x12\x0e\n\x06\x63li_id\x18\x01 \x01(\x05\x12\x0b\n\x03key\x18\x02 \x01(\t\x12\r\n\x05token\x18\x03 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x04 \x01(\x0c\x12\r\n\x05\x65rrno\x18\x05 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x06 \x01(\t\"$\n\x06StItem\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x0c\"D\n\x06StPage\x12\x1b\n\x05items\x18\x01 \x03(\x0b\x32\x0c.stpb.StItem\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t\"Q\n\x07StBatch\x12\x0e\n\x06\x63li_id\x18\x01 \x01(\x05\x12\r\n\x05token\x18\x02 \x01(\t\x12\x19\n\x05items\x18\x03 \x03(\x0b\x32\n.stpb.StKV\x12\x0c\n\x04txid\x18\x04 \x01(\x03\"E\n\x08StResult\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x0c\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t\"K\n\x0bStBatchResp\x12\x1d\n\x05items\x18\x01 \x03(\x0b\x32\x0e.stpb.StResult\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t\"g\n\x04StOp\x12\x0b\n\x03tag\x18\x01 \x01(\x03\x12\n\n\x02op\x18\x02 \x01(\t\x12\x0b\n\x03key\x18\x03 \x01(\t\x12\r\n\x05value\x18\x04 \x01(\x0c\x12\x0b\n\x03ttl\x18\x05 \x01(\x01\x12\x0e\n\x06\x63li_id\x18\x06 \x01(\x05\x12\r\n\x05token\x18\x07 \x01(\t\"G\n\nStOpResult\x12\x0b\n\x03tag\x18\x01 \x01(\x03\x12\r\n\x05value\x18\x02 \x01(\x0c\x12\r\n\x05\x65rrno\x18\x03 \x01(\x08\x12\x0e\n\x06\x65rrmes\x18\x04 \x01(\t2\xff\x06\n\x12storagementService\x12,\n\x07getdata\x12\x0f.stpb.StRequest\x1a\x10.stpb.StResponse\x12$\n\x07putdata\x12\n.stpb.StKV\x1a\r.stpb.StEmpty\x12)\n\x07\x64\x65ldata\x12\x0f.stpb.StRequest\x1a\r.stpb.StEmpty\x12.\n\tmaGetdata\x12\x0f.stpb.StRequest\x1a\x10.stpb.StResponse\x12&\n\tmaPutdata\x12\n.stpb.StKV\x1a\r.stpb.StEmpty\x12+\n\tmaDeldata\x12\x0f.stpb.StRequest\x1a\r.stpb.StEmpty\x12\'\n\x05\x61\x62ort\x12\x0f.stpb.StRequest\x1a\r.stpb.StEmpty\x12(\n\x06\x63ommit\x12\x0f.stpb.StRequest\x1a\r.stpb.StEmpty\x12#\n\x04live\x12\r.stpb.StEmpty\x1a\x0c.stpb.StLive\x12$\n\x04scan\x12\x0c.stpb.StScan\x1a\x0c.stpb.StPage0\x01\x12,\n\x08snapshot\x12\x10.stpb.StSnapshot\x1a\x0c.stpb.StPage0\x01\x12+\n\tputstream\x12\r.stpb.StChunk\x1a\r.stpb.StEmpty(\x01\x12-\n\tgetstream\x12\x0f.stpb.StRequest\x1a\r.stpb.StChunk0\x01\x12,\n\x08mgetdata\x12\r.stpb.StBatch\x1a\x11.stpb.StBatchResp\x12,\n\x08mputdata\x12\r.stpb.StBatch\x1a\x11.stpb.StBatchResp\x12,\n\x08mdeldata\x12\r.stpb.StBatch\x1a\x11.stpb.StBatchResp\x12.\n\nmaMGetdata\x12\r.stpb.StBatch\x1a\x11.stpb.StBatchResp\x12*\n\nmaMPutdata\x12\r.stpb.StBatch\x1a\r.stpb.StEmpty\x12*\n\nmaMDeldata\x12\r.stpb.StBatch\x1a\r.stpb.StEmpty\x12+\n\x07session\x12\n.stpb.StOp\x1a\x10.stpb.StOpResult(\x01\x30\x01\x42\x11Z\x0f../storageprotob\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -33,13 +33,35 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['DESCRIPTOR']._loaded_options = None
   _globals['DESCRIPTOR']._serialized_options = b'Z\017../storageproto'
   _globals['_STREQUEST']._serialized_start=20
-  _globals['_STREQUEST']._serialized_end=91
-  _globals['_STKV']._serialized_start=93
-  _globals['_STKV']._serialized_end=158
-  _globals['_STEMPTY']._serialized_start=160
-  _globals['_STEMPTY']._serialized_end=215
-  _globals['_STRESPONSE']._serialized_start=217
-  _globals['_STRESPONSE']._serialized_end=275
-  _globals['_STORAGEMENTSERVICE']._serialized_start=278
-  _globals['_STORAGEMENTSERVICE']._serialized_end=679
+  _globals['_STREQUEST']._serialized_end=105
+  _globals['_STKV']._serialized_start=107
+  _globals['_STKV']._serialized_end=199
+  _globals['_STEMPTY']._serialized_start=201
+  _globals['_STEMPTY']._serialized_end=256
+  _globals['_STRESPONSE']._serialized_start=258
+  _globals['_STRESPONSE']._serialized_end=316
+  _globals['_STLIVE']._serialized_start=318
+  _globals['_STLIVE']._serialized_end=402
+  _globals['_STSCAN']._serialized_start=405
+  _globals['_STSCAN']._serialized_end=541
+  _globals['_STSNAPSHOT']._serialized_start=543
+  _globals['_STSNAPSHOT']._serialized_end=589
+  _globals['_STCHUNK']._serialized_start=591
+  _globals['_STCHUNK']._serialized_end=689
+  _globals['_STITEM']._serialized_start=691
+  _globals['_STITEM']._serialized_end=727
+  _globals['_STPAGE']._serialized_start=729
+  _globals['_STPAGE']._serialized_end=797
+  _globals['_STBATCH']._serialized_start=799
+  _globals['_STBATCH']._serialized_end=880
+  _globals['_STRESULT']._serialized_start=882
+  _globals['_STRESULT']._serialized_end=951
+  _globals['_STBATCHRESP']._serialized_start=953
+  _globals['_STBATCHRESP']._serialized_end=1028
+  _globals['_STOP']._serialized_start=1030
+  _globals['_STOP']._serialized_end=1133
+  _globals['_STOPRESULT']._serialized_start=1135
+  _globals['_STOPRESULT']._serialized_end=1206
+  _globals['_STORAGEMENTSERVICE']._serialized_start=1209
+  _globals['_STORAGEMENTSERVICE']._serialized_end=2104
 # @@protoc_insertion_point(module_scope)
@@ -77,8 +77,63 @@ class storagementServiceStub(object):
         self.live = channel.unary_unary(
                 '/stpb.storagementService/live',
                 request_serializer=stpb__pb2.StEmpty.SerializeToString,
+                response_deserializer=stpb__pb2.StLive.FromString,
+                _registered_method=True)
+        self.scan = channel.unary_stream(
+                '/stpb.storagementService/scan',
+                request_serializer=stpb__pb2.StScan.SerializeToString,
+                response_deserializer=stpb__pb2.StPage.FromString,
+                _registered_method=True)
+        self.snapshot = channel.unary_stream(
+                '/stpb.storagementService/snapshot',
+                request_serializer=stpb__pb2.StSnapshot.SerializeToString,
+                response_deserializer=stpb__pb2.StPage.FromString,
+                _registered_method=True)
+        self.putstream = channel.stream_unary(
+                '/stpb.storagementService/putstream',
+                request_serializer=stpb__pb2.StChunk.SerializeToString,
+                response_deserializer=stpb__pb2.StEmpty.FromString,
+                _registered_method=True)
+        self.getstream = channel.unary_stream(
+                '/stpb.storagementService/getstream',
+                request_serializer=stpb__pb2.StRequest.SerializeToString,
+                response_deserializer=stpb__pb2.StChunk.FromString,
+                _registered_method=True)
+        self.mgetdata = channel.unary_unary(
+                '/stpb.storagementService/mgetdata',
+                request_serializer=stpb__pb2.StBatch.SerializeToString,
+                response_deserializer=stpb__pb2.StBatchResp.FromString,
+                _registered_method=True)
+        self.mputdata = channel.unary_unary(
+                '/stpb.storagementService/mputdata',
+                request_serializer=stpb__pb2.StBatch.SerializeToString,
+                response_deserializer=stpb__pb2.StBatchResp.FromString,
+                _registered_method=True)
+        self.mdeldata = channel.unary_unary(
+                '/stpb.storagementService/mdeldata',
+                request_serializer=stpb__pb2.StBatch.SerializeToString,
+                response_deserializer=stpb__pb2.StBatchResp.FromString,
+                _registered_method=True)
+        self.maMGetdata = channel.unary_unary(
+                '/stpb.storagementService/maMGetdata',
+                request_serializer=stpb__pb2.StBatch.SerializeToString,
+                response_deserializer=stpb__pb2.StBatchResp.FromString,
+                _registered_method=True)
+        self.maMPutdata = channel.unary_unary(
+                '/stpb.storagementService/maMPutdata',
+                request_serializer=stpb__pb2.StBatch.SerializeToString,
                 response_deserializer=stpb__pb2.StEmpty.FromString,
                 _registered_method=True)
+        self.maMDeldata = channel.unary_unary(
+                '/stpb.storagementService/maMDeldata',
+                request_serializer=stpb__pb2.StBatch.SerializeToString,
+                response_deserializer=stpb__pb2.StEmpty.FromString,
+                _registered_method=True)
+        self.session = channel.stream_stream(
+                '/stpb.storagementService/session',
+                request_serializer=stpb__pb2.StOp.SerializeToString,
+                response_deserializer=stpb__pb2.StOpResult.FromString,
+                _registered_method=True)
 
 
 class storagementServiceServicer(object):
@@ -138,6 +193,72 @@ class storagementServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def scan(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def snapshot(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def putstream(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def getstream(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def mgetdata(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def mputdata(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def mdeldata(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def maMGetdata(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def maMPutdata(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def maMDeldata(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def session(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_storagementServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -184,8 +305,63 @@ def add_storagementServiceServicer_to_server(servicer, server):
             'live': grpc.unary_unary_rpc_method_handler(
                     servicer.live,
                     request_deserializer=stpb__pb2.StEmpty.FromString,
+                    response_serializer=stpb__pb2.StLive.SerializeToString,
+            ),
+            'scan': grpc.unary_stream_rpc_method_handler(
+                    servicer.scan,
+                    request_deserializer=stpb__pb2.StScan.FromString,
+                    response_serializer=stpb__pb2.StPage.SerializeToString,
+            ),
+            'snapshot': grpc.unary_stream_rpc_method_handler(
+                    servicer.snapshot,
+                    request_deserializer=stpb__pb2.StSnapshot.FromString,
+                    response_serializer=stpb__pb2.StPage.SerializeToString,
+            ),
+            'putstream': grpc.stream_unary_rpc_method_handler(
+                    servicer.putstream,
+                    request_deserializer=stpb__pb2.StChunk.FromString,
+                    response_serializer=stpb__pb2.StEmpty.SerializeToString,
+            ),
+            'getstream': grpc.unary_stream_rpc_method_handler(
+                    servicer.getstream,
+                    request_deserializer=stpb__pb2.StRequest.FromString,
+                    response_serializer=stpb__pb2.StChunk.SerializeToString,
+            ),
+            'mgetdata': grpc.unary_unary_rpc_method_handler(
+                    servicer.mgetdata,
+                    request_deserializer=stpb__pb2.StBatch.FromString,
+                    response_serializer=stpb__pb2.StBatchResp.SerializeToString,
+            ),
+            'mputdata': grpc.unary_unary_rpc_method_handler(
+                    servicer.mputdata,
+                    request_deserializer=stpb__pb2.StBatch.FromString,
+                    response_serializer=stpb__pb2.StBatchResp.SerializeToString,
+            ),
+            'mdeldata': grpc.unary_unary_rpc_method_handler(
+                    servicer.mdeldata,
+                    request_deserializer=stpb__pb2.StBatch.FromString,
+                    response_serializer=stpb__pb2.StBatchResp.SerializeToString,
+            ),
+            'maMGetdata': grpc.unary_unary_rpc_method_handler(
+                    servicer.maMGetdata,
+                    request_deserializer=stpb__pb2.StBatch.FromString,
+                    response_serializer=stpb__pb2.StBatchResp.SerializeToString,
+            ),
+            'maMPutdata': grpc.unary_unary_rpc_method_handler(
+                    servicer.maMPutdata,
+                    request_deserializer=stpb__pb2.StBatch.FromString,
                     response_serializer=stpb__pb2.StEmpty.SerializeToString,
             ),
+            'maMDeldata': grpc.unary_unary_rpc_method_handler(
+                    servicer.maMDeldata,
+                    request_deserializer=stpb__pb2.StBatch.FromString,
+                    response_serializer=stpb__pb2.StEmpty.SerializeToString,
+            ),
+            'session': grpc.stream_stream_rpc_method_handler(
+                    servicer.session,
+                    request_deserializer=stpb__pb2.StOp.FromString,
+                    response_serializer=stpb__pb2.StOpResult.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'stpb.storagementService', rpc_method_handlers)
@@ -429,6 +605,249 @@ class storagementService(object):
             target,
             '/stpb.storagementService/live',
             stpb__pb2.StEmpty.SerializeToString,
+            stpb__pb2.StLive.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def scan(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/stpb.storagementService/scan',
+            stpb__pb2.StScan.SerializeToString,
+            stpb__pb2.StPage.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def snapshot(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/stpb.storagementService/snapshot',
+            stpb__pb2.StSnapshot.SerializeToString,
+            stpb__pb2.StPage.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def putstream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/stpb.storagementService/putstream',
+            stpb__pb2.StChunk.SerializeToString,
+            stpb__pb2.StEmpty.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def getstream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/stpb.storagementService/getstream',
+            stpb__pb2.StRequest.SerializeToString,
+            stpb__pb2.StChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def mgetdata(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/stpb.storagementService/mgetdata',
+            stpb__pb2.StBatch.SerializeToString,
+            stpb__pb2.StBatchResp.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def mputdata(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/stpb.storagementService/mputdata',
+            stpb__pb2.StBatch.SerializeToString,
+            stpb__pb2.StBatchResp.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def mdeldata(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/stpb.storagementService/mdeldata',
+            stpb__pb2.StBatch.SerializeToString,
+            stpb__pb2.StBatchResp.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def maMGetdata(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/stpb.storagementService/maMGetdata',
+            stpb__pb2.StBatch.SerializeToString,
+            stpb__pb2.StBatchResp.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def maMPutdata(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/stpb.storagementService/maMPutdata',
+            stpb__pb2.StBatch.SerializeToString,
             stpb__pb2.StEmpty.FromString,
             options,
             channel_credentials,
@@ -439,3 +858,57 @@ class storagementService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def maMDeldata(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/stpb.storagementService/maMDeldata',
+            stpb__pb2.StBatch.SerializeToString,
+            stpb__pb2.StEmpty.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def session(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/stpb.storagementService/session',
+            stpb__pb2.StOp.SerializeToString,
+            stpb__pb2.StOpResult.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -4,6 +4,7 @@ import time
 import grpc
 import threading
 import os
+import queue
 
 from concurrent import futures
 from threading import Lock
@@ -12,6 +13,9 @@ from protos import mapb_pb2 as mapb
 from protos import mapb_pb2_grpc as mapb_grpc
 from protos import stpb_pb2 as stpb
 from protos import stpb_pb2_grpc as stpb_grpc
+from common.bloom import BloomFilter
+from common.channels import ChannelPool
+from common.locks import WriterPreferringRWLock
 from params import params
 
 class SerNode:
@@ -20,14 +24,47 @@ class SerNode:
         self.port = port
         self.id = sid
         self.token = token
+        # 节点随心跳发布的键布隆过滤器, None 表示尚未收到, 此时视为可能持有任意键
+        self.bloom: BloomFilter | None = None
+        # 心跳进行期间提交到该节点的键, 心跳返回的过滤器可能未包含它们
+        self.recent: set[str] | None = None
+
+    def might_hold(self, key: str) -> bool:
+        return self.bloom is None or key in self.bloom
+
+    def record_key(self, key: str):
+        if self.bloom is not None:
+            self.bloom.add(key)
+        if self.recent is not None:
+            self.recent.add(key)
+
+class KeyLocks:
+    """按键哈希分段的锁: 同一键的写入串行执行, 不同键的写入落在不同分段时可以并发"""
+    def __init__(self, stripes: int = 1024):
+        self.locks = [Lock() for _ in range(max(1, stripes))]
+
+    def get(self, key: str) -> Lock:
+        return self.locks[hash(key) % len(self.locks)]
+
+    def get_many(self, keys) -> list[Lock]:
+        """多个键对应的分段锁, 去重并按分段顺序排列, 批量操作按此顺序加锁以避免死锁"""
+        return [self.locks[i] for i in sorted({hash(key) % len(self.locks) for key in keys})]
 
 class ManageService(mapb_grpc.manageServiceServicer):
-    def __init__(self, ip:str, port:str, interval_seconds: int = 10):
+    def __init__(self, ip:str, port:str, interval_seconds: int = 10, lock_stripes: int = 1024,
+                 phase_timeout: float = 5.0):
         self.ip = ip
         self.port = port
         self.servermap: dict[int, SerNode] = {}
         self.clientmap: dict[int, str] = {}
-        self.mu = Lock()
+        # 写入/删除持有 members 的读锁与键所在分段的锁; 节点注册持有 members 的写锁, 与进行中的写入互斥,
+        # 写优先保证繁忙时新节点也能注册
+        self.members = WriterPreferringRWLock()
+        self.keylocks = KeyLocks(lock_stripes)
+        # 两阶段提交每个阶段的截止时间(秒), 各节点的请求并发发出, 共用同一截止时间
+        self.phase_timeout = phase_timeout
+        # 到各存储节点的长连接, 节点下线或心跳失败时关闭
+        self.pool = ChannelPool()
         self.interval = interval_seconds
         self._stop = False
 
@@ -49,6 +86,11 @@ class ManageService(mapb_grpc.manageServiceServicer):
     def _rand_id(self) -> int:
         return random.randint(1, 2**31-1)
 
+    @staticmethod
+    def _new_txid() -> int:
+        """两阶段提交的事务id, 存储节点据此区分同时处于准备阶段的多个事务"""
+        return random.randrange(1, 1 << 63)
+
     def getServerId(self) -> int:
         sid = self._rand_id()
         while sid in self.servermap:
@@ -91,10 +133,29 @@ class ManageService(mapb_grpc.manageServiceServicer):
         ip = request.ip
         port = request.port
         token = request.token
-        sid = self.getServerId()
-        self.servermap[sid] = SerNode(ip=ip, port=port, sid=sid, token=token)
+        sid = request.server_id
+        # 与写入/删除互斥, 注册之后发起的提交都会广播到新节点, 之前的提交已在其他节点上完成
+        self.members.acquire_write()
+        try:
+            old = self.servermap.get(sid)
+            if sid <= 0 or (old is not None and old.ip + old.port != ip + port):
+                # 未指定或已被其他地址占用的 id 重新分配
+                sid = self.getServerId()
+            elif old is not None:
+                # 同一地址的节点重启时心跳尚未移除旧记录, 沿用原 id 重新绑定
+                self.logger.info(f"存储服务器{sid} 重新注册, 替换旧记录")
+                self.pool.evict(old.ip + old.port)
+            peers = [ser for ser_id, ser in self.servermap.items() if ser_id != sid]
+            self.servermap[sid] = SerNode(ip=ip, port=port, sid=sid, token=token)
+        finally:
+            self.members.release_write()
         self.logger.info(f"存储服务器 {ip}{port} 注册 分配id为: {sid}")
-        return mapb.SerInfo(server_id=sid, errno=True)
+        if not peers:
+            return mapb.SerInfo(server_id=sid, errno=True)
+        # 指定一个健康节点供新节点拉取快照
+        peer = random.choice(peers)
+        self.logger.info(f"存储服务器{sid} 可从存储服务器{peer.id} 拉取快照")
+        return mapb.SerInfo(server_id=sid, errno=True, peer=peer.ip + peer.port, peer_token=peer.token)
 
     def offline(self, request: mapb.SerInfo, context) -> mapb.Empty:
         sid = request.server_id
@@ -102,6 +163,7 @@ class ManageService(mapb_grpc.manageServiceServicer):
         if node:
             ip, port = node.ip, node.port
             del self.servermap[sid]
+            self.pool.evict(ip + port)
             self.logger.info(f"存储服务器 {ip}{port} 注消")
         return mapb.Empty(errno=True)
 
@@ -110,151 +172,253 @@ class ManageService(mapb_grpc.manageServiceServicer):
         ser_id = request.server_id
         key = request.key
         self.logger.info(f"存储服务器{ser_id} 请求键值{key}")
-        values = []
-        self.logger.info(f"正在从其他存储服务器收集键值{key}")
-        for sid, ser in self.servermap.items():
+        targets: dict[int, str] = {}
+        skipped = 0
+        for sid, ser in list(self.servermap.items()):
             if sid == ser_id:
                 continue
-            ip, port = ser.ip, ser.port
-            target = ip + port
-            self.logger.info(f"向存储服务器{sid} 请求键值{key}")
-            try:
-                with grpc.insecure_channel(target) as ch:
-                    client = stpb_grpc.storagementServiceStub(ch)
-                    resp = client.maGetdata(stpb.StRequest(cli_id=0, key=key))
-            except Exception as e:
-                self.logger.error(e)
+            if not ser.might_hold(key):
+                skipped += 1
                 continue
-            if not resp.errno:
-                self.logger.info(f"无法从存储服务器{sid} 获取键值{key} ,{resp.errmes}")
-                continue
-            else:
+            targets[sid] = ser.ip + ser.port
+        if skipped:
+            self.logger.info(f"根据布隆过滤器跳过 {skipped} 个不持有键值{key} 的存储服务器")
+        self.logger.info(f"正在从{len(targets)}个存储服务器收集键值{key}")
+        # 某个值的票数超过被询问节点的半数即可返回, 其余节点的结果不会改变多数
+        quorum = len(targets) // 2
+        count_map: dict[bytes, int] = {}
+        find_value = b""
+        cnt = 0
+        calls = self._gather(targets, "maGetdata", stpb.StRequest(cli_id=0, key=key))
+        try:
+            for sid, resp in calls:
+                if isinstance(resp, Exception):
+                    self.logger.error(resp)
+                    continue
+                if not resp.errno:
+                    self.logger.info(f"无法从存储服务器{sid} 获取键值{key} ,{resp.errmes}")
+                    continue
                 self.logger.info(f"存储服务器{sid} 响应了键值{key} 请求")
-            values.append(resp.value)
-        maxnum = len(values)
+                count_map[resp.value] = count_map.get(resp.value, 0) + 1
+                if count_map[resp.value] > cnt:
+                    find_value = resp.value
+                    cnt = count_map[resp.value]
+                if cnt > quorum:
+                    self.logger.info(f"键值{key} 达成一致, 取消其余请求")
+                    return mapb.Response(value=find_value, errno=True)
+        finally:
+            calls.close()
+        maxnum = sum(count_map.values())
         if maxnum == 0:
             return mapb.Response(errno=False, errmes=f"暂时缺少键值{key}")
         self.logger.info(f"从存储服务器中共收集{maxnum}个键值{key},检测一致性")
-        count_map: dict[str, int] = {}
-        find_value = ""
-        cnt = 0
-        for v in values:
-            count_map[v] = count_map.get(v, 0) + 1
-            if count_map[v] > cnt:
-                find_value = v
-                cnt = count_map[v]
         if cnt > maxnum // 2:
             self.logger.info(f"键值{key} 达成一致")
             return mapb.Response(value=find_value, errno=True)
         self.logger.info(f"键值{key} 未能达成一致")
         return mapb.Response(errno=False, errmes=f"其他服务器对键值{key} 无法达成一致")
 
+    def _gather(self, targets: dict[int, str], method: str, request):
+        """向多个存储节点并发发起同一请求, 按完成顺序产出 (节点id, 响应或异常);
+        迭代提前结束时取消尚未完成的请求"""
+        done: queue.Queue = queue.Queue()
+        calls = {}
+        try:
+            for sid, target in targets.items():
+                client = self.pool.stub(target, stpb_grpc.storagementServiceStub)
+                call = getattr(client, method).future(request, timeout=self.phase_timeout)
+                call.add_done_callback(lambda c, sid=sid: done.put((sid, c)))
+                calls[sid] = call
+            for _ in range(len(calls)):
+                sid, call = done.get()
+                try:
+                    resp = call.result()
+                except Exception as e:
+                    resp = e
+                yield sid, resp
+        finally:
+            for call in calls.values():
+                call.cancel()
+
+    def _broadcast(self, targets: dict[int, str], method: str, request) -> dict[int, object]:
+        """向多个存储节点并发发起同一请求并等待全部返回, 结果为响应或调用时抛出的异常"""
+        return dict(self._gather(targets, method, request))
+
+    def _prepare_all(self, key: str, method: str, request, action: str) -> tuple[bool, dict[int, str]]:
+        """准备阶段: 返回是否全部同意, 以及需要在第二阶段通知的节点"""
+        targets = {sid: ser.ip + ser.port for sid, ser in list(self.servermap.items())}
+        self.logger.info(f"向{len(targets)}个存储服务器广播键值{key} {action}")
+        hasprc: dict[int, str] = {}
+        flag = True
+        for sid, resp in self._broadcast(targets, method, request).items():
+            if isinstance(resp, Exception):
+                # 调用出错的节点可能已经完成准备并持有键锁, 视为拒绝, 之后一并撤销
+                self.logger.info(f"存储服务器{sid} 未能响应键值{key} {action}, {resp}")
+                flag = False
+            elif not resp.errno:
+                self.logger.info(f"存储服务器{sid} 拒绝{action}键值{key}, {resp.errmes}")
+                flag = False
+            else:
+                self.logger.info(f"存储服务器{sid} 同意{action}键值{key}, {resp.errmes}")
+            hasprc[sid] = targets[sid]
+        return flag, hasprc
+
+    def _finish_all(self, hasprc: dict[int, str], method: str, request) -> list[int]:
+        """第二阶段: 并发通知提交或撤销; 未确认的节点仍处于准备状态并持有键锁,
+        因此持续重试, 直到确认或该节点被移出集群"""
+        done = []
+        pending = dict(hasprc)
+        delay = 0.05
+        while pending:
+            for sid, resp in self._broadcast(pending, method, request).items():
+                if isinstance(resp, Exception):
+                    self.logger.error(resp)
+                    continue
+                done.append(sid)
+                del pending[sid]
+            pending = {sid: target for sid, target in pending.items() if sid in self.servermap}
+            if pending:
+                self.logger.info(f"{len(pending)}个存储服务器未确认{method}, {delay:.2f}s 后重试")
+                time.sleep(delay)
+                delay = min(delay * 2, 1)
+        return done
+
     @verify_node
     def Put(self, request: mapb.KV, context) -> mapb.Response:
-        self.mu.acquire()
+        lock = self.keylocks.get(request.key)
+        self.members.acquire_read()
+        lock.acquire()
         try:
             key = request.key
             value = request.value
             ser_id = request.server_id
             self.logger.info(f"存储服务器{ser_id} 申请提交键值{key}")
-            hasprc: dict[int, str] = {}
-            flag = True
-            for sid, ser in self.servermap.items():
-                ip, port = ser.ip, ser.port
-                target = ip + port
-                self.logger.info(f"向存储服务器{sid} 广播键值{key} 提交")
-                try:
-                    with grpc.insecure_channel(target) as ch:
-                        client = stpb_grpc.storagementServiceStub(ch)
-                        resp = client.maPutdata(stpb.StKV(key=key, value=value))
-                except Exception as e:
-                    self.logger.error(e)
-                    continue
-                if not resp.errno:
-                    self.logger.info(f"存储服务器{sid} 拒绝写入键值{key}, {resp.errmes}")
-                    flag = False
-                else:
-                    self.logger.info(f"存储服务器{sid} 同意写入键值{key}, {resp.errmes}")
-                hasprc[sid] = target
+            txid = self._new_txid()
+            flag, hasprc = self._prepare_all(key, "maPutdata", stpb.StKV(key=key, value=value, txid=txid), "写入")
             if flag:
                 self.logger.info(f"存储服务器达成共识, 写入本次键值{key}")
-                for target in hasprc.values():
-                    try:
-                        with grpc.insecure_channel(target) as ch:
-                            client = stpb_grpc.storagementServiceStub(ch)
-                            client.commit(stpb.StRequest(key=key, delete=False))
-                    except Exception as e:
-                        self.logger.error(e)
-                        continue
+                for sid in self._finish_all(hasprc, "commit", stpb.StRequest(key=key, delete=False, txid=txid)):
+                    ser = self.servermap.get(sid)
+                    if ser is not None:
+                        ser.record_key(key)
             else:
                 self.logger.info(f"存储服务器未达成共识, 拒绝写入键值{key}")
-                for target in hasprc.values():
-                    try:
-                        with grpc.insecure_channel(target) as ch:
-                            client = stpb_grpc.storagementServiceStub(ch)
-                            client.abort(stpb.StRequest(key=key, delete=False))
-                    except Exception as e:
-                        self.logger.error(e)
-                        continue
+                self._finish_all(hasprc, "abort", stpb.StRequest(key=key, delete=False, txid=txid))
                 self.logger.info(f"本次键值{key} 提交无效")
                 return mapb.Response(errno=False, errmes="提交失败")
             self.logger.info(f"本次键值{key} 提交生效")
             return mapb.Response(errno=True)
         finally:
-            self.mu.release()
+            lock.release()
+            self.members.release_read()
 
     @verify_node
     def Del(self, request: mapb.Request, context) -> mapb.Response:
-        self.mu.acquire()
+        lock = self.keylocks.get(request.key)
+        self.members.acquire_read()
+        lock.acquire()
         try:
             key = request.key
             ser_id = request.server_id
             self.logger.info(f"存储服务器{ser_id} 申请删除键值{key}")
-            hasprc: dict[int, str] = {}
-            flag = True
-            for sid, ser in self.servermap.items():
-                ip, port = ser.ip, ser.port
-                target = ip + port
-                self.logger.info(f"向存储服务器{sid} 广播键值{key} 删除")
-                try:
-                    with grpc.insecure_channel(target) as ch:
-                        client = stpb_grpc.storagementServiceStub(ch)
-                        resp = client.maDeldata(stpb.StRequest(key=key))
-                except Exception as e:
-                    self.logger.error(e)
-                    continue
-                if not resp.errno:
-                    self.logger.info(f"存储服务器{sid} 拒绝删除键值{key}, {resp.errmes}")
-                    flag = False
-                else:
-                    self.logger.info(f"存储服务器{sid} 同意删除键值{key}, {resp.errmes}")
-                hasprc[sid] = target
+            txid = self._new_txid()
+            flag, hasprc = self._prepare_all(key, "maDeldata", stpb.StRequest(key=key, txid=txid), "删除")
             if flag:
                 self.logger.info(f"存储服务器达成共识,删除键值{key}")
-                for target in hasprc.values():
-                    try:
-                        with grpc.insecure_channel(target) as ch:
-                            client = stpb_grpc.storagementServiceStub(ch)
-                            client.commit(stpb.StRequest(key=key, delete=True))
-                    except Exception as e:
-                        self.logger.error(e)
-                        continue
+                self._finish_all(hasprc, "commit", stpb.StRequest(key=key, delete=True, txid=txid))
             else:
                 self.logger.info(f"存储服务器未达成共识, 拒绝删除键值{key}")
-                for target in hasprc.values():
-                    try:
-                        with grpc.insecure_channel(target) as ch:
-                            client = stpb_grpc.storagementServiceStub(ch)
-                            client.abort(stpb.StRequest(key=key, delete=True))
-                    except Exception as e:
-                        self.logger.error(e)
-                        continue
+                self._finish_all(hasprc, "abort", stpb.StRequest(key=key, delete=True, txid=txid))
                 self.logger.info(f"本次键值{key} 删除无效")
                 return mapb.Response(errno=False, errmes="删除失败")
             self.logger.info(f"本次键值{key} 删除生效")
             return mapb.Response(errno=True)
         finally:
-            self.mu.release()
+            lock.release()
+            self.members.release_read()
+
+    @verify_node
+    def MultiGet(self, request: mapb.Batch, context) -> mapb.BatchResponse:
+        ser_id = request.server_id
+        keys = list(dict.fromkeys(item.key for item in request.items))
+        self.logger.info(f"存储服务器{ser_id} 批量请求{len(keys)}个键值")
+        targets = {sid: ser.ip + ser.port for sid, ser in list(self.servermap.items())
+                   if sid != ser_id and any(ser.might_hold(key) for key in keys)}
+        quorum = len(targets) // 2
+        counts: dict[str, dict[bytes, int]] = {key: {} for key in keys}
+        best: dict[str, tuple[bytes, int]] = {}
+        pending = set(keys)
+        calls = self._gather(targets, "maMGetdata", stpb.StBatch(items=[stpb.StKV(key=key) for key in keys]))
+        try:
+            for sid, resp in calls:
+                if isinstance(resp, Exception):
+                    self.logger.error(resp)
+                    continue
+                for item in resp.items:
+                    if not item.errno or item.key not in counts:
+                        continue
+                    count = counts[item.key]
+                    count[item.value] = count.get(item.value, 0) + 1
+                    if count[item.value] > best.get(item.key, (b"", 0))[1]:
+                        best[item.key] = (item.value, count[item.value])
+                    if count[item.value] > quorum:
+                        pending.discard(item.key)
+                if not pending:
+                    self.logger.info(f"{len(keys)}个键值均已达成一致, 取消其余请求")
+                    break
+        finally:
+            calls.close()
+        results = []
+        for key in keys:
+            total = sum(counts[key].values())
+            value, cnt = best.get(key, (b"", 0))
+            if total == 0:
+                results.append(mapb.Result(key=key, errno=False, errmes=f"暂时缺少键值{key}"))
+            elif cnt > total // 2:
+                results.append(mapb.Result(key=key, value=value, errno=True))
+            else:
+                results.append(mapb.Result(key=key, errno=False, errmes=f"其他服务器对键值{key} 无法达成一致"))
+        return mapb.BatchResponse(items=results, errno=True)
+
+    def _multi(self, request: mapb.Batch, method: str, delete: bool, action: str) -> mapb.Response:
+        """批量写入/删除: 所有键共用一个事务id, 每个节点只经历一轮准备与提交"""
+        items = list({item.key: item for item in request.items}.values())
+        if not items:
+            return mapb.Response(errno=True)
+        keys = [item.key for item in items]
+        locks = self.keylocks.get_many(keys)
+        self.members.acquire_read()
+        for lock in locks:
+            lock.acquire()
+        try:
+            desc = f"批量({len(keys)}个键)"
+            self.logger.info(f"存储服务器{request.server_id} 申请{action}{desc}")
+            txid = self._new_txid()
+            batch = stpb.StBatch(items=[stpb.StKV(key=item.key, value=item.value) for item in items], txid=txid)
+            flag, hasprc = self._prepare_all(desc, method, batch, action)
+            if not flag:
+                self.logger.info(f"存储服务器未达成共识, 拒绝{action}{desc}")
+                self._finish_all(hasprc, "abort", stpb.StRequest(delete=delete, txid=txid))
+                return mapb.Response(errno=False, errmes=f"批量{action}失败")
+            self.logger.info(f"存储服务器达成共识, {action}{desc}")
+            for sid in self._finish_all(hasprc, "commit", stpb.StRequest(delete=delete, txid=txid)):
+                ser = self.servermap.get(sid)
+                if ser is not None and not delete:
+                    for key in keys:
+                        ser.record_key(key)
+            return mapb.Response(errno=True)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+            self.members.release_read()
+
+    @verify_node
+    def MultiPut(self, request: mapb.Batch, context) -> mapb.Response:
+        return self._multi(request, "maMPutdata", False, "写入")
+
+    @verify_node
+    def MultiDel(self, request: mapb.Batch, context) -> mapb.Response:
+        return self._multi(request, "maMDeldata", True, "删除")
 
     def disconnect(self, request: mapb.CliId, context) -> mapb.Empty:
         cid = request.cli_id
@@ -271,20 +435,29 @@ class ManageService(mapb_grpc.manageServiceServicer):
     def stop(self):
         self._stop = True
         self.live_thread.join()
+        self.pool.close()
 
     def check_all_storage_live(self):
         snapshot = self.servermap.copy()
         for sid, ser in snapshot.items():
                 ip, port = ser.ip, ser.port
                 target = ip + port
+                ser.recent = set()
                 try:
-                    with grpc.insecure_channel(target) as ch:
-                        client = stpb_grpc.storagementServiceStub(ch)
-                        client.live(stpb.StEmpty(errno=True))
+                    client = self.pool.stub(target, stpb_grpc.storagementServiceStub)
+                    resp = client.live(stpb.StEmpty(errno=True), timeout=self.phase_timeout)
                 except Exception as e:
                     self.logger.error(f"与存储服务器 {sid} ({target}) 心跳失败: {e}")
                     self.logger.warning(f"移除失联存储服务器 {sid}")
-                    del self.servermap[sid]
+                    self.servermap.pop(sid, None)
+                    self.pool.evict(target)
+                    continue
+                if resp.nbits > 0:
+                    bloom = BloomFilter(resp.nbits, resp.nhash, resp.bloom)
+                    ser.bloom = bloom
+                    for key in list(ser.recent):
+                        bloom.add(key)
+                ser.recent = None
 
     def start(self, savepath:str):
         os.makedirs(f"{savepath}", exist_ok=True)
@@ -0,0 +1,69 @@
+﻿import struct
+import zlib
+
+# 存储与节点间传输的值格式: 1 字节标志 | 数据
+RAW = 0
+ZLIB = 1
+# 分块存储的大值: 主键保存清单 (总长度, 块数, 版本), 各块作为独立的键写入, 块键以 CHUNK_PREFIX 开头
+CHUNKED = 2
+CHUNK_BYTES = 1 << 20
+CHUNK_PREFIX = "__chunk__"
+_MANIFEST = struct.Struct(">QI")
+# 设置了过期时刻的值在标志字节中置 EXPIRES 位, 其后为 8 字节过期时刻(Unix 时间戳), 所有节点据此独立过期
+EXPIRES = 0x80
+_DEADLINE = struct.Struct(">d")
+
+
+def encode(value: bytes, threshold: int, expire_at: float = 0) -> bytes:
+    """长度不小于 threshold 且压缩后更小的值使用 zlib 压缩, threshold 为 0 表示不压缩; expire_at 为 0 表示不过期"""
+    flag = RAW
+    if threshold > 0 and len(value) >= threshold:
+        packed = zlib.compress(value)
+        if len(packed) < len(value):
+            flag, value = ZLIB, packed
+    if expire_at > 0:
+        return bytes([flag | EXPIRES]) + _DEADLINE.pack(expire_at) + value
+    return bytes([flag]) + value
+
+
+def decode(blob: bytes) -> bytes:
+    if not blob:
+        return b""
+    flag = blob[0]
+    pos = 1
+    if flag & EXPIRES:
+        flag &= ~EXPIRES
+        pos += _DEADLINE.size
+    if flag == CHUNKED:
+        raise ValueError("分块存储的值需按块读取")
+    if flag == ZLIB:
+        return zlib.decompress(memoryview(blob)[pos:])
+    return blob[pos:]
+
+
+def expire_at(blob: bytes) -> float:
+    """返回值的过期时刻, 不过期时返回 0"""
+    if blob and blob[0] & EXPIRES:
+        return _DEADLINE.unpack_from(blob, 1)[0]
+    return 0
+
+
+def expired(blob: bytes, now: float) -> bool:
+    deadline = expire_at(blob)
+    return 0 < deadline <= now
+
+
+def manifest(version: str, nchunks: int, size: int) -> bytes:
+    return bytes([CHUNKED]) + _MANIFEST.pack(size, nchunks) + version.encode()
+
+
+def parse_manifest(blob: bytes) -> tuple[str, int, int] | None:
+    """返回 (版本, 块数, 总长度), 不是分块清单时返回 None"""
+    if not blob or blob[0] != CHUNKED:
+        return None
+    size, nchunks = _MANIFEST.unpack_from(blob, 1)
+    return bytes(blob[1 + _MANIFEST.size:]).decode(), nchunks, size
+
+
+def chunk_key(key: str, version: str, i: int) -> str:
+    return f"{CHUNK_PREFIX}{key}#{version}#{i}"
@@ -0,0 +1,847 @@
+﻿import heapq
+import itertools
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from bisect import bisect_right
+from threading import Condition, Event, Lock, Thread
+
+from common.bloom import BloomFilter
+from common.locks import RWLock
+
+# 记录格式: crc32 | 键长度 | 值长度 | 标志 | 键 | 值
+_HEADER = struct.Struct(">IIIB")
+_TOMBSTONE = 1
+_SEGMENT_SUFFIX = ".data"
+# 提示文件: 对应段文件长度 | 若干条 (键长度, 值长度, 值偏移, 标志, 键), 重启时无需读取值即可重建 keydir
+_HINT_SIZE = struct.Struct(">Q")
+_HINT = struct.Struct(">IIQB")
+_HINT_SUFFIX = ".hint"
+# SSTable: 按键有序的记录 | 稀疏索引 | 布隆过滤器位图 | 表尾
+# 稀疏索引每 _INDEX_EVERY 条记录一项 (键长度, 记录偏移, 键); 表尾为 (索引偏移, 位图偏移, 位数, 哈希函数个数, 魔数)
+_INDEX = struct.Struct(">IQ")
+_INDEX_EVERY = 16
+_FOOTER = struct.Struct(">QQIII")
+_SST_MAGIC = 0x4C534D31
+_SST_SUFFIX = ".sst"
+_WAL_SUFFIX = ".wal"
+_MANIFEST = "MANIFEST"
+_MISSING = object()
+
+
+def _record(key: str, value: bytes, flags: int) -> bytes:
+    kb = key.encode()
+    body = _HEADER.pack(0, len(kb), len(value), flags)[4:] + kb + value
+    return struct.pack(">I", zlib.crc32(body)) + body
+
+
+def _write_all(fd: int, data: bytes):
+    view = memoryview(data)
+    while view:
+        n = os.write(fd, view)
+        view = view[n:]
+
+
+def _scan(data: bytes, pos: int = 0, limit: int | None = None):
+    """依次解析 [pos, limit) 内的记录, 产出 (记录起点, 记录终点, 键, 标志, 值长度), 遇到损坏或不完整的记录即停止"""
+    if limit is None:
+        limit = len(data)
+    while pos + _HEADER.size <= limit:
+        crc, ksz, vsz, flags = _HEADER.unpack_from(data, pos)
+        end = pos + _HEADER.size + ksz + vsz
+        if end > limit or zlib.crc32(data[pos + 4:end]) != crc:
+            return
+        yield pos, end, data[pos + _HEADER.size:pos + _HEADER.size + ksz].decode(), flags, vsz
+        pos = end
+
+
+class RateLimiter:
+    """按字节数限速, rate 为每秒字节数, 0 表示不限速"""
+    def __init__(self, rate: int):
+        self.rate = rate
+        self.begin = time.monotonic()
+        self.total = 0
+
+    def consume(self, nbytes: int):
+        if self.rate <= 0:
+            return
+        self.total += nbytes
+        ahead = self.total / self.rate - (time.monotonic() - self.begin)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+DURABILITY = ("none", "batch", "write")
+
+
+class GroupCommit:
+    """组提交: none 不主动落盘; write 每次写入各自 fsync; batch 在一次 fsync 进行期间到达的写入
+    排队等待, 由下一次 fsync 一并落盘, window 大于 0 时发起 fsync 前再等待 window 秒以攒更多写入
+
+    flush 负责把当前日志落盘, 并返回本次落盘覆盖到的日志序号(LSN)。
+    """
+    def __init__(self, flush, mode: str = "batch", window: float = 0.0):
+        self.flush = flush
+        self.mode = mode
+        self.window = window
+        self.synced = 0
+        self.leader = False
+        self.cond = Condition()
+
+    def wait(self, lsn: int):
+        """阻塞直到 lsn 之前的日志已落盘"""
+        if self.mode == "none":
+            return
+        if self.mode == "write":
+            self.flush()
+            return
+        with self.cond:
+            while self.synced < lsn and self.leader:
+                self.cond.wait()
+            if self.synced >= lsn:
+                return
+            self.leader = True
+        done = 0
+        try:
+            # 等待窗口期, 让更多并发写入搭上同一次 fsync
+            if self.window > 0:
+                time.sleep(self.window)
+            done = self.flush()
+        finally:
+            with self.cond:
+                self.leader = False
+                self.synced = max(self.synced, done)
+                self.cond.notify_all()
+        if done < lsn:
+            self.wait(lsn)
+
+
+class FileEngine:
+    """每个键保存为一个文件, 文件名即键名; 文件互相独立无法组提交, batch 与 write 均为每次写入 fsync"""
+    def __init__(self, path: str, durability: str = "none"):
+        self.path = path
+        self.durability = durability
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}")
+
+    def get(self, key: str) -> bytes:
+        with open(self._file(key), 'rb') as f:
+            return f.read()
+
+    def put(self, key: str, value: bytes):
+        with open(self._file(key), 'wb') as f:
+            f.write(value)
+            if self.durability != "none":
+                f.flush()
+                os.fsync(f.fileno())
+
+    def delete(self, key: str):
+        os.remove(self._file(key))
+
+    def keys(self) -> list[str]:
+        return [name for name in os.listdir(self.path) if name != "storage.log"]
+
+    def close(self):
+        pass
+
+
+class LogEngine:
+    """Bitcask 式追加日志存储: 所有写入顺序追加到段文件, 内存中的 keydir 记录每个键的最新位置
+
+    段文件本身即预写日志, 写入返回前按 durability 通过组提交落盘。
+    """
+    SEGMENT_BYTES = 64 << 20
+    # 非活跃段中失效字节占比达到该值才参与压缩, 避免反复重写几乎全是存活数据的段
+    COMPACT_RATIO = 0.5
+
+    def __init__(self, path: str, segment_bytes: int = SEGMENT_BYTES, durability: str = "none", window: float = 0.0):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.durability = durability
+        self.commit = GroupCommit(self._flush, durability, window)
+        # 自打开以来追加的总字节数, 作为组提交的日志序号
+        self.lsn = 0
+        # 键 -> (段编号, 值偏移, 值长度)
+        self.keydir: dict[str, tuple[int, int, int]] = {}
+        self.fds: dict[int, int] = {}
+        # 只读段的内存映射, 读取直接切片页缓存, 无需每次系统调用
+        self.maps: dict[int, mmap.mmap] = {}
+        # 段编号 -> 已失效(被覆盖或删除)的字节数
+        self.garbage: dict[int, int] = {}
+        # mu 串行化追加写入; swap 的写锁只在压缩替换段文件时短暂持有, 读取持有其读锁
+        self.mu = Lock()
+        self.swap = RWLock()
+        for sid in self._segments():
+            self._load(sid)
+        self.active = max(self.fds, default=0) + 1
+        # 活跃段中每条记录的提示项, 段变为只读时写入提示文件
+        self.hints: list[tuple[str, int, int, int]] = []
+        self._open_active()
+
+    def _segment_file(self, sid: int) -> str:
+        return os.path.join(self.path, f"{sid:09d}{_SEGMENT_SUFFIX}")
+
+    def _hint_file(self, sid: int) -> str:
+        return os.path.join(self.path, f"{sid:09d}{_HINT_SUFFIX}")
+
+    def _segments(self) -> list[int]:
+        sids = []
+        for name in os.listdir(self.path):
+            if name.endswith(_SEGMENT_SUFFIX) and name[:-len(_SEGMENT_SUFFIX)].isdigit():
+                sids.append(int(name[:-len(_SEGMENT_SUFFIX)]))
+        return sorted(sids)
+
+    def _map(self, sid: int):
+        if os.fstat(self.fds[sid]).st_size > 0:
+            self.maps[sid] = mmap.mmap(self.fds[sid], 0, access=mmap.ACCESS_READ)
+
+    def _open_active(self):
+        fd = os.open(self._segment_file(self.active), os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self.fds[self.active] = fd
+        self.offset = os.fstat(fd).st_size
+
+    def _load(self, sid: int):
+        """优先读取提示文件重建 keydir; 提示文件缺失或与段文件长度不符时顺序扫描段文件, 并补写提示文件"""
+        fd = os.open(self._segment_file(sid), os.O_RDONLY)
+        self.fds[sid] = fd
+        size = os.fstat(fd).st_size
+        self._map(sid)
+        hints = self._read_hint(sid, size)
+        if hints is None:
+            data = self.maps.get(sid, b"")
+            hints = [(key, end - vsz, vsz, flags) for _, end, key, flags, vsz in _scan(data)]
+            self._seal(sid, hints, size)
+        keydir = self.keydir
+        for key, pos, vsz, flags in hints:
+            old = keydir.get(key)
+            if old is not None:
+                self._discard(old)
+            if flags & _TOMBSTONE:
+                self.keydir.pop(key, None)
+                self.garbage[sid] = self.garbage.get(sid, 0) + _HEADER.size + len(key.encode())
+            else:
+                keydir[key] = (sid, pos, vsz)
+
+    def _read_hint(self, sid: int, size: int) -> list[tuple[str, int, int, int]] | None:
+        try:
+            with open(self._hint_file(sid), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < _HINT_SIZE.size or _HINT_SIZE.unpack_from(data)[0] != size:
+            return None
+        hints = []
+        append = hints.append
+        unpack = _HINT.unpack_from
+        pos = _HINT_SIZE.size
+        end = len(data) - _HINT.size
+        while pos <= end:
+            ksz, vsz, vpos, flags = unpack(data, pos)
+            pos += _HINT.size
+            append((data[pos:pos + ksz].decode(), vpos, vsz, flags))
+            pos += ksz
+        return hints
+
+    def _seal(self, sid: int, hints: list[tuple[str, int, int, int]], size: int):
+        """为只读段写入提示文件; 失败不影响数据, 重启时退回扫描段文件"""
+        try:
+            self._write_hint(self._hint_file(sid), hints, size)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _write_hint(hintfile: str, hints: list[tuple[str, int, int, int]], size: int):
+        buf = bytearray(_HINT_SIZE.pack(size))
+        for key, pos, vsz, flags in hints:
+            kb = key.encode()
+            buf += _HINT.pack(len(kb), vsz, pos, flags)
+            buf += kb
+        with open(hintfile + ".tmp", 'wb') as f:
+            f.write(buf)
+        os.replace(hintfile + ".tmp", hintfile)
+
+    def _discard(self, entry: tuple[int, int, int] | None):
+        """记录 entry 指向的旧记录已失效, 计入所在段的垃圾字节"""
+        if entry is None:
+            return
+        sid, pos, size = entry
+        # 记录头与键的长度无法从 entry 得到, 按值长度加记录头估算
+        self.garbage[sid] = self.garbage.get(sid, 0) + _HEADER.size + size
+
+    def _append(self, key: str, value: bytes, flags: int) -> tuple[int, int, int]:
+        record = _record(key, value, flags)
+        _write_all(self.fds[self.active], record)
+        entry = (self.active, self.offset + len(record) - len(value), len(value))
+        self.hints.append((key, entry[1], len(value), flags))
+        self.offset += len(record)
+        self.lsn += len(record)
+        if self.offset >= self.segment_bytes:
+            self._rotate()
+        return entry
+
+    def _rotate(self):
+        if self.durability != "none":
+            # 旧段之后不再写入, 切换前落盘, 组提交只需关心当前活跃段
+            os.fsync(self.fds[self.active])
+        self._seal(self.active, self.hints, self.offset)
+        self.hints = []
+        self._map(self.active)
+        self.active += 1
+        self._open_active()
+
+    def get(self, key: str) -> bytes:
+        self.swap.acquire_read()
+        try:
+            sid, pos, size = self.keydir[key]
+            m = self.maps.get(sid)
+            if m is not None:
+                return m[pos:pos + size]
+            return os.pread(self.fds[sid], size, pos)
+        finally:
+            self.swap.release_read()
+
+    def _flush(self) -> int:
+        self.swap.acquire_read()
+        try:
+            with self.mu:
+                fd = self.fds[self.active]
+                lsn = self.lsn
+            # fsync 期间不持有 mu, 其他写入可继续追加并等待下一次组提交
+            os.fsync(fd)
+            return lsn
+        finally:
+            self.swap.release_read()
+
+    def put(self, key: str, value: bytes):
+        with self.mu:
+            self._discard(self.keydir.get(key))
+            self.keydir[key] = self._append(key, value, 0)
+            lsn = self.lsn
+        self.commit.wait(lsn)
+
+    def delete(self, key: str):
+        with self.mu:
+            old = self.keydir.pop(key, None)
+            if old is None:
+                return
+            self._discard(old)
+            sid, _, _ = self._append(key, b"", _TOMBSTONE)
+            self.garbage[sid] = self.garbage.get(sid, 0) + _HEADER.size + len(key.encode())
+            lsn = self.lsn
+        self.commit.wait(lsn)
+
+    def compact(self, rate: int = 0, ratio: float = COMPACT_RATIO) -> tuple[int, float]:
+        """合并垃圾字节占比不低于 ratio 的非活跃段中的存活记录并原子替换, 返回 (回收字节数, 耗时秒数)
+
+        相邻的待合并段依次合并, 输出每达到 segment_bytes 就在输入段的边界处切换到新段, 各段沿用该组输入中最小的编号,
+        保证重启时仍按新旧顺序回放。合并期间不持有任何锁, 读写照常进行; 仅在替换 keydir 与段文件时短暂持有写锁。
+        """
+        begin = time.monotonic()
+        with self.mu:
+            sids = sorted(sid for sid in self.fds if sid != self.active)
+            sizes = {sid: len(self.maps[sid]) if sid in self.maps else 0 for sid in sids}
+            garbage = {sid: self.garbage.get(sid, 0) for sid in sids}
+        # 相邻的待合并段分为一组
+        runs: list[list[int]] = []
+        adjacent = False
+        for sid in sids:
+            selected = sizes[sid] > 0 and garbage[sid] >= ratio * sizes[sid]
+            if selected:
+                if adjacent:
+                    runs[-1].append(sid)
+                else:
+                    runs.append([sid])
+            adjacent = selected
+        limiter = RateLimiter(rate)
+        reclaimed = 0
+        for run in runs:
+            # 更早的段未参与合并时必须保留删除标记, 否则其中被删除的旧值会在重启后复活
+            keep_tombstones = run[0] != sids[0]
+            while run:
+                merged, freed = self._compact_group(run, keep_tombstones, limiter)
+                run = run[merged:]
+                reclaimed += freed
+        return reclaimed, time.monotonic() - begin
+
+    def _compact_group(self, sids: list[int], keep_tombstones: bool, limiter: RateLimiter) -> tuple[int, int]:
+        """按顺序合并 sids 开头的若干个段, 输出达到 segment_bytes 时停止, 返回 (合并的段数, 回收字节数)"""
+        target = sids[0]
+        tmpfile = self._segment_file(target) + ".compact"
+        moved: dict[str, tuple[tuple[int, int, int], tuple[int, int, int]]] = {}
+        hints = []
+        merged = []
+        before = 0
+        offset = 0
+        tombstones = 0
+        with open(tmpfile, 'wb') as out:
+            for sid in sids:
+                if offset >= self.segment_bytes:
+                    break
+                merged.append(sid)
+                data = self.maps.get(sid, b"")
+                before += len(data)
+                limiter.consume(len(data))
+                for pos, end, key, flags, vsz in _scan(data):
+                    if flags & _TOMBSTONE:
+                        if not keep_tombstones or key in self.keydir:
+                            continue
+                        out.write(data[pos:end])
+                        offset += end - pos
+                        tombstones += end - pos
+                        hints.append((key, offset - vsz, vsz, flags))
+                        continue
+                    old = (sid, end - vsz, vsz)
+                    if self.keydir.get(key) != old:
+                        continue
+                    out.write(data[pos:end])
+                    offset += end - pos
+                    moved[key] = (old, (target, offset - vsz, vsz))
+                    hints.append((key, offset - vsz, vsz, 0))
+                    limiter.consume(end - pos)
+            out.flush()
+            os.fsync(out.fileno())
+        tmphint = self._hint_file(target) + ".compact"
+        self._write_hint(tmphint, hints, offset)
+        self.swap.acquire_write()
+        try:
+            with self.mu:
+                # 先删除旧提示文件, 中途崩溃时重启会退回扫描段文件
+                for sid in merged:
+                    if os.path.exists(self._hint_file(sid)):
+                        os.remove(self._hint_file(sid))
+                os.replace(tmpfile, self._segment_file(target))
+                os.replace(tmphint, self._hint_file(target))
+                for sid in merged:
+                    if sid in self.maps:
+                        self.maps.pop(sid).close()
+                    os.close(self.fds.pop(sid))
+                    self.garbage.pop(sid, None)
+                    if sid != target:
+                        os.remove(self._segment_file(sid))
+                self.fds[target] = os.open(self._segment_file(target), os.O_RDONLY)
+                self._map(target)
+                if tombstones:
+                    # 保留下来的删除标记仍计为垃圾, 更早的段合并后可以回收
+                    self.garbage[target] = tombstones
+                for key, (old, new) in moved.items():
+                    # 合并期间被覆盖或删除的键保持 keydir 中的新位置
+                    if self.keydir.get(key) == old:
+                        self.keydir[key] = new
+                    else:
+                        self._discard(new)
+        finally:
+            self.swap.release_write()
+        return len(merged), before - offset
+
+    def keys(self) -> list[str]:
+        return list(self.keydir)
+
+    def close(self):
+        self.swap.acquire_write()
+        try:
+            with self.mu:
+                if self.fds and self.hints:
+                    self._seal(self.active, self.hints, self.offset)
+                for m in self.maps.values():
+                    m.close()
+                self.maps.clear()
+                for fd in self.fds.values():
+                    os.close(fd)
+                self.fds.clear()
+        finally:
+            self.swap.release_write()
+
+
+class _TableBuilder:
+    """按键的顺序写入记录, finish 时追加稀疏索引、布隆过滤器与表尾并原子替换为正式文件"""
+    def __init__(self, path: str, seq: int):
+        self.path = path
+        self.seq = seq
+        self.f = open(path + ".tmp", 'wb')
+        self.index = bytearray()
+        self.keys: list[str] = []
+        self.size = 0
+
+    def add(self, key: str, value: bytes, flags: int):
+        if len(self.keys) % _INDEX_EVERY == 0:
+            kb = key.encode()
+            self.index += _INDEX.pack(len(kb), self.size) + kb
+        record = _record(key, value, flags)
+        self.f.write(record)
+        self.keys.append(key)
+        self.size += len(record)
+
+    def finish(self) -> "_SSTable":
+        bloom = BloomFilter.for_capacity(len(self.keys))
+        for key in self.keys:
+            bloom.add(key)
+        self.f.write(self.index)
+        self.f.write(bloom.bits)
+        self.f.write(_FOOTER.pack(self.size, self.size + len(self.index), bloom.nbits, bloom.nhash, _SST_MAGIC))
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.f.close()
+        os.replace(self.path + ".tmp", self.path)
+        return _SSTable(self.path, self.seq)
+
+
+class _SSTable:
+    """不可变的有序表, 通过 mmap 读取; 查找先过布隆过滤器, 再二分稀疏索引并扫描至多 _INDEX_EVERY 条记录"""
+    def __init__(self, path: str, seq: int):
+        self.path = path
+        self.seq = seq
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self.map)
+        tail = self.size - _FOOTER.size
+        data_end, bloom_pos, nbits, nhash, magic = _FOOTER.unpack_from(self.map, tail)
+        if magic != _SST_MAGIC:
+            raise ValueError(f"SSTable 文件损坏: {path}")
+        self.data_end = data_end
+        self.bloom = BloomFilter(nbits, nhash, self.map[bloom_pos:tail])
+        self.index: list[str] = []
+        self.offsets: list[int] = []
+        pos = data_end
+        while pos < bloom_pos:
+            ksz, offset = _INDEX.unpack_from(self.map, pos)
+            pos += _INDEX.size
+            self.index.append(self.map[pos:pos + ksz].decode())
+            self.offsets.append(offset)
+            pos += ksz
+        self.offsets.append(data_end)
+        self.first = self.index[0]
+        self.last = self.first
+        for _, _, key, _, _ in _scan(self.map, self.offsets[-2], data_end):
+            self.last = key
+
+    def get(self, key: str) -> tuple[int, bytes] | None:
+        """返回 (标志, 值), 表中没有该键时返回 None"""
+        if key < self.first or key > self.last or key not in self.bloom:
+            return None
+        i = bisect_right(self.index, key) - 1
+        for _, end, k, flags, vsz in _scan(self.map, self.offsets[i], self.offsets[i + 1]):
+            if k == key:
+                return flags, self.map[end - vsz:end]
+            if k > key:
+                break
+        return None
+
+    def items(self):
+        for _, end, key, flags, vsz in _scan(self.map, 0, self.data_end):
+            yield key, flags, self.map[end - vsz:end]
+
+    def keys(self):
+        for _, _, key, flags, _ in _scan(self.map, 0, self.data_end):
+            yield key, flags
+
+    def close(self):
+        self.map.close()
+
+
+def _ranked(entries, rank: int):
+    """为多路归并的每个来源附上优先级, 同一个键优先取 rank 较小(较新)的来源"""
+    for key, *rest in entries:
+        yield key, rank, *rest
+
+
+class LSMEngine:
+    """LSM 树存储: 写入先追加预写日志再进入内存表, 内存表写满后按键排序落盘为不可变的 SSTable
+
+    第 0 层为内存表直接落盘的表, 键范围可能重叠, 按新旧顺序查找; 第 1 层起每层内的表键范围互不重叠,
+    容量按 LEVEL_RATIO 逐层放大。第 0 层表数或某层大小超限时, 后台线程将其与下一层键范围重叠的表归并,
+    归并到最底层时丢弃删除标记。MANIFEST 记录各层包含的表, 每次落盘或归并后原子替换。
+    """
+    MEMTABLE_BYTES = 4 << 20
+    TABLE_BYTES = 8 << 20
+    L0_TABLES = 4
+    LEVEL_BYTES = 32 << 20
+    LEVEL_RATIO = 10
+
+    def __init__(self, path: str, durability: str = "none", window: float = 0.0, memtable_bytes: int = MEMTABLE_BYTES):
+        self.path = path
+        self.durability = durability
+        self.memtable_bytes = memtable_bytes
+        self.commit = GroupCommit(self._flush, durability, window)
+        self.lsn = 0
+        # 键 -> 值, 删除记为 None
+        self.mem: dict[str, bytes | None] = {}
+        self.mem_bytes = 0
+        # 正在落盘的内存表, 落盘完成前仍参与读取
+        self.imm: dict[str, bytes | None] | None = None
+        # 每层的表; 第 0 层新表在前, 其余层按首键排序
+        self.levels: list[list[_SSTable]] = [[]]
+        # mu 串行化写入与内存表落盘; swap 的写锁只在替换各层的表时短暂持有, 读取持有其读锁
+        self.mu = Lock()
+        self.swap = RWLock()
+        self.merge_mu = Lock()
+        # 各层下一次归并选取的表, 轮转以均匀覆盖整层键范围
+        self.cursor: dict[int, int] = {}
+        self._recover()
+        self.closed = False
+        self.pending = Event()
+        self.merger = Thread(target=self._merge_loop, daemon=True)
+        self.merger.start()
+
+    def _file(self, seq: int, suffix: str) -> str:
+        return os.path.join(self.path, f"{seq:09d}{suffix}")
+
+    def _recover(self):
+        """按 MANIFEST 打开各层的表, 删除其中未登记的表(落盘或归并中途崩溃的产物), 回放剩余预写日志"""
+        try:
+            with open(os.path.join(self.path, _MANIFEST)) as f:
+                manifest = json.load(f)["levels"]
+        except FileNotFoundError:
+            manifest = [[]]
+        live = {seq for level in manifest for seq in level}
+        wals = []
+        top = max(live, default=0)
+        for name in os.listdir(self.path):
+            stem, suffix = os.path.splitext(name)
+            if not stem.isdigit():
+                if suffix == ".tmp":
+                    os.remove(os.path.join(self.path, name))
+                continue
+            top = max(top, int(stem))
+            if suffix == _SST_SUFFIX and int(stem) not in live:
+                os.remove(os.path.join(self.path, name))
+            elif suffix == _WAL_SUFFIX:
+                wals.append(int(stem))
+        self.seqs = itertools.count(top + 1)
+        self.levels = [[_SSTable(self._file(seq, _SST_SUFFIX), seq) for seq in level] for level in manifest]
+        # 当前内存表的内容来自这些预写日志, 内存表落盘后删除
+        self.wals = sorted(wals)
+        for seq in self.wals:
+            with open(self._file(seq, _WAL_SUFFIX), 'rb') as f:
+                data = f.read()
+            for _, end, key, flags, vsz in _scan(data):
+                self._apply(key, None if flags & _TOMBSTONE else data[end - vsz:end])
+        self._open_wal()
+
+    def _open_wal(self):
+        seq = next(self.seqs)
+        self.wal = os.open(self._file(seq, _WAL_SUFFIX), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.wals.append(seq)
+
+    def _save_manifest(self):
+        tmpfile = os.path.join(self.path, _MANIFEST + ".tmp")
+        with open(tmpfile, 'w') as f:
+            json.dump({"levels": [[table.seq for table in level] for level in self.levels]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpfile, os.path.join(self.path, _MANIFEST))
+
+    def _apply(self, key: str, value: bytes | None):
+        old = self.mem.get(key, _MISSING)
+        if old is not _MISSING:
+            self.mem_bytes -= len(key) + len(old or b"")
+        self.mem[key] = value
+        self.mem_bytes += len(key) + len(value or b"")
+
+    def _flush(self) -> int:
+        with self.mu:
+            # 复制描述符, 内存表落盘时关闭旧日志不影响进行中的 fsync
+            fd = os.dup(self.wal)
+            lsn = self.lsn
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return lsn
+
+    def _flush_memtable(self):
+        """调用者持有 mu; 内存表写为第 0 层的新表, 其中的数据已由表文件落盘, 旧预写日志随即删除"""
+        self.imm = self.mem
+        self.mem = {}
+        self.mem_bytes = 0
+        os.close(self.wal)
+        old, self.wals = self.wals, []
+        self._open_wal()
+        seq = next(self.seqs)
+        builder = _TableBuilder(self._file(seq, _SST_SUFFIX), seq)
+        for key in sorted(self.imm):
+            value = self.imm[key]
+            builder.add(key, value or b"", _TOMBSTONE if value is None else 0)
+        table = builder.finish()
+        self.swap.acquire_write()
+        try:
+            self.levels[0].insert(0, table)
+            self.imm = None
+            self._save_manifest()
+        finally:
+            self.swap.release_write()
+        for seq in old:
+            os.remove(self._file(seq, _WAL_SUFFIX))
+        self.pending.set()
+
+    def _write(self, key: str, value: bytes, flags: int):
+        record = _record(key, value, flags)
+        with self.mu:
+            _write_all(self.wal, record)
+            self.lsn += len(record)
+            lsn = self.lsn
+            self._apply(key, None if flags & _TOMBSTONE else value)
+            if self.mem_bytes >= self.memtable_bytes:
+                self._flush_memtable()
+        self.commit.wait(lsn)
+
+    def put(self, key: str, value: bytes):
+        self._write(key, value, 0)
+
+    def delete(self, key: str):
+        self._write(key, b"", _TOMBSTONE)
+
+    def get(self, key: str) -> bytes:
+        for mem in (self.mem, self.imm):
+            if mem is not None:
+                value = mem.get(key, _MISSING)
+                if value is not _MISSING:
+                    if value is None:
+                        raise KeyError(key)
+                    return value
+        self.swap.acquire_read()
+        try:
+            for i, level in enumerate(self.levels):
+                if i > 0:
+                    j = bisect_right(level, key, key=lambda t: t.first) - 1
+                    level = level[j:j + 1] if j >= 0 else ()
+                for table in level:
+                    found = table.get(key)
+                    if found is not None:
+                        flags, value = found
+                        if flags & _TOMBSTONE:
+                            raise KeyError(key)
+                        return value
+        finally:
+            self.swap.release_read()
+        raise KeyError(key)
+
+    def _pick(self) -> int | None:
+        """返回需要向下归并的层, 没有则返回 None"""
+        if len(self.levels[0]) >= self.L0_TABLES:
+            return 0
+        for i in range(1, len(self.levels)):
+            if sum(t.size for t in self.levels[i]) > self.LEVEL_BYTES * self.LEVEL_RATIO ** (i - 1):
+                return i
+        return None
+
+    def _merge(self, level: int, limiter: RateLimiter) -> int:
+        """将 level 层的表(第 0 层取全部, 其余层轮转取一张)与下一层键范围重叠的表归并写入下一层, 返回回收字节数"""
+        self.swap.acquire_read()
+        try:
+            if level == 0:
+                upper = list(self.levels[0])
+            else:
+                i = self.cursor.get(level, 0) % len(self.levels[level])
+                self.cursor[level] = i + 1
+                upper = [self.levels[level][i]]
+            lo = min(t.first for t in upper)
+            hi = max(t.last for t in upper)
+            below = self.levels[level + 1] if level + 1 < len(self.levels) else []
+            lower = [t for t in below if t.last >= lo and t.first <= hi]
+            bottom = not any(self.levels[level + 2:])
+        finally:
+            self.swap.release_read()
+        inputs = upper + lower
+        sources = [_ranked(t.items(), rank) for rank, t in enumerate(inputs)]
+        outputs = []
+        builder = None
+        last = None
+        for key, _, flags, value in heapq.merge(*sources):
+            limiter.consume(_HEADER.size + len(key) + len(value))
+            if key == last:
+                continue
+            last = key
+            if flags & _TOMBSTONE and bottom:
+                continue
+            if builder is None:
+                seq = next(self.seqs)
+                builder = _TableBuilder(self._file(seq, _SST_SUFFIX), seq)
+            builder.add(key, value, flags)
+            if builder.size >= self.TABLE_BYTES:
+                outputs.append(builder.finish())
+                builder = None
+        if builder is not None:
+            outputs.append(builder.finish())
+        self.swap.acquire_write()
+        try:
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+            self.levels[level] = [t for t in self.levels[level] if t not in upper]
+            rest = [t for t in self.levels[level + 1] if t not in lower]
+            self.levels[level + 1] = sorted(rest + outputs, key=lambda t: t.first)
+            self._save_manifest()
+            for table in inputs:
+                table.close()
+        finally:
+            self.swap.release_write()
+        for table in inputs:
+            os.remove(table.path)
+        return sum(t.size for t in inputs) - sum(t.size for t in outputs)
+
+    def compact(self, rate: int = 0) -> tuple[int, float]:
+        """完成所有待进行的归并, 返回 (回收字节数, 耗时秒数)"""
+        begin = time.monotonic()
+        reclaimed = 0
+        limiter = RateLimiter(rate)
+        with self.merge_mu:
+            while not self.closed and (level := self._pick()) is not None:
+                reclaimed += self._merge(level, limiter)
+        return reclaimed, time.monotonic() - begin
+
+    def _merge_loop(self):
+        while True:
+            self.pending.wait()
+            self.pending.clear()
+            if self.closed:
+                return
+            try:
+                self.compact()
+            except OSError:
+                # 归并失败不影响已有的表, 下一次内存表落盘后重试
+                pass
+
+    def keys(self) -> list[str]:
+        self.swap.acquire_read()
+        try:
+            sources = []
+            for mem in (self.mem, self.imm):
+                if mem is not None:
+                    entries = sorted((key, _TOMBSTONE if value is None else 0) for key, value in list(mem.items()))
+                    sources.append(entries)
+            for level in self.levels:
+                sources.extend(t.keys() for t in level)
+            result = []
+            last = None
+            for key, _, flags in heapq.merge(*(_ranked(s, rank) for rank, s in enumerate(sources))):
+                if key == last:
+                    continue
+                last = key
+                if not flags & _TOMBSTONE:
+                    result.append(key)
+            return result
+        finally:
+            self.swap.release_read()
+
+    def close(self):
+        self.closed = True
+        self.pending.set()
+        self.merger.join()
+        with self.mu:
+            self.swap.acquire_write()
+            try:
+                if self.wal is not None:
+                    os.close(self.wal)
+                    self.wal = None
+                for level in self.levels:
+                    for table in level:
+                        table.close()
+                self.levels = [[]]
+            finally:
+                self.swap.release_write()
+
+
+ENGINES = {"file": FileEngine, "log": LogEngine, "lsm": LSMEngine}
@@ -0,0 +1,40 @@
+﻿from bisect import bisect_left, bisect_right
+from threading import Lock
+
+
+class SortedKeys:
+    """有序键索引, 以 bisect 维护有序列表, 支持按范围与前缀分页读取"""
+    def __init__(self, keys=()):
+        self.keys = sorted(keys)
+        self.mu = Lock()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, key: str):
+        with self.mu:
+            i = bisect_left(self.keys, key)
+            if i == len(self.keys) or self.keys[i] != key:
+                self.keys.insert(i, key)
+
+    def remove(self, key: str):
+        with self.mu:
+            i = bisect_left(self.keys, key)
+            if i < len(self.keys) and self.keys[i] == key:
+                del self.keys[i]
+
+    def page(self, after: str | None, start: str, end: str, prefix: str, size: int) -> list[str]:
+        """返回 [start, end) 内以 prefix 开头且大于 after 的至多 size 个键, end 为空表示不设上界"""
+        lo = max(start, prefix)
+        with self.mu:
+            if after is not None and after >= lo:
+                i = bisect_right(self.keys, after)
+            else:
+                i = bisect_left(self.keys, lo)
+            keys = self.keys[i:i + size]
+        result = []
+        for key in keys:
+            if (end and key >= end) or not key.startswith(prefix):
+                break
+            result.append(key)
+        return result
@@ -4,9 +4,15 @@ import os
 import random
 import signal
 import sys
+import threading
+import time
 import secrets
 import base64
-from threading import Lock
+import functools
+import inspect
+import queue
+from collections import OrderedDict
+from threading import Event, Lock
 from concurrent import futures
 import grpc
 
@@ -14,117 +20,308 @@ from protos import mapb_pb2 as mapb
 from protos import mapb_pb2_grpc as mapb_grpc
 from protos import stpb_pb2 as stpb
 from protos import stpb_pb2_grpc as stpb_grpc
+from common.bloom import BloomFilter
+from common.channels import ChannelPool
+from common.locks import RWLock
 from params import params
+from storage import codec
+from storage.engine import DURABILITY, ENGINES
+from storage.index import SortedKeys
+from storage.ttl import TimerWheel
 
 class Cache:
-    def __init__(self, maxnum: int):
+    def __init__(self, maxnum: int, maxbytes: int = 0):
         self.maxnum = maxnum
-        self.m = {}
-        self.timemap = {}
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        # 按访问顺序排列, 队首为最久未使用的键
+        self.m: OrderedDict[str, bytes] = OrderedDict()
+        # 设置了存活时间的键 -> 过期时刻(monotonic)
+        self.expire: dict[str, float] = {}
         self.mu = Lock()
 
+    @staticmethod
+    def _sizeof(value: bytes) -> int:
+        return len(value)
+
+    def _evict(self):
+        while self.m and (len(self.m) > self.maxnum or (self.maxbytes > 0 and self.nbytes > self.maxbytes)):
+            k, old = self.m.popitem(last=False)
+            self.expire.pop(k, None)
+            self.nbytes -= self._sizeof(old)
+
+    def _remove(self, key: str):
+        old = self.m.pop(key, None)
+        self.expire.pop(key, None)
+        if old is not None:
+            self.nbytes -= self._sizeof(old)
+
     def del_key(self, key: str):
         with self.mu:
-            self.timemap.pop(key, None)
-            self.m.pop(key, None)
+            self._remove(key)
 
-    def add(self, key: str, value: str):
+    def add(self, key: str, value: bytes, ttl: float = 0):
+        """ttl 为存活秒数, 0 表示不过期"""
+        size = self._sizeof(value)
+        if self.maxnum <= 0 or (self.maxbytes > 0 and size > self.maxbytes):
+            self.del_key(key)
+            return
         with self.mu:
-            for k in list(self.timemap.keys()):
-                self.timemap[k] += 1
-            if key in self.timemap:
-                self.timemap[key] = 0
-                self.m[key] = value
-                return
-            if len(self.m) < self.maxnum:
-                self.m[key] = value
-                self.timemap[key] = 0
-                return
-            maxt = -1
-            maxk = None
-            for k, t in self.timemap.items():
-                if maxt == -1 or t > maxt:
-                    maxt = t
-                    maxk = k
-            if maxk is not None:
-                self.timemap.pop(maxk, None)
-                self.m.pop(maxk, None)
-            self.timemap[key] = 0
+            self._remove(key)
             self.m[key] = value
+            self.nbytes += size
+            if ttl > 0:
+                self.expire[key] = time.monotonic() + ttl
+            self._evict()
 
     def get(self, key: str):
         with self.mu:
-            for k in list(self.timemap.keys()):
-                self.timemap[k] += 1
-            if key in self.m:
-                return self.m[key], True
-            return "", False
+            value = self.m.get(key)
+            if value is None:
+                return b"", False
+            deadline = self.expire.get(key)
+            if deadline is not None and deadline <= time.monotonic():
+                self._remove(key)
+                return b"", False
+            self.m.move_to_end(key)
+            return value, True
 
 
-class RWLock:
-    def __init__(self):
-        self._readers = 0
-        self._rlock = Lock()
-        self._wlock = Lock()
-
-    def acquire_read(self):
-        with self._rlock:
-            self._readers += 1
-            if self._readers == 1:
-                self._wlock.acquire()
-
-    def release_read(self):
-        with self._rlock:
-            self._readers -= 1
-            if self._readers == 0:
-                self._wlock.release()
-
-    def try_acquire_read(self) -> bool:
-        with self._rlock:
-            if self._readers > 0:
-                self._readers += 1
-                return True
-            acquired = self._wlock.acquire(blocking=False)
-            if acquired:
-                self._readers += 1
-                return True
-            else:
-                return False
+class CountMinSketch:
+    """4 行计数最小草图, 计数上限 15, 累计 sample 次后全部减半以淡化历史频率"""
+    DEPTH = 4
+
+    def __init__(self, width: int):
+        size = 16
+        while size < width:
+            size <<= 1
+        self.mask = size - 1
+        self.rows = [bytearray(size) for _ in range(self.DEPTH)]
+        self.sample = 10 * size
+        self.additions = 0
+
+    def _indexes(self, key: str):
+        h = hash(key)
+        for i in range(self.DEPTH):
+            h = (h * 0x9E3779B1 + i) & 0xFFFFFFFFFFFFFFFF
+            yield (h ^ (h >> 29)) & self.mask
+
+    def increment(self, key: str):
+        for row, idx in zip(self.rows, self._indexes(key)):
+            if row[idx] < 15:
+                row[idx] += 1
+        self.additions += 1
+        if self.additions >= self.sample:
+            self._age()
+
+    def estimate(self, key: str) -> int:
+        return min(row[idx] for row, idx in zip(self.rows, self._indexes(key)))
+
+    def _age(self):
+        self.additions //= 2
+        for i, row in enumerate(self.rows):
+            self.rows[i] = bytearray(c >> 1 for c in row)
+
+
+class TinyLFUCache(Cache):
+    """LRU 淘汰前加入基于访问频率的准入过滤, 新键访问频率高于待淘汰键时才替换它"""
+    def __init__(self, maxnum: int, maxbytes: int = 0):
+        super().__init__(maxnum, maxbytes)
+        self.sketch = CountMinSketch(max(256, 4 * maxnum))
+
+    def _admit(self, key: str, size: int) -> bool:
+        if key in self.m:
+            return True
+        full = len(self.m) >= self.maxnum or (self.maxbytes > 0 and self.nbytes + size > self.maxbytes)
+        if not full or not self.m:
+            return True
+        victim = next(iter(self.m))
+        return self.sketch.estimate(key) > self.sketch.estimate(victim)
+
+    def add(self, key: str, value: bytes, ttl: float = 0):
+        size = self._sizeof(value)
+        with self.mu:
+            if not self._admit(key, size):
+                return
+        super().add(key, value, ttl)
+
+    def get(self, key: str):
+        with self.mu:
+            self.sketch.increment(key)
+        return super().get(key)
+
+
+CACHE_POLICIES = {"lru": Cache, "tinylfu": TinyLFUCache}
+
+
+class ShardedCache:
+    """按键哈希分段的缓存, 每段独立加锁与淘汰"""
+    def __init__(self, maxnum: int, maxbytes: int = 0, shards: int = 16, policy: str = "lru"):
+        # 每段至少容纳一个键; 字节上限为 0 表示不限, 不能分出为 0 的段
+        shards = min(max(1, shards), max(1, maxnum))
+        if maxbytes > 0:
+            shards = min(shards, maxbytes)
+        self.shards = shards
+        # 余数分给前几段, 各段上限之和与总上限一致
+        self.segments = [CACHE_POLICIES[policy](self._split(maxnum, i), self._split(maxbytes, i)) for i in range(shards)]
+
+    def _split(self, total: int, i: int) -> int:
+        return total // self.shards + (i < total % self.shards)
+
+    def _segment(self, key: str) -> Cache:
+        return self.segments[hash(key) % self.shards]
+
+    def del_key(self, key: str):
+        self._segment(key).del_key(key)
+
+    def add(self, key: str, value: bytes, ttl: float = 0):
+        self._segment(key).add(key, value, ttl)
+
+    def get(self, key: str):
+        return self._segment(key).get(key)
 
-    def acquire_write(self):
-        self._wlock.acquire()
 
-    def release_write(self):
-        self._wlock.release()
+def make_cache(maxnum: int, maxbytes: int = 0, shards: int = 1, policy: str = "lru"):
+    if shards > 1:
+        return ShardedCache(maxnum, maxbytes, shards, policy)
+    return CACHE_POLICIES[policy](maxnum, maxbytes)
+
+
+class SingleFlight:
+    """合并同一键上的并发调用: 首个调用者执行, 其余调用者等待并共享其结果"""
+    class _Call:
+        def __init__(self):
+            self.done = Event()
+            self.result = None
+            self.error: Exception | None = None
+
+    def __init__(self):
+        self.mu = Lock()
+        self.calls: dict[str, SingleFlight._Call] = {}
+
+    def do(self, key: str, fn):
+        with self.mu:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._Call()
+                self.calls[key] = call
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.mu:
+                self.calls.pop(key, None)
+            call.done.set()
+        return call.result
 
 
 class StoreService(stpb_grpc.storagementServiceServicer):
-    def __init__(self, ip:str, port:str, cache_num: int, manager_addr: str, token:str|None = None):
+    MISS_NUM = 4096
+    BLOOM_MIN = 1024
+    SCAN_PAGE = 100
+    SCAN_PAGE_BYTES = 1 << 20
+    SNAPSHOT_PAGE = 1000
+    SNAPSHOT_BUSY = "节点正在同步数据, 暂不能提供快照"
+    BOOTSTRAP_RETRIES = 10
+    ABORTED_TXNS = 4096
+    # 会话中并发执行的请求数, 以及已接收但尚未返回结果的请求上限, 达到上限后暂停读取客户端请求
+    SESSION_WORKERS = 8
+    # 单次一元响应可携带的值的上限, 留出余量以低于 gRPC 默认的 4MB 消息上限
+    MAX_RESPONSE_BYTES = (4 << 20) - (64 << 10)
+    SESSION_WINDOW = 64
+
+    def __init__(self, ip:str, port:str, cache_num: int, manager_addr: str, token:str|None = None,
+                 cache_bytes: int = 0, cache_shards: int = 1, cache_policy: str = "lru",
+                 cache_ttl: float = 0, miss_ttl: float = 5, engine: str = "log",
+                 compact_interval: float = 60, compact_rate: int = 8 << 20, node_id: int = 0,
+                 durability: str = "batch", compress_threshold: int = 512, bootstrap: bool = True,
+                 hot_bytes: int = 0, expire_interval: float = 1):
         self.ip = ip
         self.port = port
         self.mumap = {} 
-        self.tmpvalue = None
-        self.KVmap = {}
-        self.cache = Cache(cache_num)
+        # 各键锁当前的使用者数 (持有或等待), 归零且键已不存在时移除该键锁
+        self.lock_refs: dict[str, int] = {}
+        self.mumap_mu = Lock()
+        # 处于准备阶段的事务: 事务id -> [(键, 原有的编码后的值或 None, 该键的独占锁)], 提交或撤销时移除
+        self.txns: dict[int, list[tuple[str, bytes | None, RWLock]]] = {}
+        self.txn_mu = Lock()
+        # 先于准备完成到达的撤销留下的事务id, 迟到的准备据此拒绝, 不再写入已撤销的值并持有键锁
+        self.aborted: OrderedDict[int, None] = OrderedDict()
+        # 键 -> 常驻内存的编码后的值, 或 True 表示值只在磁盘上
+        self.KVmap: dict[str, bytes | bool] = {}
+        # 常驻内存的值在 hot_bytes 字节内按最近写入/访问排序, 超出预算时最久未用的值降为只在磁盘
+        self.hot_bytes = hot_bytes
+        self.hot: OrderedDict[str, int] = OrderedDict()
+        self.hot_used = 0
+        self.hot_mu = Lock()
+        self.cache = make_cache(cache_num, cache_bytes, cache_shards, cache_policy)
+        self.cache_ttl = cache_ttl
+        # 负缓存: 记录集群中不存在的键, 避免重复向管理服务器发起全集群查询
+        self.missing = Cache(self.MISS_NUM)
+        self.miss_ttl = miss_ttl
+        self.flight = SingleFlight()
+        self.engine_name = engine
+        self.durability = durability
+        # 值在入口节点编码一次(见 storage.codec), 之后磁盘、缓存与节点间传输均为编码后的数据, 仅返回客户端时解码
+        self.compress_threshold = compress_threshold
+        self.compact_interval = compact_interval
+        self.compact_rate = compact_rate
+        self.id = node_id
+        self.id_file = ""
+        self._stop = Event()
+        # 新节点加入时从 peer 拉取全量快照; touched 记录快照传输期间经两阶段提交写入或删除的键, 这些键以本地为准
+        self.bootstrap = bootstrap
+        self.peer = ""
+        self.peer_token = ""
+        self.touched: set[str] | None = None
+        # 重启后复用的本地键在与快照核对之前不可信: 读取转向其他节点, 也不参与其他节点的多数判定
+        self.stale: set[str] | None = None
+        # 核对期间因两阶段提交进行中而跳过的快照值, 该事务撤销时以此为准
+        self.deferred: dict[str, bytes] = {}
+        self.boot_mu = Lock()
+        # 设置了过期时刻的键, 后台线程每 expire_interval 秒推进一次并在本地回收到期的键
+        self.expiry = TimerWheel(time.time())
+        self.expire_interval = expire_interval
+        self.bootstrap_thread: threading.Thread | None = None
         self.manager = manager_addr
+        # 到管理服务器的长连接, 各请求共用
+        self.pool = ChannelPool()
         self.token = token if token is not None else base64.urlsafe_b64encode(secrets.token_bytes(256)).decode('utf-8')    
 
     @staticmethod
-    def verify_client(func):
-        def wrapper(self, *args, **kwargs):
-            req = args[0]
-            if req.token != self.token:
-                errmes = "密钥无效, 未授权操作!"
-                self.logger.info("非法用户试图执行敏感操作, 已阻拦")
-                return mapb.Response(errno=False, errmes=errmes)
-            return func(self, *args, **kwargs)
-        return wrapper
+    def verify_client(resp_type, mes: str = "非法用户试图执行敏感操作, 已阻拦"):
+        """校验请求中的密钥, 不符时记录 mes 并返回 resp_type 类型的错误响应; 流式响应的方法产出该错误后结束"""
+        def decorator(func):
+            if inspect.isgeneratorfunction(func):
+                def wrapper(self, request, context):
+                    if request.token != self.token:
+                        self.logger.info(mes)
+                        yield resp_type(errno=False, errmes="密钥无效, 未授权操作!")
+                        return
+                    yield from func(self, request, context)
+            else:
+                def wrapper(self, request, context):
+                    if request.token != self.token:
+                        self.logger.info(mes)
+                        return resp_type(errno=False, errmes="密钥无效, 未授权操作!")
+                    return func(self, request, context)
+            return functools.wraps(func)(wrapper)
+        return decorator
     
+    def _manager_stub(self):
+        return self.pool.stub(self.manager, mapb_grpc.manageServiceStub)
+
     def register(self):
         try:
-            with grpc.insecure_channel(self.manager) as ch:
-                client = mapb_grpc.manageServiceStub(ch)
-                info = client.online(mapb.SerRequest(ip=self.ip, port=self.port, token=self.token))
+            info = self._manager_stub().online(mapb.SerRequest(ip=self.ip, port=self.port, token=self.token, server_id=self.id))
         except Exception as e:
             print(e)
             raise SystemExit("无法连接管理服务器")
@@ -133,13 +330,87 @@ class StoreService(stpb_grpc.storagementServiceServicer):
     
         server_id = info.server_id
         self.id = server_id
+        self.peer = info.peer
+        self.peer_token = info.peer_token
+
+    def _lock(self, key: str) -> RWLock:
+        """取得键锁并登记为使用者, 用完 (释放锁之后) 须调用 _unref"""
+        with self.mumap_mu:
+            lock = self.mumap.get(key)
+            if lock is None:
+                lock = self.mumap[key] = RWLock()
+            self.lock_refs[key] = self.lock_refs.get(key, 0) + 1
+            return lock
 
-    @verify_client
+    def _unref(self, key: str):
+        """注销使用者; 键已被删除、回收或撤销新建时移除键锁, 仍有使用者等待时保留, 以免等待者与新来者各持一把锁"""
+        with self.mumap_mu:
+            refs = self.lock_refs[key] - 1
+            if refs:
+                self.lock_refs[key] = refs
+                return
+            del self.lock_refs[key]
+            if key not in self.KVmap:
+                self.mumap.pop(key, None)
+
+    @verify_client(stpb.StResponse)
     def getdata(self, request, context):
         cli_id = request.cli_id
         key = request.key
         self.logger.info(f"客户端{cli_id} 请求键值{key}")
+        resp = self._lookup(key, cli_id)
+        if not resp.errno:
+            return resp
+        info = codec.parse_manifest(resp.value)
+        if info is None:
+            return stpb.StResponse(value=codec.decode(resp.value), errno=True)
+        if info[2] > self.MAX_RESPONSE_BYTES:
+            self.logger.info(f"键值{key} 共 {info[2]} 字节, 超过单次响应上限, 告知客户端{cli_id} 改用分块读取")
+            return stpb.StResponse(errno=False, errmes=f"值大小为 {info[2]} 字节, 超过单次响应上限, 请使用 getstream(download) 分块读取")
+        parts = []
+        for chunk in self._iter_chunks(key, resp.value, cli_id):
+            if not chunk.errno:
+                return stpb.StResponse(errno=False, errmes=chunk.errmes)
+            parts.append(chunk.data)
+        return stpb.StResponse(value=b"".join(parts), errno=True)
+
+    @verify_client(stpb.StChunk)
+    def getstream(self, request, context):
+        cli_id = request.cli_id
+        key = request.key
+        self.logger.info(f"客户端{cli_id} 分块读取键值{key}")
+        resp = self._lookup(key, cli_id)
+        if not resp.errno:
+            yield stpb.StChunk(errno=False, errmes=resp.errmes)
+            return
+        if codec.parse_manifest(resp.value) is None:
+            value = codec.decode(resp.value)
+            for pos in range(0, max(len(value), 1), codec.CHUNK_BYTES):
+                yield stpb.StChunk(data=value[pos:pos + codec.CHUNK_BYTES], errno=True)
+            return
+        yield from self._iter_chunks(key, resp.value, cli_id)
+
+    def _iter_chunks(self, key: str, blob: bytes, cli_id: int):
+        """按清单依次读取分块存储的值, 每块单独查找, 内存中同时只保留一块"""
+        version, nchunks, _ = codec.parse_manifest(blob)
+        for i in range(nchunks):
+            resp = self._lookup(codec.chunk_key(key, version, i), cli_id)
+            if not resp.errno:
+                self.logger.info(f"读取键值{key} 的第 {i} 块失败, {resp.errmes}")
+                yield stpb.StChunk(errno=False, errmes=f"读取第 {i} 块失败, {resp.errmes}")
+                return
+            yield stpb.StChunk(data=codec.decode(resp.value), errno=True)
 
+    def _lookup(self, key: str, cli_id: int):
+        """查找键的编码后的值, 已过期但尚未回收的键视为不存在"""
+        resp = self._find(key, cli_id)
+        if resp.errno and codec.expired(resp.value, time.time()):
+            self.logger.info(f"键值{key} 已过期,告知客户端{cli_id}")
+            return stpb.StResponse(errno=False, errmes="未找到键值")
+        return resp
+
+    def _find(self, key: str, cli_id: int):
+        """依次查找缓存、本地存储与其他节点"""
         value, ok = self.cache.get(key)
         if ok:
             self.logger.info(f"缓存存在键值{key}")
@@ -147,110 +418,211 @@ class StoreService(stpb_grpc.storagementServiceServicer):
             return stpb.StResponse(value=value, errno=True)
 
         self.logger.info("缓存中未找到键值 %s" % key)
-        if key in self.KVmap:
-            lock = self.mumap.get(key)
-            if not lock or not lock.try_acquire_read():
-                self.logger.info(f"客户端{cli_id} 尝试获取 {key}共享锁, 但目前该锁被独占")
-                return stpb.StResponse(errno=False, errmes="该值被另一进程占有")
-            self.logger.info(f"客户端{cli_id} 获取了 {key}共享锁")
+        if key in self.KVmap and not self._is_stale(key):
+            lock = self._lock(key)
             try:
-                with open(os.path.join(self.datapath, f"{key}"), 'rb') as f:
-                    content = f.read()
-            except Exception as e:
-                self.logger.info(f"读取键值{key} 时发生错误{e},客户端{cli_id} 释放 {key}共享锁")
+                if not lock.try_acquire_read():
+                    self.logger.info(f"客户端{cli_id} 尝试获取 {key}共享锁, 但目前该锁被独占")
+                    return stpb.StResponse(errno=False, errmes="该值被另一进程占有")
+                self.logger.info(f"客户端{cli_id} 获取了 {key}共享锁")
+                content = self._hot_get(key)
+                if content is not None:
+                    self.logger.info(f"键值{key} 常驻内存, 返回键值{key} ,客户端{cli_id} 释放 {key}共享锁")
+                    lock.release_read()
+                    return stpb.StResponse(value=content, errno=True)
+                try:
+                    content = self.engine.get(key)
+                except Exception as e:
+                    self.logger.info(f"读取键值{key} 时发生错误{e},客户端{cli_id} 释放 {key}共享锁")
+                    lock.release_read()
+                    return stpb.StResponse(errno=False, errmes=str(e))
+                self.logger.info(f"成功读取键值{key}")
+                self.logger.info(f"缓存记录键值{key}")
+                self.cache.add(key, content, self.cache_ttl)
+                self.logger.info(f"返回键值{key} ,客户端{cli_id} 释放 {key}共享锁")
                 lock.release_read()
-                return stpb.StResponse(errno=False, errmes=str(e))
-            self.logger.info(f"成功读取键值{key}")
-            self.logger.info(f"缓存记录键值{key}")
-            self.cache.add(key, content.decode())
-            self.logger.info(f"返回键值{key} ,客户端{cli_id} 释放 {key}共享锁")
-            lock.release_read()
-            return stpb.StResponse(value=content.decode(), errno=True)
+                return stpb.StResponse(value=content, errno=True)
+            finally:
+                self._unref(key)
         else:
-            self.logger.info(f"无键值{key} ,向其他服务器请求")
-            try:
-                with grpc.insecure_channel(self.manager) as ch:
-                    client = mapb_grpc.manageServiceStub(ch)
-                    resp = client.Get(mapb.Request(key=key, server_id=self.id))
-            except Exception as e:
-                self.logger.error(f"连接管理服务器错误 {e}")
-                raise
+            if self.missing.get(key)[1]:
+                self.logger.info(f"负缓存命中, 键值{key} 近期不存在,告知客户端{cli_id}")
+                return stpb.StResponse(errno=False, errmes="未找到键值")
+            resp = self.flight.do(key, lambda: self._fetch_remote(key, cli_id))
             if not resp.errno:
-                self.logger.info(f"无法从其他服务器取得键值{key} {resp.errmes},告知客户端{cli_id}")
                 return stpb.StResponse(errno=False, errmes="未找到键值")
-            self.logger.info(f"成功从其他服务器请求键值{key}")
-            self.logger.info(f"缓存记录键值{key}")
-            self.cache.add(key, resp.value)
-            self.mumap[key] = RWLock()
-            self.logger.info(f"准备写入键值{key}")
-            self.logger.info(f"为客户端{cli_id} 申请 {key}独占锁")
-            self.mumap[key].acquire_write()
-            try:
-                with open(os.path.join(self.datapath, f"{key}"), 'wb') as f:
-                    f.write(resp.value.encode())
-                self.logger.info(f"写入键值{key} 成功")
-            except Exception as e:
-                self.logger.info(f"写入键值{key} 失败: {e}")
-            finally:
-                self.logger.info(f"返回键值{key} ,客户端{cli_id} 释放 {key}独占锁")
-                self.mumap[key].release_write()
             return stpb.StResponse(value=resp.value, errno=True)
 
+    def _fetch_remote(self, key: str, cli_id: int):
+        """向管理服务器请求其他节点上的键值并落盘, 同一键的并发未命中由 SingleFlight 合并为一次调用"""
+        self.logger.info(f"无键值{key} ,向其他服务器请求")
+        try:
+            resp = self._manager_stub().Get(mapb.Request(key=key, server_id=self.id))
+        except Exception as e:
+            self.logger.error(f"连接管理服务器错误 {e}")
+            raise
+        if not resp.errno:
+            self.logger.info(f"无法从其他服务器取得键值{key} {resp.errmes},告知客户端{cli_id}")
+            if self.miss_ttl > 0:
+                self.missing.add(key, b"", self.miss_ttl)
+            return resp
+        self.logger.info(f"成功从其他服务器请求键值{key}")
+        self._store_remote(key, resp.value, cli_id)
+        return resp
+
+    def _store_remote(self, key: str, value: bytes, cli_id: int):
+        """缓存并落盘从其他节点取得的键值, 等待锁期间已有新写入时保留新值"""
+        self.logger.info(f"缓存记录键值{key}")
+        self.cache.add(key, value, self.cache_ttl)
+        lock = self._lock(key)
+        self.logger.info(f"准备写入键值{key}")
+        self.logger.info(f"为客户端{cli_id} 申请 {key}独占锁")
+        lock.acquire_write()
+        try:
+            if self._is_stale(key):
+                # 重启前的本地旧值以集群中的值为准
+                self._write(key, value)
+                self._trust(key)
+                self.logger.info(f"以其他服务器的键值{key} 更新本地旧值")
+            elif key in self.KVmap:
+                # 等待锁期间已有新的写入提交到本节点, 不能用旧值覆盖
+                self.logger.info(f"键值{key} 已被更新, 跳过写入")
+            else:
+                self.engine.put(key, value)
+                self.logger.info(f"写入键值{key} 成功")
+        except Exception as e:
+            self.logger.info(f"写入键值{key} 失败: {e}")
+        finally:
+            self.logger.info(f"返回键值{key} ,客户端{cli_id} 释放 {key}独占锁")
+            lock.release_write()
+            self._unref(key)
+
+    def _fetch_remote_many(self, keys: list[str], cli_id: int) -> dict[str, stpb.StResponse]:
+        """一次请求管理服务器取得多个本地缺失的键值, 取得的键值落盘, 不存在的键记入负缓存"""
+        self.logger.info(f"本地缺少{len(keys)}个键值 ,向其他服务器批量请求")
+        try:
+            resp = self._manager_stub().MultiGet(mapb.Batch(server_id=self.id, items=[mapb.KV(key=key) for key in keys]))
+        except Exception as e:
+            self.logger.error(f"连接管理服务器错误 {e}")
+            raise
+        results = {}
+        for item in resp.items:
+            if item.errno:
+                self._store_remote(item.key, item.value, cli_id)
+                results[item.key] = stpb.StResponse(value=item.value, errno=True)
+            else:
+                if self.miss_ttl > 0:
+                    self.missing.add(item.key, b"", self.miss_ttl)
+                results[item.key] = stpb.StResponse(errno=False, errmes="未找到键值")
+        for key in keys:
+            if key not in results:
+                results[key] = stpb.StResponse(errno=False, errmes=resp.errmes or "未找到键值")
+        return results
+
     def maGetdata(self, request, context):
-        key = request.key
+        return self._ma_get(request.key)
+
+    def maMGetdata(self, request, context):
+        self.logger.info(f"管理服务器 批量请求{len(request.items)}个键值")
+        results = []
+        for item in request.items:
+            resp = self._ma_get(item.key)
+            results.append(stpb.StResult(key=item.key, value=resp.value, errno=resp.errno, errmes=resp.errmes))
+        return stpb.StBatchResp(items=results, errno=True)
+
+    def _ma_get(self, key: str):
         self.logger.info(f"管理服务器 请求键值{key}")
+        if self._is_stale(key):
+            self.logger.info(f"键值{key} 尚未与集群核对,告知管理服务器")
+            return stpb.StResponse(errno=False, errmes="键值尚未与集群核对")
         value, ok = self.cache.get(key)
-        if ok:
+        if ok and not codec.expired(value, time.time()):
             self.logger.info(f"缓存存在键值{key}")
             self.logger.info(f"返回键值{key}")
             return stpb.StResponse(value=value, errno=True)
         self.logger.info("缓存中未找到键值 %s" % key)
         if key in self.KVmap:
-            lock = self.mumap.get(key)
-            if not lock or not lock.try_acquire_read():
-                self.logger.info(f"管理服务器尝试获取 {key}共享锁, 但目前该锁被独占")
-                return stpb.StResponse(errno=False, errmes="无法获取锁")
+            lock = self._lock(key)
             try:
-                with open(os.path.join(self.datapath, f"{key}"), 'rb') as f:
-                    content = f.read()
-            except Exception as e:
-                self.logger.info(f"读取键值{key} 时发生错误{e},管理服务器释放 {key}共享锁")
+                if not lock.try_acquire_read():
+                    self.logger.info(f"管理服务器尝试获取 {key}共享锁, 但目前该锁被独占")
+                    return stpb.StResponse(errno=False, errmes="无法获取锁")
+                try:
+                    content = self._read(key)
+                except Exception as e:
+                    self.logger.info(f"读取键值{key} 时发生错误{e},管理服务器释放 {key}共享锁")
+                    lock.release_read()
+                    return stpb.StResponse(errno=False, errmes=str(e))
+                self.logger.info(f"成功读取键值{key} ,管理服务器释放 {key}共享锁")
                 lock.release_read()
-                return stpb.StResponse(errno=False, errmes=str(e))
-            self.logger.info(f"成功读取键值{key} ,管理服务器释放 {key}共享锁")
-            lock.release_read()
-            return stpb.StResponse(value=content.decode(), errno=True)
+            finally:
+                self._unref(key)
+            if codec.expired(content, time.time()):
+                self.logger.info(f"键值{key} 已过期,告知管理服务器")
+                return stpb.StResponse(errno=False, errmes="服务器中无键值")
+            return stpb.StResponse(value=content, errno=True)
         self.logger.info(f"无键值{key} ,告知管理服务器")
         return stpb.StResponse(errno=False, errmes="服务器中无键值")
 
+    def _prepare(self, txid: int, keys: list[str], timeout: float | None = None) -> bool:
+        """按键的顺序获取各键的独占锁并在事务表中记录原有值, 锁一直持有到该事务提交或撤销;
+        timeout 秒内未获得全部锁, 或事务已被撤销时释放已获得的锁并返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        entries = []
+        for key in sorted(set(keys)):
+            lock = self._lock(key)
+            self.logger.info(f"管理服务器正在申请 {key}独占锁")
+            if not lock.acquire_write(None if deadline is None else deadline - time.monotonic()):
+                self.logger.info(f"等待 {key}独占锁超时")
+                self._unref(key)
+                self._release(entries)
+                return False
+            self.logger.info(f"管理服务器获取了 {key}独占锁")
+            old = None
+            if key in self.KVmap:
+                try:
+                    old = self._read(key)
+                    self.logger.info(f"记录原有键值{key} 成功")
+                except Exception:
+                    self.logger.info(f"记录原有键值{key} 失败")
+            entries.append((key, old, lock))
+        with self.txn_mu:
+            if txid in self.aborted:
+                del self.aborted[txid]
+                self.logger.info(f"事务{txid} 已被撤销, 释放 {len(entries)} 个独占锁")
+                self._release(entries)
+                return False
+            self.txns[txid] = entries
+        return True
+
+    def _release(self, entries: list[tuple[str, bytes | None, RWLock]]):
+        for key, _, lock in entries:
+            lock.release_write()
+            self._unref(key)
+
+    def _finish(self, txid: int, abort: bool = False):
+        with self.txn_mu:
+            txn = self.txns.pop(txid, None)
+            if txn is None and abort:
+                self.aborted[txid] = None
+                if len(self.aborted) > self.ABORTED_TXNS:
+                    self.aborted.popitem(last=False)
+            return txn
+
+    @staticmethod
+    def _time_remaining(context) -> float | None:
+        return context.time_remaining() if context is not None else None
+
     def maPutdata(self, request, context):
         key = request.key
         value = request.value
-        self.cache.del_key(key)
-        if key not in self.KVmap:
-            self.KVmap[key] = True
-            self.mumap[key] = RWLock()
-            self.tmpvalue = None
-            self.logger.info(f"管理服务器正在申请 {key}独占锁")
-            self.mumap[key].acquire_write()
-            self.logger.info(f"管理服务器获取了 {key}独占锁")
-        else:
-            self.logger.info(f"管理服务器正在申请 {key}独占锁")
-            self.mumap[key].acquire_write()
-            self.logger.info(f"管理服务器获取了 {key}独占锁")
-            try:
-                with open(os.path.join(self.datapath, f"{key}"), 'rb') as f:
-                    content = f.read()
-                self.logger.info(f"记录原有键值{key} 成功")
-                self.tmpvalue = content
-            except Exception:
-                self.logger.info(f"记录原有键值{key} 失败")
-                self.tmpvalue = None
-            self.mumap[key].release_write()
+        self._forget(key)
+        self._bloom_add(key)
+        if not self._prepare(request.txid, [key], self._time_remaining(context)):
+            return stpb.StEmpty(errno=False, errmes="未能获取键锁")
         self.logger.info(f"准备写入键值{key}")
         try:
-            with open(os.path.join(self.datapath, f"{key}"), 'wb') as f:
-                f.write(value.encode())
+            self._write(key, value)
         except Exception as e:
             self.logger.info(f"写入键值{key} 失败,告知管理服务器: {e}")
             return stpb.StEmpty(errno=False, errmes=str(e))
@@ -260,138 +632,737 @@ class StoreService(stpb_grpc.storagementServiceServicer):
 
     def maDeldata(self, request, context):
         key = request.key
-        self.cache.del_key(key)
+        self._forget(key)
         self.logger.info(f"准备删除键值{key}")
-        if key not in self.KVmap:
-            self.tmpvalue = None
-            self.logger.info(f"管理服务器正在申请 {key}独占锁")
-            self.mumap[key] = RWLock()
-            self.mumap[key].acquire_write()
-            self.logger.info(f"管理服务器获取了 {key}独占锁")
-            return stpb.StEmpty(errno=True)
-        else:
-            self.logger.info(f"管理服务器正在申请 {key}独占锁")
-            self.mumap[key].acquire_write()
-            self.logger.info(f"管理服务器获取了 {key}独占锁")
-            try:
-                with open(os.path.join(self.datapath, f"{key}"), 'rb') as f:
-                    content = f.read()
-                self.tmpvalue = content
-                self.logger.info(f"记录原有键值{key} 成功")
-            except Exception:
-                self.tmpvalue = None
-                self.logger.info(f"记录原有键值{key} 失败")
-        self.KVmap.pop(key, None)
+        if not self._prepare(request.txid, [key], self._time_remaining(context)):
+            return stpb.StEmpty(errno=False, errmes="未能获取键锁")
+        self._hot_drop(key)
+        self.index.remove(key)
         self.logger.info(f"删除键值{key} 成功,告知管理服务器")
         self.logger.info("等待管理服务器告知本次删除结果...")
         return stpb.StEmpty(errno=True)
 
-    @verify_client
-    def putdata(self, request, context):
-        cli_id = request.cli_id
-        key = request.key
-        value = request.value
-        self.logger.info(f"客户端{cli_id} 正在申请提交键值{key}")
+    def _forget(self, key: str):
+        """键即将被两阶段提交改写, 使缓存、负缓存与快照传输中的旧状态失效"""
+        self._touch(key)
+        self.cache.del_key(key)
+        self.missing.del_key(key)
+
+    def maMPutdata(self, request, context):
+        keys = [item.key for item in request.items]
+        for key in keys:
+            self._forget(key)
+            self._bloom_add(key)
+        if not self._prepare(request.txid, keys, self._time_remaining(context)):
+            return stpb.StEmpty(errno=False, errmes="未能获取键锁")
+        self.logger.info(f"准备批量写入{len(keys)}个键值")
         try:
-            with grpc.insecure_channel(self.manager) as ch:
-                client = mapb_grpc.manageServiceStub(ch)
-                resp = client.Put(mapb.KV(key=key, server_id=self.id, value=value))
+            for item in request.items:
+                self._write(item.key, item.value)
+        except Exception as e:
+            self.logger.info(f"批量写入键值失败,告知管理服务器: {e}")
+            return stpb.StEmpty(errno=False, errmes=str(e))
+        self.logger.info("批量写入键值成功,等待管理服务器告知本次写入结果...")
+        return stpb.StEmpty(errno=True)
+
+    def maMDeldata(self, request, context):
+        keys = [item.key for item in request.items]
+        for key in keys:
+            self._forget(key)
+        if not self._prepare(request.txid, keys, self._time_remaining(context)):
+            return stpb.StEmpty(errno=False, errmes="未能获取键锁")
+        for key in keys:
+            self._hot_drop(key)
+            self.index.remove(key)
+        self.logger.info(f"批量删除{len(keys)}个键值成功,等待管理服务器告知本次删除结果...")
+        return stpb.StEmpty(errno=True)
+
+    def _submit_put(self, key: str, value: bytes):
+        try:
+            resp = self._manager_stub().Put(mapb.KV(key=key, server_id=self.id, value=value))
         except Exception as e:
             self.logger.error(f"连接管理服务器错误 {e}")
             raise
         if not resp.errno:
             self.logger.info(f"向其他服务器提交键值{key} 时发生错误 {resp.errmes}")
+        return resp
+
+    def _submit_del(self, key: str):
+        try:
+            resp = self._manager_stub().Del(mapb.Request(key=key, server_id=self.id))
+        except Exception as e:
+            self.logger.error(f"连接管理服务器错误 {e}")
+            raise
+        if not resp.errno:
+            self.logger.info(f"向其他服务器删除键值{key} 时发生错误 {resp.errmes}")
+        return resp
+
+    def _local_manifest(self, key: str) -> tuple[str, int, int] | None:
+        if key not in self.KVmap:
+            return None
+        try:
+            return codec.parse_manifest(self._read(key))
+        except Exception:
+            return None
+
+    def _drop_chunks(self, key: str, info: tuple[str, int, int] | None):
+        """删除被覆盖或删除的分块值的各块, 失败的块只占用空间, 不影响读取"""
+        if info is None:
+            return
+        version, nchunks, _ = info
+        for i in range(nchunks):
+            try:
+                self._submit_del(codec.chunk_key(key, version, i))
+            except Exception:
+                pass
+
+    @verify_client(stpb.StEmpty)
+    def putdata(self, request, context):
+        cli_id = request.cli_id
+        key = request.key
+        expire_at = time.time() + request.ttl if request.ttl > 0 else 0
+        value = codec.encode(request.value, self.compress_threshold, expire_at)
+        self.logger.info(f"客户端{cli_id} 正在申请提交键值{key}")
+        old = self._local_manifest(key)
+        if not self._submit_put(key, value).errno:
             return stpb.StEmpty(errno=False, errmes="提交失败")
+        self._drop_chunks(key, old)
         return stpb.StEmpty(errno=True)
 
-    @verify_client
+    def putstream(self, request_iterator, context):
+        """客户端按块上传大值: 每块作为独立的键经两阶段提交写入各节点磁盘, 全部成功后再提交清单使新值生效"""
+        key = None
+        version = secrets.token_hex(8)
+        nchunks = 0
+        size = 0
+        for chunk in request_iterator:
+            if key is None:
+                if chunk.token != self.token:
+                    self.logger.info("非法用户试图执行敏感操作, 已阻拦")
+                    return stpb.StEmpty(errno=False, errmes="密钥无效, 未授权操作!")
+                key = chunk.key
+                self.logger.info(f"客户端{chunk.cli_id} 开始分块上传键值{key}")
+            blob = codec.encode(chunk.data, self.compress_threshold)
+            if not self._submit_put(codec.chunk_key(key, version, nchunks), blob).errno:
+                self._drop_chunks(key, (version, nchunks, size))
+                return stpb.StEmpty(errno=False, errmes="提交失败")
+            nchunks += 1
+            size += len(chunk.data)
+        if key is None:
+            return stpb.StEmpty(errno=False, errmes="未收到数据")
+        old = self._local_manifest(key)
+        if not self._submit_put(key, codec.manifest(version, nchunks, size)).errno:
+            self._drop_chunks(key, (version, nchunks, size))
+            return stpb.StEmpty(errno=False, errmes="提交失败")
+        self._drop_chunks(key, old)
+        self.logger.info(f"键值{key} 分块上传完成, 共 {nchunks} 块 {size} 字节")
+        return stpb.StEmpty(errno=True)
+
+    @verify_client(stpb.StEmpty)
     def deldata(self, request, context):
         cli_id = request.cli_id
         key = request.key
         self.logger.info(f"客户端{cli_id} 正在申请删除键值{key}")
+        old = self._local_manifest(key)
+        if not self._submit_del(key).errno:
+            return stpb.StEmpty(errno=False, errmes="删除失败")
+        self._drop_chunks(key, old)
+        return stpb.StEmpty(errno=True)
+
+    def _submit_many(self, method: str, items: list[mapb.KV]):
         try:
-            with grpc.insecure_channel(self.manager) as ch:
-                client = mapb_grpc.manageServiceStub(ch)
-                resp = client.Del(mapb.Request(key=key, server_id=self.id))
+            resp = getattr(self._manager_stub(), method)(mapb.Batch(server_id=self.id, items=items))
         except Exception as e:
             self.logger.error(f"连接管理服务器错误 {e}")
             raise
         if not resp.errno:
-            self.logger.info(f"向其他服务器删除键值{key} 时发生错误 {resp.errmes}")
-            return stpb.StEmpty(errno=False, errmes="删除失败")
-        return stpb.StEmpty(errno=True)
+            self.logger.info(f"向其他服务器批量提交{len(items)}个键值时发生错误 {resp.errmes}")
+        return resp
+
+    @verify_client(stpb.StBatchResp)
+    def mgetdata(self, request, context):
+        cli_id = request.cli_id
+        keys = [item.key for item in request.items]
+        self.logger.info(f"客户端{cli_id} 批量请求{len(keys)}个键值")
+        found: dict[str, stpb.StResponse] = {}
+        remote = []
+        for key in dict.fromkeys(keys):
+            if key in self.KVmap or self.cache.get(key)[1]:
+                found[key] = self._find(key, cli_id)
+            elif self.missing.get(key)[1]:
+                found[key] = stpb.StResponse(errno=False, errmes="未找到键值")
+            else:
+                remote.append(key)
+        # 本地缺失的键合并为一次管理服务器请求, 由其向其他节点统一收集
+        if remote:
+            found.update(self._fetch_remote_many(remote, cli_id))
+        now = time.time()
+        results = []
+        for key in keys:
+            resp = found[key]
+            if not resp.errno or codec.expired(resp.value, now):
+                results.append(stpb.StResult(key=key, errno=False, errmes=resp.errmes or "未找到键值"))
+            elif codec.parse_manifest(resp.value) is not None:
+                results.append(stpb.StResult(key=key, errno=False, errmes="该值分块存储, 请使用 getstream 读取"))
+            else:
+                results.append(stpb.StResult(key=key, value=codec.decode(resp.value), errno=True))
+        return stpb.StBatchResp(items=results, errno=True)
+
+    @verify_client(stpb.StBatchResp)
+    def mputdata(self, request, context):
+        """批量写入: 整批作为一个事务经一轮两阶段提交写入各节点, 要么全部生效要么全部不生效"""
+        self.logger.info(f"客户端{request.cli_id} 正在申请批量提交{len(request.items)}个键值")
+        now = time.time()
+        items = []
+        olds = {}
+        for item in {item.key: item for item in request.items}.values():
+            expire_at = now + item.ttl if item.ttl > 0 else 0
+            items.append(mapb.KV(key=item.key, value=codec.encode(item.value, self.compress_threshold, expire_at)))
+            olds[item.key] = self._local_manifest(item.key)
+        if not self._submit_many("MultiPut", items).errno:
+            return stpb.StBatchResp(errno=False, errmes="提交失败")
+        for key, old in olds.items():
+            self._drop_chunks(key, old)
+        return stpb.StBatchResp(errno=True)
+
+    @verify_client(stpb.StBatchResp)
+    def mdeldata(self, request, context):
+        self.logger.info(f"客户端{request.cli_id} 正在申请批量删除{len(request.items)}个键值")
+        olds = {item.key: self._local_manifest(item.key) for item in request.items}
+        if not self._submit_many("MultiDel", [mapb.KV(key=key) for key in olds]).errno:
+            return stpb.StBatchResp(errno=False, errmes="删除失败")
+        for key, old in olds.items():
+            self._drop_chunks(key, old)
+        return stpb.StBatchResp(errno=True)
 
     def abort(self, request, context):
-        key = request.key
+        txn = self._finish(request.txid, abort=True)
+        if txn is None:
+            self.logger.info(f"事务{request.txid} 不存在或已结束")
+            return stpb.StEmpty(errno=True)
         self.logger.info("抛弃本次结果")
         self.logger.info("准备恢复原有记录")
-        if self.tmpvalue is not None:
-            self.KVmap[key] = True
+        for key, old, lock in txn:
             try:
-                with open(os.path.join(self.datapath, f"{key}"), 'wb') as f:
-                    f.write(self.tmpvalue)
-                self.logger.info(f"重写入键值{key} 成功")
-                self.logger.info(f"{key}独占锁释放")
-                self.mumap[key].release_write()
+                if old is not None:
+                    self._write(key, old)
+                    self.logger.info(f"重写入键值{key} 成功")
+                else:
+                    self._hot_drop(key)
+                    self.index.remove(key)
+                    try:
+                        self.engine.delete(key)
+                    except Exception:
+                        self.logger.info(f"{key}删除失败")
             except Exception:
-                self.logger.error("恢复原有记录失败")
+                self.logger.error(f"恢复原有记录{key} 失败")
+            finally:
                 self.logger.info(f"{key}独占锁释放")
-                self.mumap[key].release_write()
-            return stpb.StEmpty(errno=True)
-        else:
-            self.KVmap.pop(key, None)
-            try:
-                os.remove(os.path.join(self.datapath, f"{key}"))
-            except Exception:
-                self.logger.info(f"{key}删除失败")
-            self.logger.info(f"{key}独占锁释放")
-            self.mumap[key].release_write()
-            self.mumap.pop(key, None)
+                lock.release_write()
+                self._unref(key)
         self.logger.info("恢复原有记录完成")
         return stpb.StEmpty(errno=True)
 
     def commit(self, request, context):
-        key = request.key
+        txn = self._finish(request.txid)
+        if txn is None:
+            self.logger.info(f"事务{request.txid} 不存在或已结束")
+            return stpb.StEmpty(errno=True)
         self.logger.info("提交本次结果")
-        self.logger.info(f"{key}独占锁释放")
-        if key in self.mumap:
-            try:
-                self.mumap[key].release_write()
-            except Exception:
-                pass
+        for key, _, lock in txn:
+            self._trust(key)
             if request.delete:
                 try:
-                    os.remove(os.path.join(self.datapath, f"{key}"))
+                    self.engine.delete(key)
                 except Exception:
                     self.logger.info(f"{key}删除失败")
-                self.mumap.pop(key, None)
+                self.bloom_deleted += 1
+            self.logger.info(f"{key}独占锁释放")
+            lock.release_write()
+            self._unref(key)
         return stpb.StEmpty(errno=True)
 
+    def _session_op(self, op) -> stpb.StOpResult:
+        if op.op == "get":
+            resp = self.getdata(stpb.StRequest(cli_id=op.cli_id, key=op.key, token=op.token), None)
+        elif op.op == "put":
+            resp = self.putdata(stpb.StKV(cli_id=op.cli_id, key=op.key, value=op.value, token=op.token, ttl=op.ttl), None)
+        elif op.op == "del":
+            resp = self.deldata(stpb.StRequest(cli_id=op.cli_id, key=op.key, token=op.token), None)
+        else:
+            return stpb.StOpResult(tag=op.tag, errno=False, errmes=f"未知操作 {op.op}")
+        value = resp.value if op.op == "get" and resp.errno else b""
+        return stpb.StOpResult(tag=op.tag, value=value, errno=resp.errno, errmes=resp.errmes)
+
+    def session(self, request_iterator, context):
+        """双向流会话: 客户端连续发送带编号的请求而不必等待响应, 请求并发执行, 结果按完成顺序返回"""
+        results: queue.Queue = queue.Queue()
+        window = threading.Semaphore(self.SESSION_WINDOW)
+        executor = futures.ThreadPoolExecutor(max_workers=self.SESSION_WORKERS)
+        # 客户端取消或响应流提前结束时通知读取线程退出
+        closed = Event()
+
+        def run(op):
+            try:
+                result = self._session_op(op)
+            except Exception as e:
+                result = stpb.StOpResult(tag=op.tag, errno=False, errmes=str(e))
+            results.put(result)
+
+        def read():
+            count = 0
+            try:
+                for op in request_iterator:
+                    while not window.acquire(timeout=0.1):
+                        if closed.is_set():
+                            return
+                    executor.submit(run, op)
+                    count += 1
+            except Exception as e:
+                self.logger.info(f"会话请求流中断 {e}")
+            finally:
+                executor.shutdown(wait=True)
+                self.logger.info(f"会话结束, 共处理 {count} 个请求")
+                results.put(None)
+
+        threading.Thread(target=read, daemon=True).start()
+        try:
+            while True:
+                result = results.get()
+                if result is None:
+                    return
+                window.release()
+                yield result
+        finally:
+            closed.set()
+
+    @verify_client(stpb.StPage)
+    def scan(self, request, context):
+        cli_id = request.cli_id
+        self.logger.info(f"客户端{cli_id} 扫描键值 start={request.start} end={request.end} prefix={request.prefix}")
+        page_size = request.page_size if request.page_size > 0 else self.SCAN_PAGE
+        remain = request.limit if request.limit > 0 else -1
+        after = None
+        sent = 0
+        while remain != 0:
+            size = page_size if remain < 0 else min(page_size, remain)
+            keys = self.index.page(after, request.start, request.end, request.prefix, size)
+            before = sent
+            items = []
+            nbytes = 0
+            now = time.time()
+            for key in keys:
+                # 重启后尚未核对的本地值不可信, 不返回
+                if key.startswith(codec.CHUNK_PREFIX) or self._is_expired(key, now) or self._is_stale(key):
+                    continue
+                # 持有读锁读取, 等待进行中的两阶段提交结束, 不会返回随后被撤销的值
+                lock = self._lock(key)
+                lock.acquire_read()
+                try:
+                    if request.keys_only:
+                        if key not in self.KVmap:
+                            continue
+                        value = b""
+                    else:
+                        blob = self._read(key)
+                        # 分块存储的大值只返回键, 值需通过 getstream 读取
+                        value = b"" if codec.parse_manifest(blob) else codec.decode(blob)
+                except Exception:
+                    # 扫描期间被删除的键直接跳过
+                    continue
+                finally:
+                    lock.release_read()
+                    self._unref(key)
+                items.append(stpb.StItem(key=key, value=value))
+                nbytes += len(value)
+                if nbytes >= self.SCAN_PAGE_BYTES:
+                    yield stpb.StPage(items=items, errno=True)
+                    sent += len(items)
+                    items = []
+                    nbytes = 0
+            if items:
+                yield stpb.StPage(items=items, errno=True)
+                sent += len(items)
+            if len(keys) < size:
+                break
+            after = keys[-1]
+            if after.startswith(codec.CHUNK_PREFIX):
+                # 分块存储的内部键排列在同一前缀下, 整段跳过
+                after = codec.CHUNK_PREFIX + "\U0010ffff"
+            if remain > 0:
+                # 只按实际返回的键计数, 跳过的内部键与过期键不占用条数上限
+                remain -= sent - before
+        self.logger.info(f"客户端{cli_id} 扫描结束, 共返回 {sent} 个键值")
+
+    @verify_client(stpb.StPage, "非法节点试图拉取快照, 已阻拦")
+    def snapshot(self, request, context):
+        sid = request.server_id
+        if self.touched is not None or self.stale is not None:
+            # 本节点的数据尚不完整, 缺少的键会被接收方当作已删除
+            self.logger.info(f"存储服务器{sid} 请求快照, 但本节点正在同步数据")
+            yield stpb.StPage(errno=False, errmes=self.SNAPSHOT_BUSY)
+            return
+        self.logger.info(f"存储服务器{sid} 开始拉取快照")
+        after = None
+        sent = 0
+        while True:
+            keys = self.index.page(after, "", "", "", self.SNAPSHOT_PAGE)
+            items = []
+            nbytes = 0
+            now = time.time()
+            for key in keys:
+                if self._is_expired(key, now) or self._is_stale(key):
+                    continue
+                # 持有读锁读取, 等待进行中的两阶段提交结束, 不会发出随后被撤销的值
+                lock = self._lock(key)
+                lock.acquire_read()
+                try:
+                    blob = self._read(key)
+                except Exception:
+                    continue
+                finally:
+                    lock.release_read()
+                    self._unref(key)
+                # 直接发送编码后的数据, 接收方原样写入
+                items.append(stpb.StItem(key=key, value=blob))
+                nbytes += len(blob)
+                if nbytes >= self.SCAN_PAGE_BYTES:
+                    yield stpb.StPage(items=items, errno=True)
+                    sent += len(items)
+                    items = []
+                    nbytes = 0
+            if items:
+                yield stpb.StPage(items=items, errno=True)
+                sent += len(items)
+            if len(keys) < self.SNAPSHOT_PAGE:
+                break
+            after = keys[-1]
+        self.logger.info(f"向存储服务器{sid} 发送快照完成, 共 {sent} 个键值")
+
+    def _hot_get(self, key: str) -> bytes | None:
+        value = self.KVmap.get(key)
+        if not isinstance(value, bytes):
+            return None
+        with self.hot_mu:
+            if key in self.hot:
+                self.hot.move_to_end(key)
+        return value
+
+    def _hot_set(self, key: str, blob: bytes):
+        """key 必须已存在; 预算内的值常驻内存, 超出预算时把最久未用的值降为只在磁盘"""
+        with self.hot_mu:
+            size = self.hot.pop(key, None)
+            if size is not None:
+                self.hot_used -= size
+            if len(blob) > self.hot_bytes:
+                self.KVmap[key] = True
+                return
+            self.KVmap[key] = blob
+            self.hot[key] = len(blob)
+            self.hot_used += len(blob)
+            while self.hot_used > self.hot_bytes:
+                cold, size = self.hot.popitem(last=False)
+                self.hot_used -= size
+                if cold in self.KVmap:
+                    self.KVmap[cold] = True
+
+    def _hot_drop(self, key: str):
+        self.expiry.remove(key)
+        with self.hot_mu:
+            self.KVmap.pop(key, None)
+            size = self.hot.pop(key, None)
+            if size is not None:
+                self.hot_used -= size
+
+    def _read(self, key: str) -> bytes:
+        """读取编码后的值, 常驻内存时不访问磁盘"""
+        value = self._hot_get(key)
+        if value is not None:
+            return value
+        return self.engine.get(key)
+
+    def _write(self, key: str, blob: bytes):
+        """写穿: 先写入存储引擎, 再放入常驻内存层"""
+        self.engine.put(key, blob)
+        self._hot_set(key, blob)
+        self.index.add(key)
+        self._track_expiry(key, blob)
+
+    def _track_expiry(self, key: str, blob: bytes):
+        deadline = codec.expire_at(blob)
+        if deadline:
+            self.expiry.add(key, deadline)
+        else:
+            self.expiry.remove(key)
+
+    def _is_expired(self, key: str, now: float) -> bool:
+        deadline = self.expiry.deadlines.get(key)
+        return deadline is not None and deadline <= now
+
+    def _reclaim_expired(self, now: float) -> int:
+        """在本地删除到期的键; 各节点依据值中相同的过期时刻各自回收, 无需逐键两阶段提交"""
+        reclaimed = 0
+        for key in self.expiry.advance(now):
+            lock = self._lock(key)
+            if not lock.try_acquire_write():
+                # 该键正处于两阶段提交中, 下一轮再检查
+                self._unref(key)
+                self.expiry.add(key, now + self.expire_interval)
+                continue
+            try:
+                if key not in self.KVmap:
+                    continue
+                try:
+                    blob = self._read(key)
+                except Exception:
+                    continue
+                if not codec.expired(blob, now):
+                    self._track_expiry(key, blob)
+                    continue
+                self._hot_drop(key)
+                self.index.remove(key)
+                self.cache.del_key(key)
+                try:
+                    self.engine.delete(key)
+                except Exception as e:
+                    self.logger.info(f"回收过期键值{key} 失败 {e}")
+                self.bloom_deleted += 1
+                reclaimed += 1
+            finally:
+                lock.release_write()
+                self._unref(key)
+        return reclaimed
+
+    def _expire_loop(self):
+        if self.expire_interval <= 0:
+            return
+        while not self._stop.wait(self.expire_interval):
+            reclaimed = self._reclaim_expired(time.time())
+            if reclaimed:
+                self.logger.info(f"回收 {reclaimed} 个过期键值")
+
+    def _load_expiry(self) -> int:
+        """启动时从值中读取过期时刻重建时间轮"""
+        for key in self.KVmap:
+            try:
+                deadline = codec.expire_at(self._read(key))
+            except Exception:
+                continue
+            if deadline:
+                self.expiry.add(key, deadline)
+        return len(self.expiry)
+
+    def _warm(self):
+        """启动时按引擎中的键顺序载入值, 直到填满常驻内存预算"""
+        loaded = 0
+        for key in self.KVmap:
+            if self.hot_used >= self.hot_bytes:
+                break
+            try:
+                blob = self.engine.get(key)
+            except Exception:
+                continue
+            if self.hot_used + len(blob) <= self.hot_bytes:
+                self._hot_set(key, blob)
+                loaded += 1
+        return loaded
+
+    def _touch(self, key: str):
+        with self.boot_mu:
+            if self.touched is not None:
+                self.touched.add(key)
+
+    def _is_stale(self, key: str) -> bool:
+        stale = self.stale
+        return stale is not None and key in stale
+
+    def _trust(self, key: str):
+        with self.boot_mu:
+            if self.stale is not None:
+                self.stale.discard(key)
+
+    def _restore(self, key: str, blob: bytes) -> bool:
+        """写入快照中的键值, 快照传输期间本地已写入或删除过的键跳过, 与本地相同的值不重复写入"""
+        with self.boot_mu:
+            if key in self.touched:
+                if self.stale is not None and key in self.stale:
+                    # 事务尚未提交, 若之后撤销, 本地恢复的是重启前的旧值
+                    self.deferred[key] = blob
+                return False
+            if key in self.KVmap:
+                try:
+                    same = self._read(key) == blob
+                except Exception:
+                    same = False
+                if same:
+                    if self.stale is not None:
+                        self.stale.discard(key)
+                    return False
+            self._write(key, blob)
+            self.cache.del_key(key)
+            self.missing.del_key(key)
+            self._bloom_add(key)
+            if self.stale is not None:
+                self.stale.discard(key)
+        return True
+
+    def _drop_stale(self) -> int:
+        """快照完成后处理仍未核对的本地键: 快照中有而被事务跳过的写入快照值, 其余已在离线期间被删除, 在本地移除"""
+        with self.boot_mu:
+            keys = list(self.stale)
+        removed = 0
+        for key in keys:
+            lock = self._lock(key)
+            # 等待进行中的两阶段提交结束, 提交的键已不在 stale 中
+            lock.acquire_write()
+            try:
+                with self.boot_mu:
+                    if key not in self.stale:
+                        continue
+                    self.stale.discard(key)
+                    blob = self.deferred.pop(key, None)
+                if blob is not None:
+                    self._write(key, blob)
+                    self.cache.del_key(key)
+                    continue
+                if key not in self.KVmap:
+                    continue
+                self._hot_drop(key)
+                self.index.remove(key)
+                self.cache.del_key(key)
+                try:
+                    self.engine.delete(key)
+                except Exception as e:
+                    self.logger.info(f"移除离线期间被删除的键值{key} 失败 {e}")
+                self.bloom_deleted += 1
+                removed += 1
+            finally:
+                lock.release_write()
+                self._unref(key)
+        with self.boot_mu:
+            self.stale = None
+            self.deferred = {}
+        return removed
+
+    def _pull_snapshot(self) -> int | None:
+        """从 peer 拉取完整快照并写入, 返回写入的键数; peer 尚在同步时重试, 未能取得完整快照返回 None"""
+        for _ in range(self.BOOTSTRAP_RETRIES):
+            restored = 0
+            with grpc.insecure_channel(self.peer) as ch:
+                client = stpb_grpc.storagementServiceStub(ch)
+                for page in client.snapshot(stpb.StSnapshot(server_id=self.id, token=self.peer_token)):
+                    if not page.errno:
+                        self.logger.info(f"拉取快照失败, {page.errmes}")
+                        break
+                    for item in page.items:
+                        if self._stop.is_set():
+                            return None
+                        restored += self._restore(item.key, item.value)
+                else:
+                    return restored
+            if page.errmes != self.SNAPSHOT_BUSY or self._stop.wait(1):
+                return None
+        return None
+
+    def _bootstrap(self):
+        self.logger.info(f"开始从存储服务器 {self.peer} 拉取快照")
+        begin = time.monotonic()
+        restored = 0
+        try:
+            restored = self._pull_snapshot()
+            if restored is None:
+                self.logger.error("未能取得完整快照, 未核对的本地键值继续由其他节点提供")
+                return
+            self.logger.info(f"快照拉取完成, 写入 {restored} 个键值, 耗时 {time.monotonic() - begin:.2f}s")
+            if self.stale is not None:
+                removed = self._drop_stale()
+                self.logger.info(f"本地数据核对完成, 移除离线期间被删除的键值 {removed} 个")
+        except Exception as e:
+            self.logger.error(f"拉取快照时发生错误 {e}, 缺失的键值将在访问时逐个获取")
+        finally:
+            with self.boot_mu:
+                self.touched = None
+
+    def _bloom_add(self, key: str):
+        with self.bloom_mu:
+            self.bloom.add(key)
+
+    def _rebuild_bloom(self):
+        keys = list(self.KVmap)
+        bloom = BloomFilter.for_capacity(max(2 * len(keys), self.BLOOM_MIN))
+        for key in keys:
+            bloom.add(key)
+        self.bloom = bloom
+        self.bloom_deleted = 0
+
     def live(self, request, context):
         self.logger.info("响应心跳请求,返回存活状态")
-        return stpb.StEmpty(errno=True)
+        with self.bloom_mu:
+            # 布隆过滤器无法删除键, 删除过多或键数超出容量时按当前键重建
+            if self.bloom_deleted > self.bloom.capacity // 2 or self.bloom.count > self.bloom.capacity:
+                self._rebuild_bloom()
+            bits = bytes(self.bloom.bits)
+            nbits, nhash = self.bloom.nbits, self.bloom.nhash
+        return stpb.StLive(errno=True, bloom=bits, nbits=nbits, nhash=nhash)
     
+    def _compact_loop(self):
+        compact = getattr(self.engine, "compact", None)
+        if compact is None or self.compact_interval <= 0:
+            return
+        while not self._stop.wait(self.compact_interval):
+            try:
+                reclaimed, elapsed = compact(self.compact_rate)
+            except Exception as e:
+                self.logger.error(f"压缩段文件时发生错误 {e}")
+                continue
+            if reclaimed:
+                self.logger.info(f"段文件压缩完成, 回收 {reclaimed} 字节, 耗时 {elapsed:.3f}s")
+
+    def _stop_background(self):
+        self._stop.set()
+        self.compact_thread.join()
+        self.expire_thread.join()
+        if self.bootstrap_thread is not None:
+            self.bootstrap_thread.join()
+
     def clean(self):
         try:
+            self._stop_background()
+            self.engine.close()
             for handler in self.logger.handlers[:]:
                 handler.close()      
                 self.logger.removeHandler(handler)
             import shutil
             shutil.rmtree(self.datapath)
+            os.remove(self.id_file)
         except Exception:
             pass
 
     def unregister(self):
         try:
-            with grpc.insecure_channel(self.manager) as ch:
-                client = mapb_grpc.manageServiceStub(ch)
-                client.offline(mapb.SerInfo(server_id=self.id))
+            self._manager_stub().offline(mapb.SerInfo(server_id=self.id))
             self.logger.info("注销完毕")
         except Exception as e:
             self.logger.error(f"发生错误{e},注销失败")
 
+    def _load_id(self, savepath: str):
+        """节点id按监听地址保存在 savepath 下, 未通过 --node-id 指定时沿用上次注册得到的id"""
+        self.id_file = os.path.join(savepath, f"node_{self.ip}_{self.port.lstrip(':')}.id")
+        if self.id <= 0 and os.path.exists(self.id_file):
+            with open(self.id_file, encoding='utf-8') as f:
+                self.id = int(f.read().strip() or 0)
+
+    def _save_id(self):
+        tmp = self.id_file + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(str(self.id))
+        os.replace(tmp, self.id_file)
+
     def start(self, savepath, logger:logging.Logger|None = None):
+        os.makedirs(savepath, exist_ok=True)
+        self._load_id(savepath)
         self.register()
+        self._save_id()
         datapath = f"{savepath}/storage_{self.id}/"
         os.makedirs(f"{datapath}", exist_ok=True)
         if logger is None:
@@ -402,11 +1373,38 @@ class StoreService(stpb_grpc.storagementServiceServicer):
             logger.addHandler(fh)
         self.logger = logger
         self.datapath = datapath
-        self.logger.info("开始进行服务")
+        self.engine = ENGINES[self.engine_name](datapath, durability=self.durability)
+        # 复用已有数据目录时根据引擎索引重建 KVmap, 锁在首次访问时创建
+        self.KVmap = dict.fromkeys(self.engine.keys(), True)
+        self.index = SortedKeys(self.KVmap)
+        if self.hot_bytes > 0:
+            loaded = self._warm()
+            self.logger.info(f"载入 {loaded} 个键值常驻内存, 共 {self.hot_used} 字节")
+        # 本地键的布隆过滤器, 随心跳发布给管理服务器以减少无效的键值查询
+        self.bloom_mu = Lock()
+        self._rebuild_bloom()
+        # 启动后台线程定时压缩段文件
+        self.compact_thread = threading.Thread(target=self._compact_loop, daemon=True)
+        self.compact_thread.start()
+        expiring = self._load_expiry()
+        if expiring:
+            self.logger.info(f"{expiring} 个键值设置了过期时刻")
+        self.expire_thread = threading.Thread(target=self._expire_loop, daemon=True)
+        self.expire_thread.start()
+        self.logger.info(f"开始进行服务, 节点id为 {self.id}, 已有键值 {len(self.KVmap)} 个")
         self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=16))
         stpb_grpc.add_storagementServiceServicer_to_server(self, self.server)
         self.server.add_insecure_port(self.ip + self.port)
+        # 从管理服务器指定的节点拉取快照, 服务先行启动以接收传输期间的写入;
+        # 重启的节点同时据此核对本地数据, 离线期间的写入与删除在核对完成前由其他节点提供
+        if self.bootstrap and self.peer:
+            self.touched = set()
+            if self.KVmap:
+                self.stale = set(self.KVmap)
         self.server.start()
+        if self.touched is not None:
+            self.bootstrap_thread = threading.Thread(target=self._bootstrap, daemon=True)
+            self.bootstrap_thread.start()
         
     def exit(self, clear:bool):
         try:
@@ -416,6 +1414,9 @@ class StoreService(stpb_grpc.storagementServiceServicer):
         finally:
             self.unregister()
             self.server.stop(0)
+            self._stop_background()
+            self.engine.close()
+            self.pool.close()
             if clear:
                 self.clean()
 
@@ -424,7 +1425,11 @@ def main(args):
     ip = args.ip
     port = f":{args.port}" if not args.port.startswith(":") else args.port
     target = params.MANAGER_IP + params.MANAGER_PORT
-    service = StoreService(ip, port, args.cache, target)
+    service = StoreService(ip, port, args.cache, target, cache_bytes=args.cache_bytes, cache_shards=args.cache_shards, cache_policy=args.cache_policy,
+                           cache_ttl=args.cache_ttl, miss_ttl=args.miss_ttl, engine=args.engine,
+                           compact_interval=args.compact_interval, compact_rate=args.compact_rate, node_id=args.node_id,
+                           durability=args.durability, compress_threshold=args.compress_threshold,
+                           bootstrap=not args.no_bootstrap, hot_bytes=args.hot_bytes, expire_interval=args.expire_interval)
 
     service.start(args.savepath)
     service.exit(args.clear)
@@ -435,6 +1440,21 @@ if __name__ == '__main__':
     parser.add_argument("--port", default=str(random.randint(20000, 65535)))
     parser.add_argument("--clear", action="store_true", help="结束是否清除数据")
     parser.add_argument("--cache", type=int, default=5)
+    parser.add_argument("--cache-bytes", type=int, default=0, help="缓存值总字节上限, 0 表示不限制")
+    parser.add_argument("--cache-shards", type=int, default=1, help="缓存分段数")
+    parser.add_argument("--cache-policy", choices=sorted(CACHE_POLICIES), default="lru", help="缓存淘汰策略")
+    parser.add_argument("--hot-bytes", type=int, default=0, help="常驻内存的值总字节上限, 预算内的读取不访问磁盘, 0 表示关闭")
+    parser.add_argument("--cache-ttl", type=float, default=0, help="缓存条目存活秒数, 0 表示不过期")
+    parser.add_argument("--miss-ttl", type=float, default=5, help="不存在键的负缓存存活秒数, 0 表示关闭")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="log", help="存储引擎: file 每键一个文件, log 追加日志, lsm LSM 树")
+    parser.add_argument("--expire-interval", type=float, default=1, help="后台回收过期键值的间隔秒数, 0 表示只在读取时隐藏过期键值")
+    parser.add_argument("--compact-interval", type=float, default=60, help="后台压缩段文件的间隔秒数, 0 表示关闭")
+    parser.add_argument("--compact-rate", type=int, default=8 << 20, help="压缩时每秒读写字节数上限, 0 表示不限速")
+    parser.add_argument("--durability", choices=DURABILITY, default="batch",
+                        help="写入落盘方式: none 不主动 fsync, batch 组提交共用 fsync, write 每次写入 fsync")
+    parser.add_argument("--compress-threshold", type=int, default=512, help="不小于该字节数的值使用 zlib 压缩, 0 表示不压缩")
+    parser.add_argument("--node-id", type=int, default=0, help="指定节点id, 复用 storage_<id>/ 中的数据; 不指定时沿用上次在同一地址注册得到的id")
+    parser.add_argument("--no-bootstrap", action="store_true", help="新节点加入时不从其他节点拉取快照, 仅在访问时逐个获取键值")
     parser.add_argument("--savepath", type=str, default="storage/")
     args = parser.parse_args()
     main(args)
\ No newline at end of file
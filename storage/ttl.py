@@ -0,0 +1,87 @@
+﻿from threading import Lock
+
+
+class TimerWheel:
+    """分层时间轮: 第 i 层每格跨度为 tick * slots**i 秒, 高层的格到期时把其中的键逐级下放,
+    最底层的格到期时取出到期的键。添加与删除均为 O(1), 推进时只处理到期的格。
+
+    同一个键重新设置过期时刻或被删除时不从格中移除旧项, 旧项取出时与 deadlines 中的最新值比对后丢弃。
+    """
+    def __init__(self, now: float, tick: float = 1.0, slots: int = 64, levels: int = 4):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.wheels = [[set() for _ in range(slots)] for _ in range(levels)]
+        # 超出最高层范围的键, 最高层转过一圈时重新放置
+        self.overflow: set[str] = set()
+        # 添加时已经到期的键, 下次推进时取出
+        self.due: set[str] = set()
+        self.deadlines: dict[str, float] = {}
+        self.current = int(now / tick)
+        self.mu = Lock()
+
+    def __len__(self) -> int:
+        return len(self.deadlines)
+
+    def _place(self, key: str, deadline: float):
+        t = int(deadline / self.tick)
+        delta = t - self.current
+        if delta <= 0:
+            self.due.add(key)
+            return
+        span = 1
+        for wheel in self.wheels:
+            if delta < span * self.slots:
+                wheel[(t // span) % self.slots].add(key)
+                return
+            span *= self.slots
+        self.overflow.add(key)
+
+    def add(self, key: str, deadline: float):
+        with self.mu:
+            self.deadlines[key] = deadline
+            self._place(key, deadline)
+
+    def remove(self, key: str):
+        with self.mu:
+            self.deadlines.pop(key, None)
+
+    def _take(self, keys: set[str], expired: list[str]):
+        for key in keys:
+            deadline = self.deadlines.get(key)
+            if deadline is not None and int(deadline / self.tick) <= self.current:
+                del self.deadlines[key]
+                expired.append(key)
+
+    def advance(self, now: float) -> list[str]:
+        """推进到 now, 返回其间到期的键"""
+        expired: list[str] = []
+        target = int(now / self.tick)
+        with self.mu:
+            due, self.due = self.due, set()
+            self._take(due, expired)
+            while self.current < target:
+                self.current += 1
+                # 先把到期的高层格下放到低层, 再取出最底层当前格
+                span = self.slots
+                for level in range(1, self.levels + 1):
+                    if self.current % span:
+                        break
+                    if level == self.levels:
+                        keys, self.overflow = self.overflow, set()
+                    else:
+                        wheel = self.wheels[level]
+                        idx = (self.current // span) % self.slots
+                        keys, wheel[idx] = wheel[idx], set()
+                    for key in keys:
+                        deadline = self.deadlines.get(key)
+                        if deadline is not None:
+                            self._place(key, deadline)
+                    span *= self.slots
+                wheel = self.wheels[0]
+                idx = self.current % self.slots
+                keys, wheel[idx] = wheel[idx], set()
+                self._take(keys, expired)
+            due, self.due = self.due, set()
+            self._take(due, expired)
+        return expired
@@ -1,9 +1,13 @@
 ﻿import logging
 import random
+import socket
+import threading
+import time
 
 from tests.utils import _start_storage
 from protos import mapb_pb2 as mapb
-from server.main import ManageService
+from protos import stpb_pb2 as stpb
+from server.main import ManageService, SerNode
 
 def test_node_register_and_unregister(manager_server):
     manager_stub, manage_service, _ = manager_server
@@ -14,6 +18,14 @@ def test_node_register_and_unregister(manager_server):
     manager_stub.offline(mapb.SerInfo(server_id = sid),None)
     assert sid not in manage_service.servermap
 
+def test_register_with_stable_id(manager_server):
+    manager_stub, manage_service, _ = manager_server
+    info = manager_stub.online(mapb.SerRequest(ip="localhost", port="50051", token="0", server_id=1234))
+    assert info.server_id == 1234
+    # 已被占用的 id 会重新分配
+    info = manager_stub.online(mapb.SerRequest(ip="localhost", port="50052", token="0", server_id=1234))
+    assert info.server_id != 1234 and info.server_id in manage_service.servermap
+
 def test_check_all_storage_live(manager_server):
     _, manage_service, manager_api = manager_server
     # 启动一个假的 storage server 并注册
@@ -24,6 +36,25 @@ def test_check_all_storage_live(manager_server):
     manage_service.check_all_storage_live()
     assert True
 
+def test_get_skips_nodes_by_bloom(manager_server):
+    _, manage_service, manager_api = manager_server
+    node0, _, token = _start_storage(manager_api)
+    _start_storage(manager_api)
+    _start_storage(manager_api)
+    manage_service.check_all_storage_live()
+    assert all(ser.bloom is not None for ser in manage_service.servermap.values())
+    assert not any(ser.might_hold("bloomkey") for ser in manage_service.servermap.values())
+
+    resp = node0.getdata(stpb.StRequest(cli_id=0, key="bloomkey", token=token), None)
+    assert not resp.errno
+
+    resp = node0.putdata(stpb.StKV(cli_id=0, key="bloomkey", value=b"v", token=token), None)
+    assert resp.errno
+    # 提交后管理服务器立即将键加入各节点的过滤器, 无需等待下一次心跳
+    assert all(ser.might_hold("bloomkey") for ser in manage_service.servermap.values())
+    resp = manage_service.Get(mapb.Request(key="bloomkey", server_id=node0.id), None)
+    assert resp.errno and resp.value
+
 def test_change_store_server(manager_server, storage_server):
     manager_stub, _, manager_api = manager_server
     _, api0, _ = storage_server
@@ -43,7 +74,7 @@ def test_change_store_server(manager_server, storage_server):
 def test_verify(manager_server):
     manager_stub, _, _ = manager_server
     key = "testkey"
-    value = "testvalue"
+    value = b"testvalue"
 
     fake_sid = random.randint(1, 2**31-1)
     resp = manager_stub.Put(mapb.KV(server_id = fake_sid, key=key, value=value))
@@ -53,4 +84,132 @@ def test_verify(manager_server):
     assert not resp.errno and resp.errmes == "节点未注册, 无权操作!"
 
     resp = manager_stub.Del(mapb.Request(server_id = fake_sid, key=key))
-    assert not resp.errno and resp.errmes == "节点未注册, 无权操作!"
\ No newline at end of file
+    assert not resp.errno and resp.errmes == "节点未注册, 无权操作!"
+
+def test_prepare_deadline_aborts(manager_server):
+    _, manage_service, manager_api = manager_server
+    manage_service.phase_timeout = 0.5
+    node0, _, token = _start_storage(manager_api)
+    node1, _, _ = _start_storage(manager_api)
+    try:
+        # 占住 node1 上该键的锁, 使其准备阶段无法在截止时间内完成
+        lock = node1._lock("slowkey")
+        lock.acquire_write()
+        begin = time.perf_counter()
+        resp = node0.putdata(stpb.StKV(cli_id=0, key="slowkey", value=b"v", token=token), None)
+        assert not resp.errno
+        assert time.perf_counter() - begin < 2
+        # 超时视为拒绝, 已完成准备的节点被撤销
+        assert "slowkey" not in node0.KVmap and not node0.txns
+        lock.release_write()
+        time.sleep(0.5)
+        # 迟到的准备不会写入已撤销的值, 也不会继续持有键锁
+        assert "slowkey" not in node1.KVmap and not node1.txns
+        assert lock.try_acquire_write()
+        lock.release_write()
+    finally:
+        for node in (node0, node1):
+            node.server.stop(None).wait()
+
+def test_prepare_error_counts_as_reject(manager_server):
+    _, manage_service, manager_api = manager_server
+    node0, _, _ = _start_storage(manager_api)
+    # 已关闭端口上的节点, 调用立即失败
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as dead:
+        dead.bind(("localhost", 0))
+        port = dead.getsockname()[1]
+    manage_service.servermap[1] = SerNode(ip="localhost", port=f":{port}", sid=1, token="0")
+    try:
+        flag, hasprc = manage_service._prepare_all("errkey", "maPutdata", stpb.StKV(key="errkey", value=b"v", txid=11), "写入")
+        assert not flag and set(hasprc) == {node0.id, 1}
+        del manage_service.servermap[1]
+        manage_service._finish_all(hasprc, "abort", stpb.StRequest(key="errkey", txid=11))
+        assert not node0.txns and "errkey" not in node0.KVmap
+    finally:
+        manage_service.servermap.pop(1, None)
+        node0.server.stop(None).wait()
+
+def test_get_returns_on_majority(manager_server):
+    _, manage_service, manager_api = manager_server
+    manage_service.phase_timeout = 3
+    node0, _, token = _start_storage(manager_api)
+    _start_storage(manager_api)
+    _start_storage(manager_api)
+    resp = node0.putdata(stpb.StKV(cli_id=0, key="quorumkey", value=b"v", token=token), None)
+    assert resp.errno
+    # 只接受连接却从不响应的节点, 请求只能等到截止时间
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as blackhole:
+        blackhole.bind(("localhost", 0))
+        blackhole.listen()
+        port = blackhole.getsockname()[1]
+        manage_service.servermap[1] = SerNode(ip="localhost", port=f":{port}", sid=1, token="0")
+        begin = time.perf_counter()
+        resp = manage_service.Get(mapb.Request(key="quorumkey", server_id=node0.id), None)
+        assert resp.errno and resp.value
+        assert time.perf_counter() - begin < 1
+        del manage_service.servermap[1]
+
+def test_channels_reused_and_closed(manager_server):
+    manager_stub, manage_service, manager_api = manager_server
+    node0, api0, token = _start_storage(manager_api)
+    node1, api1, _ = _start_storage(manager_api)
+    for i in range(3):
+        assert node0.putdata(stpb.StKV(cli_id=0, key=f"pool{i}", value=b"v", token=token), None).errno
+    # 多次写入共用同一条到各节点/管理服务器的通道
+    assert set(manage_service.pool.channels) == {api0, api1}
+    assert list(node0.pool.channels) == [manager_api]
+
+    manager_stub.offline(mapb.SerInfo(server_id=node1.id))
+    assert api1 not in manage_service.pool.channels
+    node0.server.stop(None).wait()
+    # 单次调用失败不关闭通道, 由心跳确认节点失联后再关闭
+    assert all(isinstance(resp, Exception) for _, resp in manage_service._gather({node0.id: api0}, "live", stpb.StEmpty()))
+    assert api0 in manage_service.pool.channels
+    manage_service.check_all_storage_live()
+    assert node0.id not in manage_service.servermap and not manage_service.pool.channels
+    node1.server.stop(None).wait()
+
+def test_key_locks_and_membership(manager_server):
+    _, manage_service, _ = manager_server
+    manage_service.servermap[7] = SerNode(ip="localhost", port=":1", sid=7, token="0")
+    active: dict[str, int] = {}
+    peak: dict[str, int] = {}
+    mu = threading.Lock()
+
+    def slow_prepare(key, method, request, action):
+        with mu:
+            active[key] = active.get(key, 0) + 1
+            peak[key] = max(peak.get(key, 0), active[key])
+            peak["all"] = max(peak.get("all", 0), sum(active.values()))
+        time.sleep(0.05)
+        with mu:
+            active[key] -= 1
+        return False, {}
+    manage_service._prepare_all = slow_prepare
+
+    # 键按哈希分段加锁, 选一个与 "a" 不在同一分段的键
+    i = 0
+    while manage_service.keylocks.get(f"b{i}") is manage_service.keylocks.get("a"):
+        i += 1
+    keys = ["a", f"b{i}"]
+    stop = threading.Event()
+
+    def writer(key):
+        while not stop.is_set():
+            manage_service.Put(mapb.KV(key=key, value=b"v", server_id=7), None)
+
+    threads = [threading.Thread(target=writer, args=(key,)) for key in keys for _ in range(3)]
+    for t in threads:
+        t.start()
+    try:
+        time.sleep(0.3)
+        # 持续写入期间新节点仍能注册
+        begin = time.perf_counter()
+        info = manage_service.online(mapb.SerRequest(ip="localhost", port=":2", token="0"), None)
+        assert info.errno and time.perf_counter() - begin < 1
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+    # 同一键的写入串行执行, 不同键的写入可以并发
+    assert peak[keys[0]] == 1 and peak[keys[1]] == 1 and peak["all"] == 2
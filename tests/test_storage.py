@@ -1,6 +1,17 @@
-﻿from protos import stpb_pb2 as stpb
-from storage.main import Cache
-from tests.utils import _start_storage
+﻿import logging
+import os
+import threading
+import time
+
+import pytest
+
+from protos import stpb_pb2 as stpb
+from common.bloom import BloomFilter
+from storage import codec
+from storage.engine import GroupCommit, LogEngine, LSMEngine
+from storage.main import Cache, ShardedCache, SingleFlight, StoreService, TinyLFUCache
+from storage.ttl import TimerWheel
+from tests.utils import _get_free_port, _start_storage
 
 def test_cache():
     c = Cache(maxnum=3)
@@ -36,6 +47,260 @@ def test_cache():
     val, ok = c.get("c")
     assert not ok
 
+def test_cache_lru_and_bytes():
+    c = Cache(maxnum=3, maxbytes=10)
+    c.add("a", "1111")
+    c.add("b", "2222")
+    # 访问 a 后, b 成为最久未使用的键
+    c.get("a")
+    c.add("c", "33")
+    c.add("d", "44")
+    assert not c.get("b")[1]
+    assert c.get("a") == ("1111", True)
+    assert c.nbytes <= 10
+
+    # 超过字节上限的值不进入缓存
+    c.add("e", "x" * 11)
+    assert not c.get("e")[1]
+
+def test_sharded_cache():
+    c = ShardedCache(maxnum=128, shards=4)
+    for i in range(32):
+        c.add(f"k{i}", f"v{i}")
+    for i in range(32):
+        assert c.get(f"k{i}") == (f"v{i}", True)
+    c.del_key("k0")
+    assert not c.get("k0")[1]
+    assert sum(len(seg.m) for seg in c.segments) == 31
+
+    # 各段上限之和等于总上限, 键数少于段数时减少段数
+    c = ShardedCache(maxnum=10, maxbytes=1000, shards=4)
+    assert sum(seg.maxnum for seg in c.segments) == 10
+    assert sum(seg.maxbytes for seg in c.segments) == 1000
+    c = ShardedCache(maxnum=3, shards=16)
+    assert c.shards == 3 and [seg.maxnum for seg in c.segments] == [1, 1, 1]
+
+def test_tinylfu_scan_resistance():
+    c = TinyLFUCache(maxnum=10)
+    hot = [f"hot{i}" for i in range(10)]
+    for _ in range(5):
+        for k in hot:
+            if not c.get(k)[1]:
+                c.add(k, k)
+    # 一次性扫描冷键不应冲掉热点键
+    for i in range(100):
+        k = f"cold{i}"
+        if not c.get(k)[1]:
+            c.add(k, k)
+    assert all(c.get(k)[1] for k in hot)
+
+def test_cache_ttl():
+    c = Cache(maxnum=3)
+    c.add("a", "apple", ttl=0.05)
+    c.add("b", "banana")
+    assert c.get("a") == ("apple", True)
+    time.sleep(0.06)
+    assert not c.get("a")[1]
+    assert c.get("b") == ("banana", True)
+
+def test_singleflight():
+    sf = SingleFlight()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return "value"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(sf.do("k", fetch)))
+    leader.start()
+    started.wait()
+    # 首个调用进行中, 其余调用应等待并共享结果
+    followers = [threading.Thread(target=lambda: results.append(sf.do("k", fetch))) for _ in range(8)]
+    for t in followers:
+        t.start()
+    time.sleep(0.1)
+    release.set()
+    for t in [leader] + followers:
+        t.join()
+    assert len(calls) == 1
+    assert results == ["value"] * 9
+
+def test_log_engine(tmp_path):
+    engine = LogEngine(str(tmp_path), segment_bytes=64)
+    engine.put("a/b", b"apple")
+    engine.put("c", b"cherry")
+    engine.put("a/b", b"apricot")
+    engine.delete("c")
+    assert engine.get("a/b") == b"apricot"
+    assert "c" not in engine.keydir
+    # 超过段大小后切换到新的段文件
+    assert len(engine.fds) > 1
+    engine.close()
+
+    # 重新打开时从段文件重建 keydir
+    engine = LogEngine(str(tmp_path), segment_bytes=64)
+    assert engine.get("a/b") == b"apricot"
+    assert "c" not in engine.keydir
+    engine.close()
+
+def test_log_engine_compact(tmp_path):
+    engine = LogEngine(str(tmp_path), segment_bytes=64)
+    for i in range(20):
+        engine.put(f"k{i % 4}", f"value{i}".encode())
+    engine.delete("k3")
+    reclaimed, _ = engine.compact()
+    assert reclaimed > 0
+    assert engine.get("k0") == b"value16"
+    assert engine.get("k2") == b"value18"
+    assert "k3" not in engine.keydir
+    engine.close()
+
+    engine = LogEngine(str(tmp_path), segment_bytes=64)
+    assert engine.get("k1") == b"value17"
+    assert "k3" not in engine.keydir
+    engine.close()
+
+def test_log_engine_compact_selective(tmp_path):
+    engine = LogEngine(str(tmp_path), segment_bytes=256)
+    value = b"x" * 30
+    for i in range(10):
+        engine.put(f"c{i}", value)
+    cold = {engine.keydir[f"c{i}"][0] for i in range(10)}
+    for i in range(30):
+        engine.put(f"h{i:02d}", value)
+        engine.put("t", value)
+        engine.put("t", value)
+        if i == 5:
+            engine.delete("c0")
+    cold = {sid: len(engine.maps[sid]) for sid in cold}
+    reclaimed, _ = engine.compact()
+    assert reclaimed > 0
+    # 垃圾占比低的段保持原样, 其余段合并后按 segment_bytes 切分为多个段
+    assert all(len(engine.maps[sid]) == size for sid, size in cold.items())
+    merged = [sid for sid in engine.fds if sid not in cold and sid != engine.active]
+    assert len(merged) > 1
+    assert all(len(engine.maps[sid]) < 2 * 256 for sid in merged)
+    engine.close()
+
+    # 更早的段未参与合并, 删除标记被保留, 重启后已删除的键不会复活
+    engine = LogEngine(str(tmp_path), segment_bytes=256)
+    assert "c0" not in engine.keydir
+    assert engine.get("c9") == value and engine.get("h00") == value and engine.get("t") == value
+    engine.close()
+
+def test_lsm_engine(tmp_path):
+    engine = LSMEngine(str(tmp_path), memtable_bytes=64)
+    engine.L0_TABLES = 2
+    for i in range(200):
+        engine.put(f"k{i % 20:02d}", f"value{i}".encode())
+    engine.delete("k03")
+    engine.compact()
+    # 内存表多次落盘并归并到第 1 层
+    assert not engine.levels[0] and engine.levels[1]
+    assert engine.get("k05") == b"value185"
+    with pytest.raises(KeyError):
+        engine.get("k03")
+    engine.put("k99", b"unflushed")
+    engine.close()
+
+    # 重新打开时按 MANIFEST 加载各层的表并回放预写日志
+    engine = LSMEngine(str(tmp_path), memtable_bytes=64)
+    assert engine.keys() == sorted(f"k{i:02d}" for i in range(20) if i != 3) + ["k99"]
+    assert engine.get("k19") == b"value199"
+    assert engine.get("k99") == b"unflushed"
+    engine.close()
+
+def test_log_engine_hint(tmp_path):
+    engine = LogEngine(str(tmp_path), segment_bytes=64)
+    for i in range(10):
+        engine.put(f"k{i}", f"value{i}".encode())
+    engine.delete("k0")
+    engine.close()
+    assert list(tmp_path.glob("*.hint"))
+
+    # 提示文件与段文件长度不符时退回扫描段文件
+    hint = sorted(tmp_path.glob("*.hint"))[0]
+    hint.write_bytes(b"\0" * 8)
+    engine = LogEngine(str(tmp_path), segment_bytes=64)
+    assert sorted(engine.keys()) == [f"k{i}" for i in range(1, 10)]
+    assert engine.get("k9") == b"value9"
+    engine.close()
+
+def test_group_commit():
+    flushed = []
+    lsn = [0]
+
+    def flush():
+        done = lsn[0]
+        time.sleep(0.05)
+        flushed.append(done)
+        return done
+
+    gc = GroupCommit(flush, "batch")
+
+    def write():
+        lsn[0] += 1
+        gc.wait(lsn[0])
+
+    ts = [threading.Thread(target=write) for _ in range(8)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    # 并发写入共用 fsync, 落盘次数少于写入次数
+    assert gc.synced == 8
+    assert len(flushed) < 8
+
+def test_codec():
+    small = b"short"
+    assert codec.encode(small, 512)[0] == codec.RAW
+    assert codec.decode(codec.encode(small, 512)) == small
+
+    large = b'{"k": "v"}' * 200
+    blob = codec.encode(large, 512)
+    assert blob[0] == codec.ZLIB and len(blob) < len(large)
+    assert codec.decode(blob) == large
+    # 阈值为 0 时不压缩
+    assert codec.encode(large, 0)[0] == codec.RAW
+
+def test_timer_wheel():
+    wheel = TimerWheel(100.0, tick=1.0, slots=4, levels=2)
+    wheel.add("soon", 102.5)
+    wheel.add("later", 130.0)
+    wheel.add("beyond", 200.0)
+    wheel.add("moved", 103.0)
+    wheel.add("moved", 150.0)
+    wheel.add("gone", 104.0)
+    wheel.remove("gone")
+    assert wheel.advance(101.0) == []
+    assert wheel.advance(105.0) == ["soon"]
+    assert wheel.advance(140.0) == ["later"]
+    assert sorted(wheel.advance(300.0)) == ["beyond", "moved"]
+    assert len(wheel) == 0
+
+def test_codec_expire():
+    blob = codec.encode(b"x" * 1000, 512, expire_at=123.5)
+    assert codec.decode(blob) == b"x" * 1000
+    assert codec.expire_at(blob) == 123.5
+    assert codec.expired(blob, 124) and not codec.expired(blob, 123)
+    assert codec.expire_at(codec.encode(b"x", 0)) == 0
+
+def test_bloom_filter():
+    bloom = BloomFilter.for_capacity(1000)
+    for i in range(1000):
+        bloom.add(f"key{i}")
+    assert all(f"key{i}" in bloom for i in range(1000))
+    false_positive = sum(f"other{i}" in bloom for i in range(10000))
+    assert false_positive < 300
+    # 序列化后在其他进程中结果一致
+    copy = BloomFilter(bloom.nbits, bloom.nhash, bytes(bloom.bits))
+    assert all(f"key{i}" in copy for i in range(1000))
+
 def test_heartbeat(storage_server):
     storage_stub, _, _ = storage_server
     # 发送心跳
@@ -46,7 +311,7 @@ def test_base_operations(storage_server):
     storage_stub, _, token = storage_server
     # 测试基本的 PUT, GET, DEL 操作
     key = "testkey"
-    value = "testvalue"
+    value = b"testvalue"
 
     # PUT
     put_resp = storage_stub.putdata(stpb.StKV(cli_id=0, key=key, value=value, token=token))
@@ -69,7 +334,7 @@ def test_get_predata(manager_server, storage_server):
     manager_stub, _, manager_api = manager_server
     storage_stub, _, token = storage_server
     key = "testkey"
-    value = "testvalue"
+    value = b"testvalue"
 
     # PUT
     put_resp = storage_stub.putdata(stpb.StKV(cli_id=0, key=key, value=value, token=token))
@@ -79,12 +344,12 @@ def test_get_predata(manager_server, storage_server):
     new_node, _, token = _start_storage(manager_api)
     resp = new_node.getdata(stpb.StRequest(cli_id=0, key=key, token=token), None)
     assert resp.errno
-    assert resp.value == "testvalue"
+    assert resp.value == b"testvalue"
     
 def test_verify(storage_server):
     storage_stub, _, _ = storage_server
     key = "testkey"
-    value = "testvalue"
+    value = b"testvalue"
     fake_token = "wrongtoken"
     
     #PUT
@@ -96,3 +361,331 @@ def test_verify(storage_server):
     # DEL
     resp = storage_stub.deldata(stpb.StRequest(cli_id=0, key=key, token=fake_token))
     assert not resp.errno and resp.errmes == "密钥无效, 未授权操作!"
+    # 批量与流式接口
+    resp = storage_stub.mgetdata(stpb.StBatch(cli_id=0, token=fake_token, items=[stpb.StKV(key=key)]))
+    assert not resp.errno and resp.errmes == "密钥无效, 未授权操作!"
+    pages = list(storage_stub.scan(stpb.StScan(cli_id=0, token=fake_token)))
+    assert len(pages) == 1 and not pages[0].errno and pages[0].errmes == "密钥无效, 未授权操作!"
+    chunks = list(storage_stub.getstream(stpb.StRequest(cli_id=0, key=key, token=fake_token)))
+    assert len(chunks) == 1 and not chunks[0].errno
+
+def test_negative_cache(manager_server, storage_server):
+    _, _, manager_api = manager_server
+    node, _, token = _start_storage(manager_api)
+    key = "missingkey"
+
+    resp = node.getdata(stpb.StRequest(cli_id=0, key=key, token=token), None)
+    assert not resp.errno and resp.errmes == "未找到键值"
+    assert node.missing.get(key)[1]
+
+    # 负缓存命中时同样返回未找到
+    resp = node.getdata(stpb.StRequest(cli_id=0, key=key, token=token), None)
+    assert not resp.errno and resp.errmes == "未找到键值"
+
+    # 写入/删除准备阶段使负缓存失效
+    node.maDeldata(stpb.StRequest(key=key), None)
+    assert not node.missing.get(key)[1]
+    node.commit(stpb.StRequest(key=key, delete=True), None)
+
+
+def test_compressed_roundtrip(storage_server):
+    storage_stub, _, token = storage_server
+    value = b'{"event": "click", "device": "mobile"}' * 100
+    resp = storage_stub.putdata(stpb.StKV(cli_id=0, key="json", value=value, token=token))
+    assert resp.errno
+    resp = storage_stub.getdata(stpb.StRequest(cli_id=0, key="json", token=token))
+    assert resp.errno and resp.value == value
+
+
+def test_scan(storage_server):
+    storage_stub, _, token = storage_server
+    for key in ["user:3", "user:1", "order:1", "user:2", "user:4"]:
+        resp = storage_stub.putdata(stpb.StKV(cli_id=0, key=key, value=key.encode(), token=token))
+        assert resp.errno
+    storage_stub.deldata(stpb.StRequest(cli_id=0, key="user:4", token=token))
+
+    pages = list(storage_stub.scan(stpb.StScan(cli_id=0, token=token, prefix="user:", page_size=2)))
+    items = [item for page in pages for item in page.items]
+    assert len(pages) == 2
+    assert [item.key for item in items] == ["user:1", "user:2", "user:3"]
+    assert [item.value for item in items] == [b"user:1", b"user:2", b"user:3"]
+
+    pages = storage_stub.scan(stpb.StScan(cli_id=0, token=token, start="order:", end="user:3", limit=2, keys_only=True))
+    items = [item for page in pages for item in page.items]
+    assert [(item.key, item.value) for item in items] == [("order:1", b""), ("user:1", b"")]
+
+
+def test_scan_limit_skips_internal_keys(manager_server):
+    _, _, manager_api = manager_server
+    node, _, token = _start_storage(manager_api, expire_interval=0)
+    chunks = (stpb.StChunk(cli_id=0, key="big", token=token, data=b"x" * 10) for _ in range(5))
+    assert node.putstream(chunks, None).errno
+    node.putdata(stpb.StKV(cli_id=0, key="0exp", value=b"v", token=token, ttl=0.01), None)
+    for key in ["a", "b", "c"]:
+        node.putdata(stpb.StKV(cli_id=0, key=key, value=b"v", token=token), None)
+    time.sleep(0.05)
+    # 过期键与分块的内部键排在用户键之前, 不占用条数上限
+    pages = node.scan(stpb.StScan(cli_id=0, token=token, limit=3, page_size=2, keys_only=True), None)
+    assert [item.key for page in pages for item in page.items] == ["a", "b", "big"]
+
+    # 未核对的键不返回; 持有键锁的事务结束后才读取该键
+    node.stale = {"a"}
+    lock = node._lock("b")
+    assert lock.try_acquire_write()
+    found = []
+    scan = lambda: found.extend(item.key for page in node.scan(stpb.StScan(cli_id=0, token=token), None) for item in page.items)
+    t = threading.Thread(target=scan)
+    t.start()
+    time.sleep(0.1)
+    assert t.is_alive()
+    lock.release_write()
+    t.join()
+    assert found == ["b", "big", "c"]
+    node.stale = None
+
+
+def test_snapshot_bootstrap(manager_server, storage_server):
+    _, _, manager_api = manager_server
+    storage_stub, _, token = storage_server
+    for i in range(5):
+        resp = storage_stub.putdata(stpb.StKV(cli_id=0, key=f"k{i}", value=f"v{i}".encode() * 200, token=token))
+        assert resp.errno
+
+    # 新节点启动后从已有节点拉取快照, 无需逐个向管理服务器查询
+    node, _, _ = _start_storage(manager_api)
+    node.bootstrap_thread.join()
+    assert sorted(node.KVmap) == [f"k{i}" for i in range(5)]
+    assert codec.decode(node.engine.get("k3")) == b"v3" * 200
+    assert node.touched is None
+
+    # 传输期间经两阶段提交写入过的键以本地为准
+    node.touched = {"k0"}
+    assert not node._restore("k0", codec.encode(b"stale", 0))
+    assert codec.decode(node.engine.get("k0")) == b"v0" * 200
+
+    resp = storage_stub.snapshot(stpb.StSnapshot(server_id=0, token="wrongtoken"))
+    assert not next(resp).errno
+
+
+
+def test_hot_tier(manager_server):
+    _, _, manager_api = manager_server
+    node, _, token = _start_storage(manager_api, hot_bytes=250, compress_threshold=0)
+    for i in range(4):
+        resp = node.putdata(stpb.StKV(cli_id=0, key=f"k{i}", value=bytes([i]) * 99, token=token), None)
+        assert resp.errno
+    # 预算内最近写入的值常驻内存, 最早写入的值降为只在磁盘
+    assert node.KVmap["k0"] is True and node.KVmap["k1"] is True
+    assert node.KVmap["k3"] == codec.encode(bytes([3]) * 99, 0)
+    assert node.hot_used == 200
+    for i in range(4):
+        resp = node.getdata(stpb.StRequest(cli_id=0, key=f"k{i}", token=token), None)
+        assert resp.errno and resp.value == bytes([i]) * 99
+
+    resp = node.deldata(stpb.StRequest(cli_id=0, key="k3", token=token), None)
+    assert resp.errno
+    assert "k3" not in node.KVmap and node.hot_used == 100
+
+
+def test_stream_large_value(manager_server):
+    _, _, manager_api = manager_server
+    node, _, token = _start_storage(manager_api)
+    value = os.urandom(3 * codec.CHUNK_BYTES + 123)
+
+    def chunks():
+        for pos in range(0, len(value), codec.CHUNK_BYTES):
+            yield stpb.StChunk(cli_id=0, key="big", token=token, data=value[pos:pos + codec.CHUNK_BYTES])
+
+    resp = node.putstream(chunks(), None)
+    assert resp.errno
+    assert len(node.KVmap) == 5
+    data = b"".join(chunk.data for chunk in node.getstream(stpb.StRequest(cli_id=0, key="big", token=token), None))
+    assert data == value
+    resp = node.getdata(stpb.StRequest(cli_id=0, key="big", token=token), None)
+    assert resp.errno and resp.value == value
+    # 超过单次响应上限的值只能分块读取
+    node.MAX_RESPONSE_BYTES = 2 * codec.CHUNK_BYTES
+    resp = node.getdata(stpb.StRequest(cli_id=0, key="big", token=token), None)
+    assert not resp.errno and "getstream" in resp.errmes
+
+    # 覆盖为普通值后旧的各块被删除
+    resp = node.putdata(stpb.StKV(cli_id=0, key="big", value=b"small", token=token), None)
+    assert resp.errno
+    assert list(node.KVmap) == ["big"]
+    data = b"".join(chunk.data for chunk in node.getstream(stpb.StRequest(cli_id=0, key="big", token=token), None))
+    assert data == b"small"
+
+
+
+def test_key_ttl(manager_server):
+    _, _, manager_api = manager_server
+    node, _, token = _start_storage(manager_api, expire_interval=0)
+    resp = node.putdata(stpb.StKV(cli_id=0, key="session", value=b"data", token=token, ttl=0.2), None)
+    assert resp.errno
+    node.putdata(stpb.StKV(cli_id=0, key="plain", value=b"data", token=token), None)
+    assert len(node.expiry) == 1
+    resp = node.getdata(stpb.StRequest(cli_id=0, key="session", token=token), None)
+    assert resp.errno and resp.value == b"data"
+
+    # 过期后读取时隐藏, 回收前仍在本地
+    time.sleep(0.3)
+    resp = node.getdata(stpb.StRequest(cli_id=0, key="session", token=token), None)
+    assert not resp.errno and resp.errmes == "未找到键值"
+    assert "session" in node.KVmap
+    assert node._reclaim_expired(time.time() + 1) == 1
+    assert list(node.KVmap) == ["plain"] and "session" not in node.mumap
+
+
+def test_concurrent_transactions(manager_server):
+    _, _, manager_api = manager_server
+    node, _, token = _start_storage(manager_api)
+    node.putdata(stpb.StKV(cli_id=0, key="a", value=b"a0", token=token), None)
+    node.putdata(stpb.StKV(cli_id=0, key="b", value=b"b0", token=token), None)
+
+    # 两个键同时处于准备阶段, 各自的原有值互不覆盖
+    assert node.maPutdata(stpb.StKV(key="a", value=codec.encode(b"a1", 0), txid=1), None).errno
+    assert node.maDeldata(stpb.StRequest(key="b", txid=2), None).errno
+    assert node.maPutdata(stpb.StKV(key="c", value=codec.encode(b"c1", 0), txid=3), None).errno
+    assert len(node.txns) == 3
+    node.abort(stpb.StRequest(key="b", delete=True, txid=2), None)
+    node.commit(stpb.StRequest(key="a", txid=1), None)
+    node.abort(stpb.StRequest(key="c", txid=3), None)
+    assert not node.txns
+
+    for key, value in [("a", b"a1"), ("b", b"b0")]:
+        resp = node.getdata(stpb.StRequest(cli_id=0, key=key, token=token), None)
+        assert resp.errno and resp.value == value
+    # 撤销新建的键后不再保留其键锁
+    assert "c" not in node.KVmap and "c" not in node.mumap
+
+    # 删除提交后移除键锁; 仍有事务在等待时保留, 等待者拿到的与之后的请求是同一把锁
+    assert node.maDeldata(stpb.StRequest(key="a", txid=5), None).errno
+    waiter = threading.Thread(target=node.maPutdata, args=(stpb.StKV(key="a", value=codec.encode(b"a2", 0), txid=6), None))
+    waiter.start()
+    while node.lock_refs.get("a") != 2:
+        time.sleep(0.01)
+    node.commit(stpb.StRequest(key="a", delete=True, txid=5), None)
+    waiter.join()
+    assert node.txns[6][0][2] is node.mumap["a"]
+    node.commit(stpb.StRequest(key="a", txid=6), None)
+    assert node.maDeldata(stpb.StRequest(key="a", txid=7), None).errno
+    node.commit(stpb.StRequest(key="a", delete=True, txid=7), None)
+    assert "a" not in node.mumap and not node.lock_refs
+
+    # 撤销先于准备到达时, 迟到的准备被拒绝且不持有键锁
+    node.abort(stpb.StRequest(key="d", txid=4), None)
+    assert not node.maPutdata(stpb.StKV(key="d", value=codec.encode(b"d1", 0), txid=4), None).errno
+    assert "d" not in node.KVmap and "d" not in node.mumap and not node.txns
+    assert node._lock("d").try_acquire_write()
+
+def test_batch_operations(manager_server):
+    _, manage_service, manager_api = manager_server
+    node0, _, token0 = _start_storage(manager_api)
+    node1, _, token1 = _start_storage(manager_api)
+    items = [stpb.StKV(key=f"m{i}", value=f"v{i}".encode()) for i in range(5)]
+    resp = node0.mputdata(stpb.StBatch(cli_id=0, token=token0, items=items), None)
+    assert resp.errno
+    # 整批只经历一次两阶段提交
+    assert not node0.txns and not node1.txns
+
+    keys = [stpb.StKV(key=key) for key in ("m0", "m4", "nokey", "m0")]
+    resp = node1.mgetdata(stpb.StBatch(cli_id=0, token=token1, items=keys), None)
+    assert resp.errno
+    assert [(r.key, r.errno, r.value) for r in resp.items] == [
+        ("m0", True, b"v0"), ("m4", True, b"v4"), ("nokey", False, b""), ("m0", True, b"v0")]
+
+    # 后加入且不拉取快照的节点本地缺少这些键, 一次 MultiGet 取回并落盘
+    node2, _, token2 = _start_storage(manager_api, bootstrap=False)
+    resp = node2.mgetdata(stpb.StBatch(cli_id=0, token=token2, items=items), None)
+    assert all(r.errno for r in resp.items) and [r.value for r in resp.items] == [i.value for i in items]
+    assert all(codec.decode(node2.engine.get(f"m{i}")) == f"v{i}".encode() for i in range(5))
+
+    resp = node1.mdeldata(stpb.StBatch(cli_id=0, token=token1, items=items[:3]), None)
+    assert resp.errno
+    resp = node0.mgetdata(stpb.StBatch(cli_id=0, token=token0, items=items), None)
+    assert [r.errno for r in resp.items] == [False, False, False, True, True]
+    assert not node0.mputdata(stpb.StBatch(cli_id=0, token="bad", items=items), None).errno
+
+def test_session_pipeline(manager_server):
+    _, _, manager_api = manager_server
+    node, _, token = _start_storage(manager_api)
+    _start_storage(manager_api)
+    ops = [stpb.StOp(tag=i, op="put", key=f"s{i}", value=f"v{i}".encode(), token=token) for i in range(20)]
+    results = {r.tag: r for r in node.session(iter(ops), None)}
+    assert sorted(results) == list(range(20)) and all(r.errno for r in results.values())
+
+    # 同一会话中的请求并发执行, 不保证顺序, 因此删除的键不与读取的键重叠
+    ops = [stpb.StOp(tag=i, op="get", key=f"s{i}", token=token) for i in range(1, 20)]
+    ops.append(stpb.StOp(tag=20, op="del", key="s0", token=token))
+    ops.append(stpb.StOp(tag=21, op="inc", key="s1", token=token))
+    ops.append(stpb.StOp(tag=22, op="get", key="s2", token="bad"))
+    results = {r.tag: r for r in node.session(iter(ops), None)}
+    assert all(results[i].value == f"v{i}".encode() for i in range(1, 20))
+    assert results[20].errno and not results[21].errno and not results[22].errno
+    assert not node.getdata(stpb.StRequest(cli_id=0, key="s0", token=token), None).errno
+
+def test_restart_reconciles_with_cluster(manager_server, tmp_path):
+    _, manage_service, manager_api = manager_server
+    node0, _, token0 = _start_storage(manager_api)
+    port = f":{_get_free_port()}"
+    logger = logging.getLogger("storage")
+
+    def start():
+        node = StoreService("localhost", port, 5, manager_api)
+        node.start(str(tmp_path), logger)
+        return node
+
+    def crash(node):
+        node.server.stop(None).wait()
+        node._stop_background()
+        node.engine.close()
+
+    node1 = start()
+    for key in ["k1", "k2", "k3"]:
+        assert node0.putdata(stpb.StKV(cli_id=0, key=key, value=b"old", token=token0), None).errno
+    crash(node1)
+    # 心跳移除失联节点后, 其余节点继续写入: 离线期间的覆盖写、删除与新增
+    manage_service.check_all_storage_live()
+    assert node1.id not in manage_service.servermap
+    assert node0.putdata(stpb.StKV(cli_id=0, key="k1", value=b"new", token=token0), None).errno
+    assert node0.deldata(stpb.StRequest(cli_id=0, key="k2", token=token0), None).errno
+    assert node0.putdata(stpb.StKV(cli_id=0, key="k4", value=b"new", token=token0), None).errno
+
+    # 同一地址重启沿用原 id 与数据目录
+    restarted = start()
+    try:
+        assert restarted.id == node1.id and restarted.datapath == node1.datapath
+        assert restarted.id in manage_service.servermap
+        restarted.bootstrap_thread.join()
+        assert restarted.stale is None
+        token1 = restarted.token
+        for key, value in [("k1", b"new"), ("k3", b"old"), ("k4", b"new")]:
+            resp = restarted.getdata(stpb.StRequest(cli_id=0, key=key, token=token1), None)
+            assert resp.errno and resp.value == value
+        assert "k2" not in restarted.KVmap
+
+        # 核对完成前本地旧值不可信, 读取以其他节点为准
+        restarted._write("k1", codec.encode(b"stale", 0))
+        restarted.cache.del_key("k1")
+        restarted.stale = {"k1"}
+        assert not restarted.maGetdata(stpb.StRequest(key="k1"), None).errno
+        resp = restarted.getdata(stpb.StRequest(cli_id=0, key="k1", token=token1), None)
+        assert resp.errno and resp.value == b"new"
+        assert not restarted.stale
+
+        # 核对未完成的节点不提供快照, 以免接收方把缺少的键当作已删除
+        page = next(restarted.snapshot(stpb.StSnapshot(server_id=0, token=token1), None))
+        assert not page.errno and page.errmes == restarted.SNAPSHOT_BUSY
+
+        # 传输期间准备而最终撤销的事务不会让未核对的键被删除, 以快照值为准
+        restarted._write("k3", codec.encode(b"old", 0))
+        restarted.stale, restarted.touched = {"k3"}, set()
+        assert restarted.maPutdata(stpb.StKV(key="k3", value=codec.encode(b"tmp", 0), txid=7), None).errno
+        assert not restarted._restore("k3", codec.encode(b"snap", 0))
+        assert restarted.abort(stpb.StRequest(txid=7), None).errno
+        assert "k3" in restarted.stale
+        assert restarted._drop_stale() == 0
+        assert codec.decode(restarted.engine.get("k3")) == b"snap"
+        restarted.touched = None
+    finally:
+        crash(restarted)
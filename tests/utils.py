@@ -1,4 +1,5 @@
 ﻿import logging
+import os
 import grpc
 import socket
 import shutil
@@ -14,12 +15,13 @@ def _get_free_port():
         s.bind(("localhost", 0))
         return s.getsockname()[1]
     
-def _start_storage(manager_api):
+def _start_storage(manager_api, **kwargs):
     fakelogger = logging.getLogger("storage")
     fakelogger.handlers.clear()  
     port = ":"+ str(_get_free_port())
-    storage_service = StoreService(ip='localhost', port=port, cache_num=5, manager_addr=manager_api)
+    storage_service = StoreService(ip='localhost', port=port, cache_num=5, manager_addr=manager_api, **kwargs)
     storage_service.start('tests/', fakelogger)
     shutil.rmtree(storage_service.datapath)
+    os.remove(storage_service.id_file)
         
     return storage_service, f"localhost{port}", storage_service.token
\ No newline at end of file